@@ -0,0 +1,67 @@
+"""Index of the addresses in use in a BIG-IP partition."""
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import bisect
+
+import netaddr
+from oslo_log import log as logging
+
+from f5_openstack_agent.lbaasv2.drivers.bigip.utils import \
+    strip_domain_address
+
+LOG = logging.getLogger(__name__)
+
+
+class AddressIndex(object):
+    """Sorted addresses per route domain, searched by subnet.
+
+    Addresses are BIG-IP addresses, such as 10.1.1.10%2, without a route
+    domain for route domain 0. Each route domain and IP version keeps
+    its addresses as a sorted list of integers, so whether any address
+    is in a subnet is answered with a binary search.
+    """
+
+    def __init__(self, addresses=None):
+        self._addresses = dict()
+        for address in addresses or list():
+            self.add(address, sort=False)
+        for values in self._addresses.values():
+            values.sort()
+
+    def __len__(self):
+        return sum(len(values) for values in self._addresses.values())
+
+    def add(self, address, sort=True):
+        parts = address.split('%')
+        route_domain = parts[1].split('/')[0] if len(parts) > 1 else '0'
+        try:
+            ip_address = netaddr.IPAddress(strip_domain_address(address))
+        except (netaddr.AddrFormatError, ValueError):
+            LOG.debug("address index: ignoring address %s" % address)
+            return
+        values = self._addresses.setdefault(
+            (route_domain, ip_address.version), list())
+        if sort:
+            bisect.insort(values, int(ip_address))
+        else:
+            values.append(int(ip_address))
+
+    def has_address_in(self, cidr, route_domain):
+        """Return whether any address is in a subnet of a route domain."""
+        subnet = netaddr.IPNetwork(cidr)
+        values = self._addresses.get(
+            (str(route_domain), subnet.version), list())
+        index = bisect.bisect_left(values, subnet.first)
+        return index < len(values) and values[index] <= subnet.last
@@ -36,7 +36,9 @@ except ImportError:
 
 from f5_openstack_agent.lbaasv2.drivers.bigip import constants_v2
 from f5_openstack_agent.lbaasv2.drivers.bigip import exceptions as f5_ex
+from f5_openstack_agent.lbaasv2.drivers.bigip import pending_services
 from f5_openstack_agent.lbaasv2.drivers.bigip import plugin_rpc
+from f5_openstack_agent.lbaasv2.drivers.bigip import stats_scheduler
 
 LOG = logging.getLogger(__name__)
 
@@ -98,6 +100,18 @@ OPTS = [
         default=300,
         help=('Number of seconds between service refresh checks')
     ),
+    cfg.IntOpt(
+        'service_full_resync_interval',
+        default=0,
+        help=('Number of seconds between full service refresh checks. '
+              'When set, the service refresh checks in between only '
+              'fetch and validate loadbalancers whose revision, as '
+              'reported by the LBaaS plugin, changed since they were last '
+              'validated. This only saves fetches with a plugin which '
+              'reports revisions; otherwise every loadbalancer is still '
+              'fetched and checked on the devices. 0 validates every '
+              'loadbalancer on each service refresh check')
+    ),
     cfg.StrOpt(
         'environment_prefix',
         default='Project',
@@ -118,12 +132,45 @@ OPTS = [
         default={},
         help=('Metrics to measure capacity and their limits')
     ),
+    cfg.IntOpt(
+        'services_batch_size',
+        default=constants_v2.SERVICES_BATCH_SIZE,
+        help=('Number of loadbalancers to retrieve service definitions '
+              'for in a single call to the plugin')
+    ),
+    cfg.BoolOpt(
+        'operating_status_changes_only',
+        default=False,
+        help=('Poll the member states of all pools from the devices in '
+              'bulk, and only update the operating status of the '
+              'loadbalancers with member state transitions')
+    ),
+    cfg.IntOpt(
+        'stats_request_budget',
+        default=0,
+        help=('Stats requests per device per minute which loadbalancer '
+              'stats updates may make. When set, each loadbalancer is '
+              'sampled at an interval adapted to its traffic. 0 samples '
+              'every loadbalancer whenever the plugin requests its stats')
+    ),
+    cfg.IntOpt(
+        'stats_max_sample_interval',
+        default=stats_scheduler.DEFAULT_MAX_SAMPLE_INTERVAL,
+        help=('Maximum number of seconds between stats samples of an '
+              'idle loadbalancer, when stats_request_budget is set')
+    ),
     cfg.IntOpt(
         'f5_pending_services_timeout',
         default=60,
         help=(
             'Amount of time to wait for a pending service to become active')
     ),
+    cfg.IntOpt(
+        'f5_pending_services_max_retry_interval',
+        default=120,
+        help=(
+            'Maximum amount of time between refreshes of a pending service')
+    ),
     cfg.IntOpt(
         'f5_errored_services_timeout',
         default=60,
@@ -146,6 +193,7 @@ class LogicalServiceCache(object):
             self.loadbalancer_id = loadbalancer_id
             self.tenant_id = tenant_id
             self.agent_host = agent_host
+            self.revision = None
 
         def __eq__(self, other):
             return self.__dict__ == other.__dict__
@@ -200,6 +248,17 @@ class LogicalServiceCache(object):
         """Retreive service by providing the loadbalancer id."""
         return self.services.get(loadbalancer_id, None)
 
+    def set_revision(self, loadbalancer_id, revision):
+        """Record the revision a cached service was validated at."""
+        if loadbalancer_id in self.services:
+            self.services[loadbalancer_id].revision = revision
+
+    def is_current(self, loadbalancer_id, revision):
+        """Determine if a service was validated at the given revision."""
+        service = self.services.get(loadbalancer_id, None)
+        return bool(service and service.revision is not None and
+                    service.revision == revision)
+
     def get_loadbalancer_ids(self):
         """Return a list of cached loadbalancer ids."""
         return self.services.keys()
@@ -242,16 +301,26 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
         # Create the cache of provisioned services
         self.cache = LogicalServiceCache()
         self.last_resync = datetime.datetime.now()
+        self.last_full_resync = self.last_resync
         self.needs_resync = False
         self.plugin_rpc = None
         self.tunnel_rpc = None
         self.l2_pop_rpc = None
         self.state_rpc = None
         self.pending_services = {}
+        self.pending_retries = pending_services.PendingServiceBackoff(
+            self.conf.periodic_interval,
+            self.conf.f5_pending_services_max_retry_interval)
 
         self.service_resync_interval = conf.service_resync_interval
         LOG.debug('setting service resync intervl to %d seconds' %
                   self.service_resync_interval)
+        self.service_full_resync_interval = conf.service_full_resync_interval
+
+        self.stats_scheduler = None
+        if conf.stats_request_budget:
+            self.stats_scheduler = stats_scheduler.StatsScheduler(
+                conf.stats_request_budget, conf.stats_max_sample_interval)
 
         # Load the driver.
         self._load_driver(conf)
@@ -361,7 +430,8 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
             self.context,
             self.conf.environment_prefix,
             self.conf.environment_group_number,
-            self.agent_host
+            self.agent_host,
+            services_batch_size=self.conf.services_batch_size
         )
 
         #
@@ -463,6 +533,10 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
                 self.agent_state['configurations'][
                     'environment_capacity_score'] = 0
 
+            if self.stats_scheduler is not None:
+                self.agent_state['configurations']['stats_sampling'] = \
+                    self.stats_scheduler.get_usage()
+
             LOG.debug("reporting state of agent as: %s" % self.agent_state)
             self.state_rpc.report_state(self.context, self.agent_state)
             self.agent_state.pop('start_flag', None)
@@ -516,18 +590,25 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
 
         active_loadbalancers = \
             self.plugin_rpc.get_active_loadbalancers(host=self.agent_host)
-        for loadbalancer in active_loadbalancers:
-            if self.agent_host == loadbalancer['agent_host']:
-                try:
-                    lb_id = loadbalancer['lb_id']
-                    LOG.debug(
-                        'getting operating status for loadbalancer %s.', lb_id)
+        lb_ids = [loadbalancer['lb_id']
+                  for loadbalancer in active_loadbalancers
+                  if self.agent_host == loadbalancer['agent_host']]
+        if self.conf.operating_status_changes_only:
+            # only the loadbalancers with member state transitions on the
+            # devices are retrieved and updated
+            lb_ids = self.lbdriver.get_operating_status_changes(lb_ids) or []
+        services = self.plugin_rpc.iter_services_by_loadbalancer_ids(lb_ids)
+        for lb_id, svc in services:
+            try:
+                LOG.debug(
+                    'getting operating status for loadbalancer %s.', lb_id)
+                if svc is None:
                     svc = self.plugin_rpc.get_service_by_loadbalancer_id(
                         lb_id)
-                    self.lbdriver.update_operating_status(svc)
+                self.lbdriver.update_operating_status(svc)
 
-                except Exception as e:
-                    LOG.exception('Error updating status %s.', e.message)
+            except Exception as e:
+                LOG.exception('Error updating status %s.', e.message)
 
     # setup a period task to decide if it is time empty the local service
     # cache and resync service definitions form the controller
@@ -541,10 +622,16 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
             # check if we hit the resync interval
             if (now - self.last_resync).seconds > self.service_resync_interval:
                 self.needs_resync = True
-                LOG.debug(
-                    'forcing resync of services on resync timer (%d seconds).'
-                    % self.service_resync_interval)
-                self.cache.services = {}
+                if self._full_resync_due(now):
+                    LOG.debug(
+                        'forcing resync of services on resync timer '
+                        '(%d seconds).' % self.service_resync_interval)
+                    self.cache.services = {}
+                    self.last_full_resync = now
+                else:
+                    LOG.debug(
+                        'resyncing changed services on resync timer '
+                        '(%d seconds).' % self.service_resync_interval)
                 self.last_resync = now
                 self.lbdriver.flush_cache()
                 LOG.debug("periodic_sync: service_resync_interval expired: %s"
@@ -563,6 +650,12 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
             if self.clean_orphaned_objects_and_save_device_config():
                 self.needs_resync = True
 
+    def _full_resync_due(self, now):
+        if not self.service_full_resync_interval:
+            return True
+        elapsed = (now - self.last_full_resync).total_seconds()
+        return elapsed > self.service_full_resync_interval
+
     def tunnel_sync(self):
         """Call into driver to advertise device tunnel endpoints."""
         LOG.debug("manager:tunnel_sync: calling driver tunnel_sync")
@@ -594,9 +687,20 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
             LOG.debug("currently known loadbalancer ids before sync are: %s"
                       % list(known_services))
 
-            # Validate each service we own, i.e. loadbalancers to which this
-            # agent is bound, that does not exist in our service cache.
-            self._validate_services(all_loadbalancer_ids)
+            if self.service_full_resync_interval:
+                # Validate each service we own whose revision changed
+                # since it was last validated, and forget the services
+                # no longer bound to this agent.
+                revisions = dict((lb['lb_id'], lb.get('revision', None))
+                                 for lb in all_loadbalancers)
+                self._validate_services(all_loadbalancer_ids,
+                                        revisions=revisions)
+                self._remove_unbound_services(all_loadbalancer_ids)
+            else:
+                # Validate each service we own, i.e. loadbalancers to which
+                # this agent is bound, that does not exist in our service
+                # cache.
+                self._validate_services(all_loadbalancer_ids)
 
             resync = self._refresh_pending_services()
 
@@ -633,51 +737,132 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
             "plugin produced the list of pending loadbalancer ids: %s"
             % list(pending_lb_ids))
 
-        for lb_id in list(pending_lb_ids):
-            lb_pending = self.refresh_service(lb_id)
-            if lb_pending:
-                if lb_id not in self.pending_services:
-                    self.pending_services[lb_id] = now
-
-                time_added = self.pending_services[lb_id]
-                has_expired = bool((now - time_added).seconds >
-                                   self.conf.f5_pending_services_timeout)
-
-                if has_expired:
-                    lb_pending = False
-                    self.service_timeout(lb_id)
+        # Forget loadbalancers the plugin no longer reports as pending.
+        for lb_id in list(self.pending_services):
+            if lb_id not in pending_lb_ids:
+                del self.pending_services[lb_id]
+                self.pending_retries.remove(lb_id)
+
+        # Loadbalancers still pending after a refresh are retried with
+        # an increasing backoff, until they time out.
+        due_lb_ids = list()
+        for lb_id in pending_lb_ids:
+            if self.pending_retries.is_due(lb_id, now):
+                due_lb_ids.append(lb_id)
+            else:
+                self._update_pending_service(lb_id, True, now)
 
-            if not lb_pending:
-                try:
-                    del self.pending_services[lb_id]
-                except KeyError as e:
-                    LOG.error("LB not found in pending services: {0}".format(
-                        e.message))
+        self._retry_pending_services(due_lb_ids, now)
 
         # If there are services in the pending cache resync
         if self.pending_services:
             resync = True
         return resync
 
+    def _retry_pending_services(self, lb_ids, now):
+        if not lb_ids:
+            return
+        services = self.plugin_rpc.iter_services_by_loadbalancer_ids(lb_ids)
+        for lb_id, service in services:
+            lb_pending = self.refresh_service(lb_id, service=service)
+            self._update_pending_service(lb_id, lb_pending, now, service)
+
+    def _update_pending_service(self, lb_id, lb_pending, now, service=None):
+        if lb_pending:
+            if lb_id not in self.pending_services:
+                self.pending_services[lb_id] = now
+
+            time_added = self.pending_services[lb_id]
+            has_expired = bool((now - time_added).seconds >
+                               self.conf.f5_pending_services_timeout)
+
+            if has_expired:
+                lb_pending = False
+                self.service_timeout(lb_id, service)
+            elif service is not None:
+                self.pending_retries.schedule(
+                    lb_id, now,
+                    pending_services.get_service_network_ids(service))
+
+        if not lb_pending:
+            self.pending_retries.remove(lb_id)
+            try:
+                del self.pending_services[lb_id]
+            except KeyError as e:
+                LOG.error("LB not found in pending services: {0}".format(
+                    e.message))
+
+    def _wake_pending_services(self, network_ids=None):
+        # Retry the pending services waiting for the networks at the next
+        # refresh, rather than at their next scheduled retry. They are not
+        # retried here, so the RPC handler returns at once.
+        lb_ids = self.pending_retries.wake(network_ids)
+        if lb_ids:
+            LOG.debug("pending loadbalancers %s are due after a network "
+                      "update" % lb_ids)
+
     def _get_remote_loadbalancers(self, plugin_rpc_attr, host=None):
         loadbalancers = getattr(self.plugin_rpc, plugin_rpc_attr)(host=host)
         lb_ids = [lb['lb_id'] for lb in loadbalancers]
         return tuple(loadbalancers), set(lb_ids)
 
-    def _validate_services(self, lb_ids):
-        for lb_id in lb_ids:
-            if not self.cache.get_by_loadbalancer_id(lb_id):
-                self.validate_service(lb_id)
+    def _validate_services(self, lb_ids, revisions=None):
+        # Existence of all services is checked against device resource
+        # collections loaded once per partition.
+        #
+        # Without revisions, services missing from the cache are validated.
+        # With revisions, a map of loadbalancer id to the revision reported
+        # by the controller or None, services are validated unless the
+        # cache holds them at the reported revision.
+        if revisions is None:
+            stale_ids = [lb_id for lb_id in lb_ids
+                         if not self.cache.get_by_loadbalancer_id(lb_id)]
+        else:
+            stale_ids = [lb_id for lb_id in lb_ids
+                         if revisions.get(lb_id, None) is None or
+                         not self.cache.is_current(lb_id, revisions[lb_id])]
+
+        self.lbdriver.open_resource_snapshot()
+        try:
+            services = self.plugin_rpc.iter_services_by_loadbalancer_ids(
+                stale_ids)
+            for lb_id, service in services:
+                if revisions is None:
+                    self.validate_service(lb_id, service=service)
+                else:
+                    self.validate_service(lb_id, service=service,
+                                          revision=revisions.get(lb_id),
+                                          incremental=True)
+        finally:
+            self.lbdriver.close_resource_snapshot()
+
+    def _remove_unbound_services(self, lb_ids):
+        for lb_id, service in self.cache.services.items():
+            if service.agent_host == self.agent_host and lb_id not in lb_ids:
+                LOG.debug("loadbalancer '{}' is no longer bound to this "
+                          "agent".format(lb_id))
+                self.cache.remove_by_loadbalancer_id(lb_id)
 
     @log_helpers.log_method_call
-    def validate_service(self, lb_id):
+    def validate_service(self, lb_id, service=None, revision=None,
+                         incremental=False):
 
         try:
-            service = self.plugin_rpc.get_service_by_loadbalancer_id(
-                lb_id
-            )
+            if service is None:
+                service = self.plugin_rpc.get_service_by_loadbalancer_id(
+                    lb_id
+                )
+            # Only a revision reported by the controller skips the device
+            # check. Without one the service is checked on every resync,
+            # from the resource snapshot, so resources changed or deleted
+            # on the devices are repaired.
+            unchanged = incremental and revision is not None and \
+                self.cache.is_current(lb_id, revision)
             self.cache.put(service, self.agent_host)
-            if not self.lbdriver.service_exists(service) or \
+            if unchanged:
+                LOG.debug("Service definition for '{}' is unchanged"
+                          " move on.".format(lb_id))
+            elif not self.lbdriver.service_exists(service) or \
                     self.has_provisioning_status_of_error(service):
                 LOG.info("active loadbalancer '{}' is not on BIG-IP"
                          " or has error state...syncing".format(lb_id))
@@ -685,6 +870,8 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
             else:
                 LOG.debug("Found service definition for '{}', state is ACTIVE"
                           " move on.".format(lb_id))
+                if incremental and revision is not None:
+                    self.cache.set_revision(lb_id, revision)
         except f5_ex.InvalidNetworkType as exc:
             LOG.warning(exc.msg)
         except f5_ex.F5NeutronException as exc:
@@ -731,11 +918,12 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
         return error_status
 
     @log_helpers.log_method_call
-    def refresh_service(self, lb_id):
+    def refresh_service(self, lb_id, service=None):
         try:
-            service = self.plugin_rpc.get_service_by_loadbalancer_id(
-                lb_id
-            )
+            if service is None:
+                service = self.plugin_rpc.get_service_by_loadbalancer_id(
+                    lb_id
+                )
             self.cache.put(service, self.agent_host)
             if self.lbdriver.sync(service):
                 self.needs_resync = True
@@ -748,11 +936,12 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
         return self.needs_resync
 
     @log_helpers.log_method_call
-    def service_timeout(self, lb_id):
+    def service_timeout(self, lb_id, service=None):
         try:
-            service = self.plugin_rpc.get_service_by_loadbalancer_id(
-                lb_id
-            )
+            if service is None:
+                service = self.plugin_rpc.get_service_by_loadbalancer_id(
+                    lb_id
+                )
             self.cache.put(service, self.agent_host)
             self.lbdriver.update_service_status(service, timed_out=True)
         except f5_ex.F5NeutronException as exc:
@@ -782,41 +971,7 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
             if global_agent['host'] == self.agent_host:
                 LOG.debug('this agent is the global config agent')
                 # We're the global agent perform global cluster tasks
-
-                # There are two independent types of service objects
-                # the LBaaS implments: 1) loadbalancers + 2) pools
-                # We will first try to find any orphaned pools
-                # and remove them.
-
-                # Ask BIG-IP for all deployed loadbalancers (virtual addresses)
-                lbs = self.lbdriver.get_all_deployed_loadbalancers(
-                    purge_orphaned_folders=True)
-                if lbs:
-                    self.purge_orphaned_loadbalancers(lbs)
-
-                # Ask the BIG-IP for all deployed listeners to make
-                # sure we are not orphaning listeners which have
-                # valid loadbalancers in a OK state
-                listeners = self.lbdriver.get_all_deployed_listeners()
-                if listeners:
-                    self.purge_orphaned_listeners(listeners)
-
-                policies = self.lbdriver.get_all_deployed_l7_policys()
-                if policies:
-                    self.purge_orphaned_l7_policys(policies)
-
-                # Ask the BIG-IP for all deployed pools not associated
-                # to a virtual server
-                pools = self.lbdriver.get_all_deployed_pools()
-                if pools:
-                    self.purge_orphaned_pools(pools)
-                    self.purge_orphaned_nodes(pools)
-
-                # Ask the BIG-IP for all deployed monitors not associated
-                # to a pool
-                monitors = self.lbdriver.get_all_deployed_health_monitors()
-                if monitors:
-                    self.purge_orphaned_health_monitors(monitors)
+                self._clean_orphaned_objects()
 
             else:
                 LOG.debug('the global agent is %s' % (global_agent['host']))
@@ -829,6 +984,54 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
 
         return cleaned
 
+    def _clean_orphaned_objects(self):
+        # Device resource collections are loaded once per partition and
+        # shared by every scan below; the purges invalidate the partitions
+        # they change.
+        self.lbdriver.open_resource_snapshot()
+        try:
+            # There are two independent types of service objects
+            # the LBaaS implments: 1) loadbalancers + 2) pools
+            # We will first try to find any orphaned pools
+            # and remove them.
+
+            # Ask BIG-IP for all deployed loadbalancers (virtual addresses)
+            lbs = self.lbdriver.get_all_deployed_loadbalancers(
+                purge_orphaned_folders=True)
+            if lbs:
+                self.purge_orphaned_loadbalancers(lbs)
+
+            # Policies and monitors are loaded before the listeners and
+            # pools which reference them, so one created while the scan
+            # runs is never seen without its referrer.
+            policies = self.lbdriver.get_all_deployed_l7_policys()
+
+            # Ask the BIG-IP for all deployed listeners to make
+            # sure we are not orphaning listeners which have
+            # valid loadbalancers in a OK state
+            listeners = self.lbdriver.get_all_deployed_listeners(
+                expand_subcollections=True)
+            if listeners:
+                self.purge_orphaned_listeners(listeners)
+
+            if policies:
+                self.purge_orphaned_l7_policys(policies)
+
+            monitors = self.lbdriver.get_all_deployed_health_monitors()
+
+            # Ask the BIG-IP for all deployed pools not associated
+            # to a virtual server
+            pools = self.lbdriver.get_all_deployed_pools()
+            if pools:
+                self.purge_orphaned_pools(pools)
+                self.purge_orphaned_nodes(pools)
+
+            # Purge the monitors not associated to a pool
+            if monitors:
+                self.purge_orphaned_health_monitors(monitors)
+        finally:
+            self.lbdriver.close_resource_snapshot()
+
     @log_helpers.log_method_call
     def purge_orphaned_loadbalancers(self, lbs):
         """Gets 'unknown' loadbalancers from Neutron and purges them
@@ -1020,6 +1223,8 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
             service_pending = \
                 self.lbdriver.delete_loadbalancer(loadbalancer, service)
             self.cache.remove_by_loadbalancer_id(loadbalancer['id'])
+            if self.stats_scheduler is not None:
+                self.stats_scheduler.forget(loadbalancer['id'])
             if service_pending:
                 self.needs_resync = True
         except f5_ex.F5NeutronException as exc:
@@ -1031,7 +1236,13 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
     def update_loadbalancer_stats(self, context, loadbalancer, service):
         """Handle RPC cast from plugin to get stats."""
         try:
-            self.lbdriver.get_stats(service)
+            if self.stats_scheduler is None:
+                self.lbdriver.get_stats(service)
+            elif self.stats_scheduler.sample(
+                    loadbalancer['id'],
+                    self.lbdriver.get_stats_request_count(service)):
+                stats = self.lbdriver.get_stats(service)
+                self.stats_scheduler.record(loadbalancer['id'], stats)
             self.cache.put(service, self.agent_host)
         except f5_ex.F5NeutronException as exc:
             LOG.error("f5_ex.F5NeutronException: %s" % exc.msg)
@@ -1228,6 +1439,7 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
         try:
             LOG.debug('received tunnel_update: %s' % kwargs)
             self.lbdriver.tunnel_update(**kwargs)
+            self._wake_pending_services()
         except f5_ex.F5NeutronException as exc:
             LOG.error("tunnel_update: NeutronException: %s" % exc.msg)
         except Exception as exc:
@@ -1240,6 +1452,7 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
             LOG.debug('received add_fdb_entries: %s host: %s'
                       % (fdb_entries, host))
             self.lbdriver.fdb_add(fdb_entries)
+            self._wake_pending_services(fdb_entries.keys())
         except f5_ex.F5NeutronException as exc:
             LOG.error("fdb_add: NeutronException: %s" % exc.msg)
         except Exception as exc:
@@ -0,0 +1,250 @@
+"""Plan the device changes needed to assure a service."""
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import re
+
+from oslo_log import log as logging
+from requests import HTTPError
+
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import \
+    BigIPResourceHelper
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import \
+    ResourceType
+
+LOG = logging.getLogger(__name__)
+
+CREATE = 'create'
+MODIFY = 'modify'
+DELETE = 'delete'
+
+# Route domain 0 is implied and not shown by the device.
+_DEFAULT_ROUTE_DOMAIN_RE = re.compile(r'%0(?=$|[:.])')
+
+# Collections whose references are compared, e.g. a pool's members.
+_SUBCOLLECTION_TYPES = (ResourceType.virtual, ResourceType.pool)
+
+# Attributes identifying a resource rather than describing it.
+_IDENTITY_KEYS = ('name', 'partition')
+
+# Member session values the device reports for an enabled member.
+_ENABLED_SESSIONS = ('user-enabled', 'monitor-enabled')
+
+
+class PlannedChange(object):
+    """A create, modify or delete of one resource on one BIG-IP."""
+
+    def __init__(self, hostname, action, resource_type, name, partition,
+                 changes=None):
+        self.hostname = hostname
+        self.action = action
+        self.resource_type = resource_type
+        self.name = name
+        self.partition = partition
+        self.changes = changes or {}
+
+    def __repr__(self):
+        return "%s %s /%s/%s on %s %s" % (
+            self.action, self.resource_type.name, self.partition, self.name,
+            self.hostname, sorted(self.changes))
+
+
+class AssurePlan(object):
+    """The changes planned for a service, in planning order."""
+
+    def __init__(self):
+        self.changes = []
+
+    def __iter__(self):
+        return iter(self.changes)
+
+    def __len__(self):
+        return len(self.changes)
+
+    def add(self, change):
+        self.changes.append(change)
+
+    def get_changes(self, action=None, hostname=None):
+        return [change for change in self.changes
+                if (action is None or change.action == action) and
+                (hostname is None or change.hostname == hostname)]
+
+    def summary(self):
+        """Return the number of planned changes by action."""
+        summary = {CREATE: 0, MODIFY: 0, DELETE: 0}
+        for change in self.changes:
+            summary[change.action] += 1
+        return summary
+
+
+class BigIPResourceLoader(object):
+    """Device resources of a service, each loaded by name when planned.
+
+    A service has a handful of resources in a partition which may hold
+    those of many services, so they are loaded one at a time rather
+    than with the collections of a BigIPResourceSnapshot.
+    """
+
+    def get_resource(self, bigip, resource_type, name, partition,
+                     expand_subcollections=False):
+        """Return a resource of a type in a partition, or None."""
+        try:
+            return BigIPResourceHelper(resource_type).load(
+                bigip, name=name, partition=partition,
+                expand_subcollections=expand_subcollections)
+        except HTTPError as err:
+            if err.response is not None and \
+                    err.response.status_code == 404:
+                return None
+            raise
+
+
+class AssurePlanner(object):
+    """Compare desired resource models against the device resources.
+
+    Models are the dictionaries built by the ServiceModelAdapter for a
+    resource helper create or modify. Only the attributes in a model are
+    compared, so a resource without changes would be left unchanged by
+    a modify. Device resources are loaded by name, unless a snapshot of
+    their collections is given.
+    """
+
+    def __init__(self, snapshot=None):
+        self.snapshot = snapshot or BigIPResourceLoader()
+        self.plan = AssurePlan()
+
+    def plan_resource(self, bigip, resource_type, model, delete=False):
+        """Plan the change to a resource on a BIG-IP.
+
+        Returns the planned change, or None if the resource is in the
+        desired state.
+        """
+        name = model['name']
+        partition = model.get('partition', 'Common')
+        current = self.snapshot.get_resource(
+            bigip, resource_type, name, partition,
+            expand_subcollections=resource_type in _SUBCOLLECTION_TYPES)
+
+        change = None
+        if delete:
+            if current is not None:
+                change = PlannedChange(bigip.hostname, DELETE, resource_type,
+                                       name, partition)
+        elif current is None:
+            change = PlannedChange(bigip.hostname, CREATE, resource_type,
+                                   name, partition, model)
+        else:
+            changes = get_differences(model, current)
+            if changes:
+                change = PlannedChange(bigip.hostname, MODIFY, resource_type,
+                                       name, partition, changes)
+
+        if change:
+            LOG.debug("planned %s" % change)
+            self.plan.add(change)
+        return change
+
+    def plan_unknown(self, bigip, resource_type, model):
+        """Record a resource which is assured without comparison."""
+        change = PlannedChange(bigip.hostname, MODIFY, resource_type,
+                               model['name'], model.get('partition', 'Common'),
+                               model)
+        self.plan.add(change)
+        return change
+
+
+def get_differences(model, current):
+    """Return the attributes of a model which differ on a device resource."""
+    differences = {}
+    for key, desired in model.iteritems():
+        if key in _IDENTITY_KEYS:
+            continue
+        if not _same_value(desired, _get_current_value(current, key)):
+            differences[key] = desired
+    return differences
+
+
+def _get_current_value(current, key):
+    if isinstance(current, dict):
+        value = current.get(key, None)
+        reference = current.get(key + 'Reference', None)
+    else:
+        value = getattr(current, key, None)
+        reference = getattr(current, key + 'Reference', None)
+    if value is None and isinstance(reference, dict):
+        # Expanded subcollection, e.g. pool members or virtual profiles.
+        value = reference.get('items', [])
+    return value
+
+
+def _is_empty(value):
+    return value is None or value == '' or value == [] or value == {}
+
+
+def _normalize(value):
+    value = _DEFAULT_ROUTE_DOMAIN_RE.sub('', value.strip())
+    if '/' in value:
+        # Full path references compare by name.
+        value = value.rsplit('/', 1)[-1]
+    return value
+
+
+def _item_name(item):
+    if isinstance(item, dict):
+        return _normalize(unicode(item.get('name', '')))
+    return _normalize(unicode(item))
+
+
+def _same_value(desired, current):
+    if _is_empty(desired) or _is_empty(current):
+        return _is_empty(desired) and _is_empty(current)
+
+    if isinstance(desired, bool):
+        if isinstance(current, basestring):
+            return current.lower() in (('true', 'yes', 'enabled')
+                                       if desired else
+                                       ('false', 'no', 'disabled'))
+        return desired == bool(current)
+
+    if isinstance(desired, (int, long, float)):
+        return unicode(desired) == unicode(current)
+
+    if isinstance(desired, basestring):
+        if not isinstance(current, basestring):
+            return False
+        if desired in _ENABLED_SESSIONS:
+            return current in _ENABLED_SESSIONS
+        return _normalize(desired) == _normalize(current)
+
+    if isinstance(desired, dict):
+        if isinstance(current, dict):
+            return not get_differences(desired, current)
+        return False
+
+    if isinstance(desired, (list, tuple)):
+        if not isinstance(current, (list, tuple)):
+            return False
+        current_items = dict((_item_name(item), item) for item in current)
+        if len(current_items) != len(desired):
+            return False
+        for item in desired:
+            name = _item_name(item)
+            if name not in current_items:
+                return False
+            if isinstance(item, dict) and \
+                    get_differences(item, current_items[name]):
+                return False
+        return True
+
+    return desired == current
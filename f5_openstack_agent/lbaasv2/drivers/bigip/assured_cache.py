@@ -0,0 +1,100 @@
+"""Cache of the objects assured on a BIG-IP."""
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import random
+import time
+
+DEFAULT_ASSURED_TTL = 300
+
+# Entries are revalidated between (1 - TTL_JITTER) and (1 + TTL_JITTER)
+# times the ttl after they were verified.
+TTL_JITTER = 0.5
+
+
+def network_fingerprint(network):
+    """What an assured network depends on."""
+    return (network.get('provider:network_type'),
+            network.get('provider:segmentation_id'),
+            network.get('provider:physical_network'))
+
+
+def subnet_fingerprint(subnet):
+    """What the self IPs, SNATs and gateway of a subnet depend on."""
+    return (subnet.get('cidr'), subnet.get('gateway_ip'))
+
+
+class AssuredEntry(object):
+    def __init__(self, value, fingerprint, expires_at):
+        self.value = value
+        self.fingerprint = fingerprint
+        self.expires_at = expires_at
+
+
+class AssuredCache(object):
+    """Objects known to be configured on a BIG-IP.
+
+    Each entry records when it was last verified and a fingerprint of
+    what it was assured from. An entry is assured again once its ttl
+    has passed, or when it is checked with a different fingerprint.
+    The ttl of each entry is jittered, so entries assured at the same
+    time are verified again spread over the ttl rather than all at
+    once.
+    """
+
+    def __init__(self, ttl=DEFAULT_ASSURED_TTL):
+        self.ttl = ttl
+        self._entries = dict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __getitem__(self, key):
+        return self._entries[key].value
+
+    def keys(self):
+        return list(self._entries)
+
+    def get(self, key, default=None):
+        """Return the value of an entry, whether or not it is due."""
+        entry = self._entries.get(key, None)
+        return default if entry is None else entry.value
+
+    def is_assured(self, key, fingerprint=None, now=None):
+        """Whether an entry is still valid and need not be assured."""
+        entry = self._entries.get(key, None)
+        if entry is None or entry.fingerprint != fingerprint:
+            return False
+        if entry.expires_at is None:
+            return True
+        now = time.time() if now is None else now
+        return now < entry.expires_at
+
+    def assured(self, key, value=True, fingerprint=None, now=None):
+        """Record that an entry was assured."""
+        expires_at = None
+        if self.ttl:
+            now = time.time() if now is None else now
+            expires_at = now + self.ttl * random.uniform(
+                1 - TTL_JITTER, 1 + TTL_JITTER)
+        self._entries[key] = AssuredEntry(value, fingerprint, expires_at)
+
+    def remove(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
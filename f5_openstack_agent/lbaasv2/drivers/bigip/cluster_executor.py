@@ -0,0 +1,110 @@
+"""Run per BIG-IP operations concurrently across a device cluster."""
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import sys
+
+import eventlet
+from eventlet import semaphore
+from oslo_log import log as logging
+import six
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_MAX_REQUESTS_PER_DEVICE = 2
+
+
+class ClusterResults(object):
+    """Results and errors of one operation, keyed by BIG-IP hostname."""
+
+    def __init__(self, bigips):
+        self.bigips = list(bigips)
+        self.results = {}
+        self.errors = {}
+
+    def values(self):
+        """Return the results of the successful devices in device order."""
+        return [self.results[bigip.hostname] for bigip in self.bigips
+                if bigip.hostname in self.results]
+
+    def raise_first_error(self):
+        """Re-raise the error of the first failed device, if any.
+
+        The errors of any other failed devices are logged.
+        """
+        failed = [bigip.hostname for bigip in self.bigips
+                  if bigip.hostname in self.errors]
+        if not failed:
+            return
+        for hostname in failed[1:]:
+            LOG.error("Error on BIG-IP %s: %s" %
+                      (hostname, self.errors[hostname][1]))
+        six.reraise(*self.errors[failed[0]])
+
+
+class ClusterExecutor(object):
+    """Fan out an operation to every BIG-IP of a cluster.
+
+    The operation is called once per device, each on its own greenthread,
+    and the caller waits for all of them. At most max_per_device
+    operations run against a single BIG-IP at a time, across all callers
+    sharing the executor, so that concurrent service requests do not
+    overload a device.
+
+    Operations run by the executor must not themselves fan out to the
+    same devices, as they would wait for their own slot.
+    """
+
+    def __init__(self, max_per_device=DEFAULT_MAX_REQUESTS_PER_DEVICE):
+        self.max_per_device = max(1, max_per_device or 1)
+        self._device_slots = {}
+
+    def execute(self, bigips, func, *args, **kwargs):
+        """Call func(bigip, *args, **kwargs) for each BIG-IP.
+
+        Errors are collected per device rather than raised.
+        """
+        results = ClusterResults(bigips)
+        if len(results.bigips) == 1:
+            self._run(results, results.bigips[0], func, args, kwargs)
+            return results
+
+        pool = eventlet.GreenPool(max(1, len(results.bigips)))
+        for bigip in results.bigips:
+            pool.spawn_n(self._run, results, bigip, func, args, kwargs)
+        pool.waitall()
+        return results
+
+    def map(self, bigips, func, *args, **kwargs):
+        """Call func for each BIG-IP and return the results in order.
+
+        All devices are run to completion before the error of the first
+        failed device, if any, is raised.
+        """
+        results = self.execute(bigips, func, *args, **kwargs)
+        results.raise_first_error()
+        return results.values()
+
+    def _device_slot(self, bigip):
+        if bigip.hostname not in self._device_slots:
+            self._device_slots[bigip.hostname] = \
+                semaphore.Semaphore(self.max_per_device)
+        return self._device_slots[bigip.hostname]
+
+    def _run(self, results, bigip, func, args, kwargs):
+        with self._device_slot(bigip):
+            try:
+                results.results[bigip.hostname] = func(bigip, *args, **kwargs)
+            except Exception:
+                results.errors[bigip.hostname] = sys.exc_info()
@@ -42,6 +42,8 @@ TOPIC_LOADBALANCER_AGENT_V2 = 'f5-lbaasv2-process-on-agent'
 
 RPC_API_VERSION = '1.0'
 # RPC_API_NAMESPACE = ""
+# Loadbalancers per bulk service definition retrieval from the plugin
+SERVICES_BATCH_SIZE = 50
 
 FDB_POPULATE_STATIC_ARP = True
 # for test only
@@ -57,6 +59,9 @@ DEVICE_HEALTH_SCORE_MEM_WEIGHT = 1
 DEVICE_HEALTH_SCORE_CPS_WEIGHT = 1
 DEVICE_HEALTH_SCORE_CPS_PERIOD = 5
 DEVICE_HEALTH_SCORE_CPS_MAX = 100
+# Global statistics are loaded at most once within this period per device,
+# shorter than the default agent state report interval.
+DEVICE_STATS_CACHE_SECONDS = 20
 
 DEVICE_CONNECTION_TIMEOUT = 5
 
@@ -0,0 +1,119 @@
+"""Buffering and merging of L2 population fdb notifications."""
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import eventlet
+from eventlet import semaphore
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_FDB_UPDATE_INTERVAL = 1.0
+
+# Flooding entries, which the BIG-IP tunnels do not need
+FLOODING_MAC = '00:00:00:00:00:00'
+
+
+class FdbChanges(object):
+    """The fdb records to add and delete, merged per network.
+
+    Notifications use the L2 population fdb structure:
+
+        {'<network_id>': {
+            'network_type': 'vxlan',
+            'segment_id': <int>,
+            'ports': {'<vtep>': [['<mac_address>', '<ip_address>']]}}}
+
+    Records are kept per network by MAC address, and the last
+    notification for a MAC address wins, as if the notifications had
+    been applied one after the other.
+    """
+
+    def __init__(self):
+        # network id -> {'network_type', 'segment_id', 'records'}
+        self.networks = dict()
+
+    def __len__(self):
+        return sum(len(network['records'])
+                   for network in self.networks.values())
+
+    def add(self, fdb):
+        self._merge(fdb, delete=False)
+
+    def remove(self, fdb):
+        self._merge(fdb, delete=True)
+
+    def _merge(self, fdb, delete):
+        for network_id, net_fdb in fdb.iteritems():
+            network = self.networks.setdefault(network_id, {
+                'network_type': net_fdb['network_type'],
+                'segment_id': net_fdb['segment_id'],
+                'records': dict()})
+            for vtep, entries in net_fdb['ports'].iteritems():
+                for entry in entries:
+                    if entry[0] == FLOODING_MAC:
+                        continue
+                    network['records'][entry[0]] = {
+                        'endpoint': vtep,
+                        'ip_address': entry[1],
+                        'delete': delete}
+
+
+class FdbPipeline(object):
+    """Debounced application of fdb notifications to the BIG-IPs.
+
+    Notifications received within interval seconds of the first one are
+    merged and applied together by apply_changes, which is passed the
+    FdbChanges, so each tunnel is written at most once per interval on
+    each device. An interval of 0 applies each notification at once.
+    """
+
+    def __init__(self, apply_changes, interval=DEFAULT_FDB_UPDATE_INTERVAL):
+        self.apply_changes = apply_changes
+        self.interval = interval
+        self._changes = FdbChanges()
+        self._flush_thread = None
+        self._flush_lock = semaphore.Semaphore()
+
+    def __len__(self):
+        return len(self._changes)
+
+    def add(self, fdb):
+        self._changes.add(fdb)
+        self._schedule_flush()
+
+    def remove(self, fdb):
+        self._changes.remove(fdb)
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self.interval <= 0:
+            self.flush()
+        elif self._flush_thread is None:
+            self._flush_thread = eventlet.spawn_after(
+                self.interval, self.flush)
+
+    def flush(self):
+        """Apply the buffered changes now."""
+        with self._flush_lock:
+            self._flush_thread = None
+            changes, self._changes = self._changes, FdbChanges()
+            if not changes.networks:
+                return
+            LOG.debug("applying %d fdb records of %d networks" %
+                      (len(changes), len(changes.networks)))
+            try:
+                self.apply_changes(changes)
+            except Exception as exc:
+                LOG.exception("fdb update failed: %s" % exc)
@@ -0,0 +1,145 @@
+"""Shadow copy of the fdb records of BIG-IP tunnels."""
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from collections import OrderedDict
+import time
+
+from eventlet import semaphore
+from oslo_log import log as logging
+from requests.exceptions import HTTPError
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_RECONCILE_INTERVAL = 600
+
+
+class TunnelRecords(object):
+    """The loaded tunnel and its fdb records by MAC address."""
+
+    def __init__(self, tunnel, loaded_at):
+        self.tunnel = tunnel
+        self.loaded_at = loaded_at
+        self.records = OrderedDict(
+            (record['name'], record)
+            for record in getattr(tunnel, 'records', None) or [])
+
+
+class FdbShadowTable(object):
+    """fdb records of the BIG-IP tunnels, kept by the agent.
+
+    A tunnel's records are loaded from the device the first time they
+    are needed and are then authoritative: adding and deleting records
+    computes the new record list from the shadow copy and writes it
+    with the loaded tunnel, without reading the tunnel again. The
+    records are loaded again, fixing any drift, once they are older
+    than reconcile_interval seconds, or after a write fails.
+    """
+
+    def __init__(self, reconcile_interval=DEFAULT_RECONCILE_INTERVAL):
+        self.reconcile_interval = reconcile_interval
+        # (bigip hostname, partition, tunnel name) -> TunnelRecords
+        self._tunnels = dict()
+        self._locks = dict()
+
+    def __len__(self):
+        return len(self._tunnels)
+
+    def get_records(self, bigip, tunnel_name, partition, now=None):
+        """Return the records of a tunnel, or None if it does not exist."""
+        tunnel_records = self._get(bigip, tunnel_name, partition, now)
+        if tunnel_records is None:
+            return None
+        return list(tunnel_records.records.values())
+
+    def update(self, bigip, tunnel_name, partition, add_records=None,
+               delete_records=None, now=None):
+        """Add and delete records of a tunnel.
+
+        Records are dicts of {'endpoint'} by MAC address. The tunnel is
+        written only if its records change. Returns the MAC addresses of
+        the records deleted, or None if the tunnel does not exist.
+        """
+        key = (bigip.hostname, partition, tunnel_name)
+        with self._locks.setdefault(key, semaphore.Semaphore()):
+            tunnel_records = self._get(bigip, tunnel_name, partition, now)
+            if tunnel_records is None:
+                return None
+
+            records = tunnel_records.records
+            changed = False
+            deleted = list()
+            for mac_address in delete_records or {}:
+                if records.pop(mac_address, None) is not None:
+                    deleted.append(mac_address)
+                    changed = True
+            for mac_address, record in (add_records or {}).iteritems():
+                existing = records.get(mac_address, None)
+                if existing is None or \
+                        existing.get('endpoint') != record['endpoint']:
+                    records[mac_address] = {'name': mac_address,
+                                            'endpoint': record['endpoint']}
+                    changed = True
+
+            if changed:
+                try:
+                    tunnel_records.tunnel.modify(
+                        records=list(records.values()) or None)
+                except HTTPError as err:
+                    self.invalidate(bigip, tunnel_name, partition)
+                    if err.response.status_code == 404:
+                        LOG.debug("Tunnel %s does not exist." % tunnel_name)
+                        return None
+                    raise
+                except Exception:
+                    self.invalidate(bigip, tunnel_name, partition)
+                    raise
+            return deleted
+
+    def invalidate(self, bigip=None, tunnel_name=None, partition=None):
+        """Forget a tunnel, the tunnels of a bigip, or all tunnels."""
+        if bigip is None:
+            self._tunnels.clear()
+        elif tunnel_name is None:
+            for key in [key for key in self._tunnels
+                        if key[0] == bigip.hostname]:
+                del self._tunnels[key]
+        else:
+            self._tunnels.pop((bigip.hostname, partition, tunnel_name), None)
+
+    def _get(self, bigip, tunnel_name, partition, now=None):
+        now = time.time() if now is None else now
+        key = (bigip.hostname, partition, tunnel_name)
+        tunnel_records = self._tunnels.get(key, None)
+        if tunnel_records is not None and (
+                not self.reconcile_interval or
+                now - tunnel_records.loaded_at < self.reconcile_interval):
+            return tunnel_records
+
+        try:
+            tunnel = bigip.tm.net.fdb.tunnels.tunnel.load(
+                name=tunnel_name, partition=partition)
+        except HTTPError as err:
+            self._tunnels.pop(key, None)
+            if err.response.status_code == 404:
+                LOG.debug("Tunnel %s does not exist." % tunnel_name)
+                return None
+            raise
+        loaded = TunnelRecords(tunnel, now)
+        if tunnel_records is not None and \
+                tunnel_records.records != loaded.records:
+            LOG.info("fdb records of tunnel %s on %s drifted, reconciled" %
+                     (tunnel_name, bigip.hostname))
+        self._tunnels[key] = loaded
+        return loaded
@@ -14,6 +14,7 @@
 # limitations under the License.
 #
 
+import copy
 import datetime
 import hashlib
 import json
@@ -33,24 +34,41 @@ from oslo_log import log as logging
 from oslo_utils import importutils
 
 from f5.bigip import ManagementRoot
+from f5_openstack_agent.lbaasv2.drivers.bigip.assured_cache import \
+    AssuredCache
+from f5_openstack_agent.lbaasv2.drivers.bigip.cluster_executor import \
+    ClusterExecutor
 from f5_openstack_agent.lbaasv2.drivers.bigip.cluster_manager import \
     ClusterManager
 from f5_openstack_agent.lbaasv2.drivers.bigip import constants_v2 as f5const
 from f5_openstack_agent.lbaasv2.drivers.bigip.esd_filehandler import \
     EsdTagProcessor
 from f5_openstack_agent.lbaasv2.drivers.bigip import exceptions as f5ex
+from f5_openstack_agent.lbaasv2.drivers.bigip.fdb_pipeline import \
+    FdbPipeline
 from f5_openstack_agent.lbaasv2.drivers.bigip.lbaas_builder import \
     LBaaSBuilder
 from f5_openstack_agent.lbaasv2.drivers.bigip.lbaas_driver import \
     LBaaSBaseDriver
+from f5_openstack_agent.lbaasv2.drivers.bigip.member_states import \
+    MemberStateTracker
 from f5_openstack_agent.lbaasv2.drivers.bigip import network_helper
 from f5_openstack_agent.lbaasv2.drivers.bigip.network_service import \
     NetworkServiceBuilder
+from f5_openstack_agent.lbaasv2.drivers.bigip.port_allocator import \
+    PortAllocator
 from f5_openstack_agent.lbaasv2.drivers.bigip import resource_helper
+from f5_openstack_agent.lbaasv2.drivers.bigip import resource_snapshot
+from f5_openstack_agent.lbaasv2.drivers.bigip.route_domain_allocator import \
+    RouteDomainIdAllocator
 from f5_openstack_agent.lbaasv2.drivers.bigip.service_adapter import \
     ServiceModelAdapter
+from f5_openstack_agent.lbaasv2.drivers.bigip.service_scheduler import \
+    ServiceScheduler
 from f5_openstack_agent.lbaasv2.drivers.bigip import ssl_profile
 from f5_openstack_agent.lbaasv2.drivers.bigip import stat_helper
+from f5_openstack_agent.lbaasv2.drivers.bigip.status_sink import \
+    StatusSink
 from f5_openstack_agent.lbaasv2.drivers.bigip.system_helper import \
     SystemHelper
 from f5_openstack_agent.lbaasv2.drivers.bigip.tenants import \
@@ -220,6 +238,38 @@ OPTS = [  # XXX maybe we should make this a dictionary
         help='How many routing tables the BIG-IP will allocate per tenant'
              ' in order to accommodate overlapping IP subnets'
     ),
+    cfg.IntOpt(
+        'max_route_domain_cache_tenants', default=1000,
+        help='How many tenants to cache the route domain subnets of'
+    ),
+    cfg.FloatOpt(
+        'f5_fdb_update_interval', default=1.0,
+        help='Seconds for which L2 population fdb notifications are '
+             'merged before the BIG-IP tunnels are updated'
+    ),
+    cfg.IntOpt(
+        'f5_snat_index_revalidate_interval', default=300,
+        help='Seconds after which the SNAT pool membership cached for '
+             'each BIG-IP is loaded again'
+    ),
+    cfg.IntOpt(
+        'f5_stats_snapshot_interval', default=10,
+        help='Seconds for which the virtual server stats of each BIG-IP, '
+             'loaded with one request, serve load balancer stats '
+             'updates. 0 loads the stats of each listener separately'
+    ),
+    cfg.IntOpt(
+        'f5_assured_cache_ttl', default=300,
+        help='Seconds, jittered per entry, after which the networks, '
+             'self IPs, SNATs and gateways assured on each BIG-IP are '
+             'verified again'
+    ),
+    cfg.FloatOpt(
+        'f5_status_update_interval', default=0.5,
+        help='Seconds for which object status updates are merged before '
+             'they are sent to the plugin in one message per load '
+             'balancer. 0 sends them at once'
+    ),
     cfg.StrOpt(
         'cert_manager',
         default=None,
@@ -293,9 +343,28 @@ OPTS = [  # XXX maybe we should make this a dictionary
         'trace_service_requests',
         default=False,
         help='Log service object.'
+    ),
+    cfg.IntOpt(
+        'max_concurrent_service_requests',
+        default=1,
+        help='How many service requests for unrelated loadbalancers, '
+             'tenants and networks may be provisioned at the same time. '
+             'The default of 1 provisions every request one at a time; '
+             'a larger value opts in to parallel provisioning'
+    ),
+    cfg.IntOpt(
+        'max_concurrent_requests_per_device',
+        default=2,
+        help='How many operations fanned out to the BIG-IPs of a cluster '
+             'may run against a single BIG-IP at the same time'
     )
 ]
 
+# capacity metrics computed from the device global statistics
+GLOBAL_STATISTICS_METRICS = set(['inbound_throughput', 'outbound_throughput',
+                                 'throughput', 'active_connections',
+                                 'ssltps'])
+
 
 def is_operational(method):
     # Decorator to check we are operational before provisioning.
@@ -337,6 +406,16 @@ class iControlDriver(LBaaSBaseDriver):
         self.agent_report_state = None  # overrides base, same value
         self.operational = False  # overrides base, same value
         self.driver_name = 'f5-lbaasv2-icontrol'
+        self.service_queue = ServiceScheduler(
+            self.conf.max_concurrent_service_requests)
+        self.cluster_executor = ClusterExecutor(
+            self.conf.max_concurrent_requests_per_device)
+        self.port_allocator = PortAllocator(self)
+        self.fdb_pipeline = FdbPipeline(self._apply_fdb_changes,
+                                        self.conf.f5_fdb_update_interval)
+        self.status_sink = StatusSink(self,
+                                      self.conf.f5_status_update_interval)
+        self.member_states = MemberStateTracker()
 
         #
         # BIG-IP containers
@@ -368,7 +447,8 @@ class iControlDriver(LBaaSBaseDriver):
         self.cert_manager = None  # overrides register_OPTS
 
         # server helpers
-        self.stat_helper = stat_helper.StatHelper()
+        self.stat_helper = stat_helper.StatHelper(
+            cache_seconds=f5const.DEVICE_STATS_CACHE_SECONDS)
         self.network_helper = network_helper.NetworkHelper()
 
         # f5-sdk helpers
@@ -377,6 +457,10 @@ class iControlDriver(LBaaSBaseDriver):
         self.pool_manager = resource_helper.BigIPResourceHelper(
             resource_helper.ResourceType.pool)
 
+        # device resource collections shared by a resync, see
+        # open_resource_snapshot
+        self.resource_snapshot = None
+
         try:
 
             # debug logging of service requests recieved by driver
@@ -738,9 +822,11 @@ class iControlDriver(LBaaSBaseDriver):
                       (bigip.device_name, ', '.join(bigip.mac_addresses)))
             bigip.device_interfaces = \
                 self.system_helper.get_interface_macaddresses_dict(bigip)
-            bigip.assured_networks = {}
-            bigip.assured_tenant_snat_subnets = {}
-            bigip.assured_gateway_subnets = []
+            ttl = self.conf.f5_assured_cache_ttl
+            bigip.assured_networks = AssuredCache(ttl)
+            bigip.assured_tenant_snat_subnets = AssuredCache(ttl)
+            bigip.assured_gateway_subnets = AssuredCache(ttl)
+            bigip.route_domain_ids = RouteDomainIdAllocator()
 
             if self.conf.f5_ha_type != 'standalone':
                 self.cluster_manager.disable_auto_sync(
@@ -987,40 +1073,48 @@ class iControlDriver(LBaaSBaseDriver):
             highest_metric = 0.0
             highest_metric_name = None
             my_methods = dir(self)
-            bigips = self.get_all_bigips()
+            metrics = []
             for metric in capacity_policy:
-                func_name = 'get_' + metric
-                if func_name in my_methods:
-                    max_capacity = int(capacity_policy[metric])
-                    metric_func = getattr(self, func_name)
-                    metric_value = 0
-                    for bigip in bigips:
-                        if bigip.status == 'active':
-                            global_stats = \
-                                self.stat_helper.get_global_statistics(bigip)
-                            value = int(
-                                metric_func(bigip=bigip,
-                                            global_statistics=global_stats)
-                            )
-                            LOG.debug('calling capacity %s on %s returned: %s'
-                                      % (func_name, bigip.hostname, value))
-                        else:
-                            value = 0
-                        if value > metric_value:
-                            metric_value = value
-                    metric_capacity = float(metric_value) / float(max_capacity)
-                    if metric_capacity > highest_metric:
-                        highest_metric = metric_capacity
-                        highest_metric_name = metric
+                if 'get_' + metric in my_methods:
+                    metrics.append(metric)
                 else:
                     LOG.warn('capacity policy has method '
                              '%s which is not implemented in this driver'
                              % metric)
+            bigips = [bigip for bigip in self.get_all_bigips()
+                      if bigip.status == 'active']
+            device_metrics = self.cluster_executor.map(
+                bigips, self._get_capacity_metrics, metrics)
+            for metric in metrics:
+                max_capacity = int(capacity_policy[metric])
+                metric_value = 0
+                for values in device_metrics:
+                    if values[metric] > metric_value:
+                        metric_value = values[metric]
+                metric_capacity = float(metric_value) / float(max_capacity)
+                if metric_capacity > highest_metric:
+                    highest_metric = metric_capacity
+                    highest_metric_name = metric
             LOG.debug('capacity score: %s based on %s'
                       % (highest_metric, highest_metric_name))
             return highest_metric
         return 0
 
+    def _get_capacity_metrics(self, bigip, metrics):
+        # The global statistics are loaded once per device and shared
+        # by every metric.
+        global_stats = None
+        if set(metrics) & GLOBAL_STATISTICS_METRICS:
+            global_stats = self.stat_helper.get_global_statistics(bigip)
+        values = {}
+        for metric in metrics:
+            func_name = 'get_' + metric
+            values[metric] = int(getattr(self, func_name)(
+                bigip=bigip, global_statistics=global_stats))
+            LOG.debug('calling capacity %s on %s returned: %s'
+                      % (func_name, bigip.hostname, values[metric]))
+        return values
+
     def set_context(self, context):
         # Context to keep for database access
         if self.network_builder:
@@ -1048,25 +1142,32 @@ class iControlDriver(LBaaSBaseDriver):
         return self._service_exists(service)
 
     def flush_cache(self):
-        # Remove cached objects so they can be created if necessary
-        for bigip in self.get_all_bigips():
-            bigip.assured_networks = {}
-            bigip.assured_tenant_snat_subnets = {}
-            bigip.assured_gateway_subnets = []
+        # Remove cached objects so they can be created if necessary.
+        # The networks, self IPs, SNATs and gateways assured on each
+        # bigip are verified again as their entries expire, spread over
+        # f5_assured_cache_ttl, rather than all at once here.
+        self.port_allocator.invalidate()
+        if self.network_builder:
+            self.network_builder.bigip_snat_manager.invalidate_snat_index()
+            self.network_builder.l2_service.invalidate_fdb_table()
 
     @serialized('get_all_deployed_loadbalancers')
     @is_operational
     def get_all_deployed_loadbalancers(self, purge_orphaned_folders=False):
         LOG.debug('getting all deployed loadbalancers on BIG-IPs')
         deployed_lb_dict = {}
+        snapshot = self._get_resource_snapshot()
+        self._load_deployed_resources(
+            snapshot, [resource_helper.ResourceType.virtual_address])
         for bigip in self.get_all_bigips():
-            folders = self.system_helper.get_folders(bigip)
+            folders = list(snapshot.get_folders(bigip))
             for folder in folders:
                 tenant_id = folder[len(self.service_adapter.prefix):]
                 if str(folder).startswith(self.service_adapter.prefix):
-                    resource = resource_helper.BigIPResourceHelper(
-                        resource_helper.ResourceType.virtual_address)
-                    deployed_lbs = resource.get_resources(bigip, folder)
+                    resource_type = \
+                        resource_helper.ResourceType.virtual_address
+                    deployed_lbs = snapshot.get_resources(
+                        bigip, resource_type, folder)
                     if deployed_lbs:
                         for lb in deployed_lbs:
                             lb_id = lb.name[len(self.service_adapter.prefix):]
@@ -1083,7 +1184,9 @@ class iControlDriver(LBaaSBaseDriver):
                         # delay to assure we are not in the tenant creation
                         # process before a virtual address is created.
                         greenthread.sleep(10)
-                        deployed_lbs = resource.get_resources(bigip, folder)
+                        snapshot.invalidate(bigip=bigip, partition=folder)
+                        deployed_lbs = snapshot.get_resources(
+                            bigip, resource_type, folder)
                         if deployed_lbs:
                             for lb in deployed_lbs:
                                 lb_id = lb.name[
@@ -1103,6 +1206,8 @@ class iControlDriver(LBaaSBaseDriver):
                                 except Exception as exc:
                                     LOG.error('error purging folder %s: %s' %
                                               (folder, str(exc)))
+                                snapshot.invalidate(bigip=bigip,
+                                                    partition=folder)
         return deployed_lb_dict
 
     @serialized('get_all_deployed_listeners')
@@ -1110,15 +1215,18 @@ class iControlDriver(LBaaSBaseDriver):
     def get_all_deployed_listeners(self, expand_subcollections=False):
         LOG.debug('getting all deployed listeners on BIG-IPs')
         deployed_virtual_dict = {}
+        snapshot = self._get_resource_snapshot()
+        self._load_deployed_resources(
+            snapshot, [resource_helper.ResourceType.virtual],
+            expand_subcollections)
         for bigip in self.get_all_bigips():
-            folders = self.system_helper.get_folders(bigip)
+            folders = snapshot.get_folders(bigip)
             for folder in folders:
                 tenant_id = folder[len(self.service_adapter.prefix):]
                 if str(folder).startswith(self.service_adapter.prefix):
-                    resource = resource_helper.BigIPResourceHelper(
-                        resource_helper.ResourceType.virtual)
-                    deployed_listeners = resource.get_resources(
-                        bigip, folder, expand_subcollections)
+                    deployed_listeners = snapshot.get_resources(
+                        bigip, resource_helper.ResourceType.virtual, folder,
+                        expand_subcollections)
                     if deployed_listeners:
                         for virtual in deployed_listeners:
                             virtual_id = \
@@ -1147,10 +1255,12 @@ class iControlDriver(LBaaSBaseDriver):
     def purge_orphaned_nodes(self, tenant_members):
         node_helper = resource_helper.BigIPResourceHelper(
             resource_helper.ResourceType.node)
+        snapshot = self._get_resource_snapshot()
         for bigip in self.get_all_bigips():
             for tenant_id, members in tenant_members.iteritems():
                 partition = self.service_adapter.prefix + tenant_id
-                nodes = node_helper.get_resources(bigip, partition=partition)
+                nodes = snapshot.get_resources(
+                    bigip, resource_helper.ResourceType.node, partition)
                 node_dict = {n.name: n for n in nodes}
 
                 for member in members:
@@ -1166,20 +1276,24 @@ class iControlDriver(LBaaSBaseDriver):
                     except HTTPError as error:
                         if error.response.status_code == 400:
                             LOG.error(error.response)
+                if node_dict:
+                    snapshot.invalidate(bigip=bigip, partition=partition)
 
     @serialized('get_all_deployed_pools')
     @is_operational
     def get_all_deployed_pools(self):
         LOG.debug('getting all deployed pools on BIG-IPs')
         deployed_pool_dict = {}
+        snapshot = self._get_resource_snapshot()
+        self._load_deployed_resources(
+            snapshot, [resource_helper.ResourceType.pool])
         for bigip in self.get_all_bigips():
-            folders = self.system_helper.get_folders(bigip)
+            folders = snapshot.get_folders(bigip)
             for folder in folders:
                 tenant_id = folder[len(self.service_adapter.prefix):]
                 if str(folder).startswith(self.service_adapter.prefix):
-                    resource = resource_helper.BigIPResourceHelper(
-                        resource_helper.ResourceType.pool)
-                    deployed_pools = resource.get_resources(bigip, folder)
+                    deployed_pools = snapshot.get_resources(
+                        bigip, resource_helper.ResourceType.pool, folder)
                     if deployed_pools:
                         for pool in deployed_pools:
                             pool_id = \
@@ -1244,6 +1358,8 @@ class iControlDriver(LBaaSBaseDriver):
                                   % (pool_id, bigip.hostname))
                 except Exception as exc:
                     LOG.exception('Exception purging pool %s' % str(exc))
+        self._invalidate_resource_snapshot(
+            partition=self.service_adapter.get_folder_name(tenant_id))
 
     @serialized('get_all_deployed_monitors')
     @is_operational
@@ -1254,18 +1370,21 @@ class iControlDriver(LBaaSBaseDriver):
                          'ping_monitor']
         deployed_monitor_dict = {}
         adapter_prefix = self.service_adapter.prefix
+        snapshot = self._get_resource_snapshot()
+        self._load_deployed_resources(
+            snapshot, [getattr(resource_helper.ResourceType, monitor_type)
+                       for monitor_type in monitor_types])
         for bigip in self.get_all_bigips():
-            folders = self.system_helper.get_folders(bigip)
+            folders = snapshot.get_folders(bigip)
             for folder in folders:
                 tenant_id = folder[len(adapter_prefix):]
                 if str(folder).startswith(adapter_prefix):
-                    resources = map(
-                        lambda x: resource_helper.BigIPResourceHelper(
-                            getattr(resource_helper.ResourceType, x)),
-                        monitor_types)
-                    for resource in resources:
-                        deployed_monitors = resource.get_resources(
-                            bigip, folder)
+                    for monitor_type in monitor_types:
+                        deployed_monitors = snapshot.get_resources(
+                            bigip,
+                            getattr(resource_helper.ResourceType,
+                                    monitor_type),
+                            folder)
                         if deployed_monitors:
                             for monitor in deployed_monitors:
                                 monitor_id = monitor.name[len(adapter_prefix):]
@@ -1313,6 +1432,8 @@ class iControlDriver(LBaaSBaseDriver):
                                       monitor_name))
                 except Exception as exc:
                     LOG.exception('Exception purging monitor %s' % str(exc))
+        self._invalidate_resource_snapshot(
+            partition=self.service_adapter.get_folder_name(tenant_id))
 
     @serialized('get_all_deployed_l7_policys')
     @is_operational
@@ -1330,15 +1451,16 @@ class iControlDriver(LBaaSBaseDriver):
         """
         LOG.debug('getting all deployed l7_policys on BIG-IP\'s')
         deployed_l7_policys_dict = {}
+        snapshot = self._get_resource_snapshot()
+        self._load_deployed_resources(
+            snapshot, [resource_helper.ResourceType.l7policy])
         for bigip in self.get_all_bigips():
-            folders = self.system_helper.get_folders(bigip)
+            folders = snapshot.get_folders(bigip)
             for folder in folders:
                 tenant_id = folder[len(self.service_adapter.prefix):]
                 if str(folder).startswith(self.service_adapter.prefix):
-                    resource = resource_helper.BigIPResourceHelper(
-                        resource_helper.ResourceType.l7policy)
-                    deployed_l7_policys = resource.get_resources(
-                        bigip, folder)
+                    deployed_l7_policys = snapshot.get_resources(
+                        bigip, resource_helper.ResourceType.l7policy, folder)
                     if deployed_l7_policys:
                         for l7_policy in deployed_l7_policys:
                             l7_policy_id = l7_policy.name
@@ -1394,6 +1516,8 @@ class iControlDriver(LBaaSBaseDriver):
                         hostname=bigip.hostname, listener_id=listener_id)
                     LOG.exception('Exception: purge_orphaned_l7_policy({}) '
                                   '"{}"'.format(kwargs, exc))
+        self._invalidate_resource_snapshot(
+            partition=self.service_adapter.get_folder_name(tenant_id))
 
     @serialized('purge_orphaned_loadbalancer')
     @is_operational
@@ -1435,6 +1559,8 @@ class iControlDriver(LBaaSBaseDriver):
                 except Exception as exc:
                     LOG.exception('Exception purging loadbalancer %s'
                                   % str(exc))
+        self._invalidate_resource_snapshot(
+            partition=self.service_adapter.get_folder_name(tenant_id))
 
     @serialized('purge_orphaned_listener')
     @is_operational
@@ -1456,14 +1582,16 @@ class iControlDriver(LBaaSBaseDriver):
                                   % (listener_id, bigip.hostname))
                 except Exception as exc:
                     LOG.exception('Exception purging listener %s' % str(exc))
+        self._invalidate_resource_snapshot(
+            partition=self.service_adapter.get_folder_name(tenant_id))
 
-    @serialized('create_loadbalancer')
+    @serialized('create_loadbalancer', coalesce=True)
     @is_operational
     def create_loadbalancer(self, loadbalancer, service):
         """Create virtual server."""
         return self._common_service_handler(service)
 
-    @serialized('update_loadbalancer')
+    @serialized('update_loadbalancer', coalesce=True)
     @is_operational
     def update_loadbalancer(self, old_loadbalancer, loadbalancer, service):
         """Update virtual server."""
@@ -1480,7 +1608,7 @@ class iControlDriver(LBaaSBaseDriver):
             delete_partition=True,
             delete_event=True)
 
-    @serialized('create_listener')
+    @serialized('create_listener', coalesce=True)
     @is_operational
     def create_listener(self, listener, service):
         """Create virtual server."""
@@ -1495,42 +1623,42 @@ class iControlDriver(LBaaSBaseDriver):
         service['old_listener'] = old_listener
         return self._common_service_handler(service)
 
-    @serialized('delete_listener')
+    @serialized('delete_listener', coalesce=True)
     @is_operational
     def delete_listener(self, listener, service):
         """Delete virtual server."""
         LOG.debug("Deleting listener")
         return self._common_service_handler(service)
 
-    @serialized('create_pool')
+    @serialized('create_pool', coalesce=True)
     @is_operational
     def create_pool(self, pool, service):
         """Create lb pool."""
         LOG.debug("Creating pool")
         return self._common_service_handler(service)
 
-    @serialized('update_pool')
+    @serialized('update_pool', coalesce=True)
     @is_operational
     def update_pool(self, old_pool, pool, service):
         """Update lb pool."""
         LOG.debug("Updating pool")
         return self._common_service_handler(service)
 
-    @serialized('delete_pool')
+    @serialized('delete_pool', coalesce=True)
     @is_operational
     def delete_pool(self, pool, service):
         """Delete lb pool."""
         LOG.debug("Deleting pool")
         return self._common_service_handler(service)
 
-    @serialized('create_member')
+    @serialized('create_member', coalesce=True)
     @is_operational
     def create_member(self, member, service):
         """Create pool member."""
         LOG.debug("Creating member")
         return self._common_service_handler(service)
 
-    @serialized('update_member')
+    @serialized('update_member', coalesce=True)
     @is_operational
     def update_member(self, old_member, member, service):
         """Update pool member."""
@@ -1544,14 +1672,14 @@ class iControlDriver(LBaaSBaseDriver):
         LOG.debug("Deleting member")
         return self._common_service_handler(service, delete_event=True)
 
-    @serialized('create_health_monitor')
+    @serialized('create_health_monitor', coalesce=True)
     @is_operational
     def create_health_monitor(self, health_monitor, service):
         """Create pool health monitor."""
         LOG.debug("Creating health monitor")
         return self._common_service_handler(service)
 
-    @serialized('update_health_monitor')
+    @serialized('update_health_monitor', coalesce=True)
     @is_operational
     def update_health_monitor(self, old_health_monitor,
                               health_monitor, service):
@@ -1559,7 +1687,7 @@ class iControlDriver(LBaaSBaseDriver):
         LOG.debug("Updating health monitor")
         return self._common_service_handler(service)
 
-    @serialized('delete_health_monitor')
+    @serialized('delete_health_monitor', coalesce=True)
     @is_operational
     def delete_health_monitor(self, health_monitor, service):
         """Delete pool health monitor."""
@@ -1598,23 +1726,40 @@ class iControlDriver(LBaaSBaseDriver):
         finally:
             return lb_stats
 
+    def get_stats_request_count(self, service):
+        """Return the stats requests get_stats makes to each BIG-IP."""
+        listeners = service.get('listeners', [])
+        stats_snapshot = self.lbaas_builder.listener_builder.stats_snapshot
+        if stats_snapshot is not None:
+            # one at most, when the stats shared with the listeners of
+            # other services are loaded again
+            if listeners and any(stats_snapshot.is_stale(bigip)
+                                 for bigip in self.get_config_bigips()):
+                return 1
+            return 0
+        # the virtual of each listener is found, loaded and its stats loaded
+        return 3 * len(listeners)
+
     def fdb_add(self, fdb):
         # Add (L2toL3) forwarding database entries
         self.remove_ips_from_fdb_update(fdb)
-        for bigip in self.get_all_bigips():
-            self.network_builder.add_bigip_fdb(bigip, fdb)
+        self.fdb_pipeline.add(fdb)
 
     def fdb_remove(self, fdb):
         # Remove (L2toL3) forwarding database entries
         self.remove_ips_from_fdb_update(fdb)
-        for bigip in self.get_all_bigips():
-            self.network_builder.remove_bigip_fdb(bigip, fdb)
+        self.fdb_pipeline.remove(fdb)
 
     def fdb_update(self, fdb):
         # Update (L2toL3) forwarding database entries
         self.remove_ips_from_fdb_update(fdb)
-        for bigip in self.get_all_bigips():
-            self.network_builder.update_bigip_fdb(bigip, fdb)
+        self.fdb_pipeline.add(fdb)
+
+    def _apply_fdb_changes(self, fdb_changes):
+        # Write the fdb changes merged by the fdb pipeline to the bigips
+        self.cluster_executor.map(
+            self.get_all_bigips(), self.network_builder.apply_bigip_fdb,
+            fdb_changes)
 
     # remove ips from fdb update so we do not try to
     # add static arps for them because we do not have
@@ -1662,15 +1807,39 @@ class iControlDriver(LBaaSBaseDriver):
         else:
             LOG.debug("Attempted sync of deleted pool")
 
+    @serialized('plan_service')
+    @is_operational
+    def plan_service(self, service):
+        """Return the device changes a sync of the service would make.
+
+        This is a dry run: the resources of the service are read from
+        the BIG-IPs and compared, but nothing is written. The plan is
+        logged, one line per change.
+        """
+        service = copy.deepcopy(service)
+        loadbalancer = service['loadbalancer']
+        loadbalancer['traffic_group'] = self.service_to_traffic_group(service)
+        if self.network_builder:
+            self.network_builder._annotate_service_route_domains(service)
+
+        plan = self.lbaas_builder.plan_service(service)
+        LOG.info("plan of loadbalancer %s: %s" %
+                 (loadbalancer['id'], plan.summary()))
+        for change in plan:
+            LOG.info("    %s" % change)
+        return plan
+
     @serialized('backup_configuration')
     @is_operational
     def backup_configuration(self):
         # Save Configuration on Devices
-        for bigip in self.get_all_bigips():
+        def save_config(bigip):
             LOG.debug('_backup_configuration: saving device %s.'
                       % bigip.hostname)
             self.cluster_manager.save_config(bigip)
 
+        self.cluster_executor.map(self.get_all_bigips(), save_config)
+
     def _get_monitor_endpoint(self, bigip, service):
         monitor_type = self.service_adapter.get_monitor_type(service)
         if not monitor_type:
@@ -1785,10 +1954,14 @@ class iControlDriver(LBaaSBaseDriver):
             # append route domain to member address
             self.network_builder._annotate_service_route_domains(service)
 
+        # Answer from collections loaded once per partition, shared with
+        # every other service checked while a snapshot is open.
+        snapshot = self._get_resource_snapshot()
+
         # Foreach bigip in the cluster:
         for bigip in self.get_config_bigips():
             # Does the tenant folder exist?
-            if not self.system_helper.folder_exists(bigip, folder_name):
+            if not snapshot.folder_exists(bigip, folder_name):
                 LOG.error("Folder %s does not exists on bigip: %s" %
                           (folder_name, bigip.hostname))
                 return False
@@ -1796,7 +1969,9 @@ class iControlDriver(LBaaSBaseDriver):
             # Get the virtual address
             virtual_address = VirtualAddress(self.service_adapter,
                                              loadbalancer)
-            if not virtual_address.exists(bigip):
+            if not snapshot.exists(
+                    bigip, resource_helper.ResourceType.virtual_address,
+                    virtual_address.name, folder_name):
                 LOG.error("Virtual address %s(%s) does not "
                           "exists on bigip: %s" % (virtual_address.name,
                                                    virtual_address.address,
@@ -1809,9 +1984,10 @@ class iControlDriver(LBaaSBaseDriver):
                 svc = {"loadbalancer": loadbalancer,
                        "listener": listener}
                 virtual_server = self.service_adapter.get_virtual_name(svc)
-                if not self.vs_manager.exists(bigip,
-                                              name=virtual_server['name'],
-                                              partition=folder_name):
+                if not snapshot.exists(bigip,
+                                       resource_helper.ResourceType.virtual,
+                                       virtual_server['name'],
+                                       folder_name):
                     LOG.error("Virtual /%s/%s not found on bigip: %s" %
                               (virtual_server['name'], folder_name,
                                bigip.hostname))
@@ -1822,59 +1998,95 @@ class iControlDriver(LBaaSBaseDriver):
                 svc = {"loadbalancer": loadbalancer,
                        "pool": pool}
                 bigip_pool = self.service_adapter.get_pool(svc)
-                if not self.pool_manager.exists(
-                        bigip,
-                        name=bigip_pool['name'],
-                        partition=folder_name):
+                deployed_members = snapshot.get_pool_members(
+                    bigip, folder_name, bigip_pool['name'])
+                if deployed_members is None:
                     LOG.error("Pool /%s/%s not found on bigip: %s" %
                               (folder_name, bigip_pool['name'],
                                bigip.hostname))
                     return False
-                else:
-                    deployed_pool = self.pool_manager.load(
-                        bigip,
-                        name=bigip_pool['name'],
-                        partition=folder_name)
-                    deployed_members = \
-                        deployed_pool.members_s.get_collection()
-
-                    # First check that number of members deployed
-                    # is equal to the number in the service.
-                    if len(deployed_members) != len(pool['members']):
-                        LOG.error("Pool %s members member count mismatch "
-                                  "match: deployed %d != service %d" %
-                                  (bigip_pool['name'], len(deployed_members),
-                                   len(pool['members'])))
-                        return False
 
-                    # Ensure each pool member exists
-                    for member in service['members']:
-                        if member['pool_id'] == pool['id']:
-                            lb = self.lbaas_builder
-                            pool = lb.get_pool_by_id(
-                                service, member["pool_id"])
-                            svc = {"loadbalancer": loadbalancer,
-                                   "member": member,
-                                   "pool": pool}
-                            if not lb.pool_builder.member_exists(svc, bigip):
-                                LOG.error("Pool member not found: %s" %
-                                          svc['member'])
-                                return False
+                # First check that number of members deployed
+                # is equal to the number in the service.
+                if len(deployed_members) != len(pool['members']):
+                    LOG.error("Pool %s members member count mismatch "
+                              "match: deployed %d != service %d" %
+                              (bigip_pool['name'], len(deployed_members),
+                               len(pool['members'])))
+                    return False
+
+                # Ensure each pool member exists
+                for member in service['members']:
+                    if member['pool_id'] == pool['id']:
+                        svc = {"loadbalancer": loadbalancer,
+                               "member": member,
+                               "pool": pool}
+                        bigip_member = self.service_adapter.get_member(svc)
+                        if bigip_member['name'] not in deployed_members:
+                            LOG.error("Pool member not found: %s" %
+                                      svc['member'])
+                            return False
 
             # Ensure that each health monitor exists.
             for healthmonitor in service['healthmonitors']:
                 svc = {"loadbalancer": loadbalancer,
                        "healthmonitor": healthmonitor}
                 monitor = self.service_adapter.get_healthmonitor(svc)
-                monitor_ep = self._get_monitor_endpoint(bigip, svc)
-                if not monitor_ep.exists(name=monitor['name'],
-                                         partition=folder_name):
+                if not snapshot.exists(bigip,
+                                       self._get_monitor_resource_type(svc),
+                                       monitor['name'],
+                                       folder_name):
                     LOG.error("Monitor /%s/%s not found on bigip: %s" %
                               (monitor['name'], folder_name, bigip.hostname))
                     return False
 
         return True
 
+    def _get_monitor_resource_type(self, service):
+        monitor_type = self.service_adapter.get_monitor_type(service)
+
+        if monitor_type == "HTTPS":
+            return resource_helper.ResourceType.https_monitor
+        elif monitor_type == "TCP":
+            return resource_helper.ResourceType.tcp_monitor
+        elif monitor_type == "PING":
+            return resource_helper.ResourceType.ping_monitor
+        else:
+            return resource_helper.ResourceType.http_monitor
+
+    def open_resource_snapshot(self):
+        """Share device resource collections until the snapshot is closed.
+
+        Used by the agent manager to answer service_exists for every
+        service of a resync, and the get_all_deployed_* scans of an
+        orphan cleanup, from one collection query per partition.
+        """
+        self.resource_snapshot = resource_snapshot.BigIPResourceSnapshot()
+        return self.resource_snapshot
+
+    def close_resource_snapshot(self):
+        self.resource_snapshot = None
+
+    def _get_resource_snapshot(self):
+        # The open snapshot, or a private one for a single scan
+        return self.resource_snapshot or \
+            resource_snapshot.BigIPResourceSnapshot()
+
+    def _load_deployed_resources(self, snapshot, resource_types,
+                                 expand_subcollections=False):
+        # Fetch the tenant partition collections of all BIG-IPs
+        # concurrently; the scans then read them from the snapshot.
+        self.cluster_executor.map(
+            self.get_all_bigips(), snapshot.load_partitions,
+            self.service_adapter.prefix, resource_types,
+            expand_subcollections)
+
+    def _invalidate_resource_snapshot(self, bigip=None, partition=None):
+        # Must be called after changing a partition while a snapshot
+        # may be open.
+        if self.resource_snapshot:
+            self.resource_snapshot.invalidate(bigip=bigip, partition=partition)
+
     def get_loadbalancers_in_tenant(self, tenant_id):
         loadbalancers = self.plugin_rpc.get_all_loadbalancers()
 
@@ -1987,6 +2199,17 @@ class iControlDriver(LBaaSBaseDriver):
             if lb_provisioning_status == f5const.F5_PENDING_DELETE:
                 self.tenant_manager.assure_tenant_cleanup(service,
                                                           all_subnet_hints)
+                if self.network_builder:
+                    self.network_builder.invalidate_rds_cache(
+                        loadbalancer['tenant_id'])
+
+            # A resource snapshot open for a resync or an orphan cleanup
+            # must not answer from collections loaded before this service
+            # changed its partition, or the Common partition it shares.
+            self._invalidate_resource_snapshot(
+                partition=self.service_adapter.get_folder_name(
+                    loadbalancer['tenant_id']))
+            self._invalidate_resource_snapshot(partition='Common')
 
             if do_service_update:
                 self.update_service_status(service)
@@ -1999,6 +2222,40 @@ class iControlDriver(LBaaSBaseDriver):
 
         return lb_pending
 
+    def update_superseded_service_status(self, service, newer_service):
+        """Update status of objects only known to a superseded service.
+
+        The newer service snapshot was provisioned in place of this one
+        and its status update covers every object it contains. Objects
+        which are no longer part of the newer snapshot are reported here
+        so that the controller does not leave them pending.
+        """
+        if not self.plugin_rpc or not service or not newer_service:
+            return
+
+        stale = {}
+        for key in ['members', 'healthmonitors', 'pools', 'listeners',
+                    'l7policy_rules', 'l7policies']:
+            newer_ids = set(obj.get('id')
+                            for obj in newer_service.get(key, []))
+            objects = [obj for obj in service.get(key, [])
+                       if obj.get('id') not in newer_ids]
+            if objects:
+                stale[key] = objects
+
+        if 'members' in stale:
+            self._update_member_status(stale['members'], False)
+        if 'healthmonitors' in stale:
+            self._update_health_monitor_status(stale['healthmonitors'])
+        if 'pools' in stale:
+            self._update_pool_status(stale['pools'])
+        if 'listeners' in stale:
+            self._update_listener_status(stale)
+        if 'l7policy_rules' in stale:
+            self._update_l7rule_status(stale['l7policy_rules'])
+        if 'l7policies' in stale:
+            self._update_l7policy_status(stale['l7policies'])
+
     def update_service_status(self, service, timed_out=False):
         """Update status of objects in controller."""
         LOG.debug("_update_service_status")
@@ -2008,31 +2265,41 @@ class iControlDriver(LBaaSBaseDriver):
                       "RPC handler.")
             return
 
+        # Unchanged statuses are dropped and the rest are sent to the
+        # plugin in one batch for the loadbalancer.
+        rpc = self.plugin_rpc
+        if self.status_sink is not None:
+            rpc = self.status_sink.batch(service)
+
         if 'members' in service:
             # Call update_members_status
-            self._update_member_status(service['members'], timed_out)
+            self._update_member_status(service['members'], timed_out, rpc)
         if 'healthmonitors' in service:
             # Call update_monitor_status
             self._update_health_monitor_status(
-                service['healthmonitors']
+                service['healthmonitors'], rpc
             )
         if 'pools' in service:
             # Call update_pool_status
             self._update_pool_status(
-                service['pools']
+                service['pools'], rpc
             )
         if 'listeners' in service:
             # Call update_listener_status
-            self._update_listener_status(service)
+            self._update_listener_status(service, rpc)
         if 'l7policy_rules' in service:
-            self._update_l7rule_status(service['l7policy_rules'])
+            self._update_l7rule_status(service['l7policy_rules'], rpc)
         if 'l7policies' in service:
-            self._update_l7policy_status(service['l7policies'])
+            self._update_l7policy_status(service['l7policies'], rpc)
 
-        self._update_loadbalancer_status(service, timed_out)
+        self._update_loadbalancer_status(service, timed_out, rpc)
 
-    def _update_member_status(self, members, timed_out):
+        if rpc is not self.plugin_rpc:
+            rpc.flush()
+
+    def _update_member_status(self, members, timed_out, rpc=None):
         """Update member status in OpenStack."""
+        rpc = rpc or self.plugin_rpc
         for member in members:
             if 'provisioning_status' in member:
                 provisioning_status = member['provisioning_status']
@@ -2047,28 +2314,29 @@ class iControlDriver(LBaaSBaseDriver):
                         member['provisioning_status'] = f5const.F5_ACTIVE
                         operating_status = f5const.F5_ONLINE
 
-                    self.plugin_rpc.update_member_status(
+                    rpc.update_member_status(
                         member['id'],
                         member['provisioning_status'],
                         operating_status
                     )
                 elif provisioning_status == f5const.F5_PENDING_DELETE:
                     if not member.get('parent_pool_deleted', False):
-                        self.plugin_rpc.member_destroyed(
+                        rpc.member_destroyed(
                             member['id'])
                 elif provisioning_status == f5const.F5_ERROR:
-                    self.plugin_rpc.update_member_status(
+                    rpc.update_member_status(
                         member['id'],
                         f5const.F5_ERROR,
                         f5const.F5_OFFLINE)
 
-    def _update_health_monitor_status(self, health_monitors):
+    def _update_health_monitor_status(self, health_monitors, rpc=None):
         """Update pool monitor status in OpenStack."""
+        rpc = rpc or self.plugin_rpc
         for health_monitor in health_monitors:
             if 'provisioning_status' in health_monitor:
                 provisioning_status = health_monitor['provisioning_status']
                 if provisioning_status in self.positive_plugin_const_state:
-                    self.plugin_rpc.update_health_monitor_status(
+                    rpc.update_health_monitor_status(
                         health_monitor['id'],
                         f5const.F5_ACTIVE,
                         f5const.F5_ONLINE
@@ -2076,40 +2344,42 @@ class iControlDriver(LBaaSBaseDriver):
                     health_monitor['provisioning_status'] = \
                         f5const.F5_ACTIVE
                 elif provisioning_status == f5const.F5_PENDING_DELETE:
-                    self.plugin_rpc.health_monitor_destroyed(
+                    rpc.health_monitor_destroyed(
                         health_monitor['id'])
                 elif provisioning_status == f5const.F5_ERROR:
-                    self.plugin_rpc.update_health_monitor_status(
+                    rpc.update_health_monitor_status(
                         health_monitor['id'])
 
     @log_helpers.log_method_call
-    def _update_pool_status(self, pools):
+    def _update_pool_status(self, pools, rpc=None):
         """Update pool status in OpenStack."""
+        rpc = rpc or self.plugin_rpc
         for pool in pools:
             if 'provisioning_status' in pool:
                 provisioning_status = pool['provisioning_status']
                 if provisioning_status in self.positive_plugin_const_state:
-                    self.plugin_rpc.update_pool_status(
+                    rpc.update_pool_status(
                         pool['id'],
                         f5const.F5_ACTIVE,
                         f5const.F5_ONLINE
                     )
                     pool['provisioning_status'] = f5const.F5_ACTIVE
                 elif provisioning_status == f5const.F5_PENDING_DELETE:
-                    self.plugin_rpc.pool_destroyed(
+                    rpc.pool_destroyed(
                         pool['id'])
                 elif provisioning_status == f5const.F5_ERROR:
-                    self.plugin_rpc.update_pool_status(pool['id'])
+                    rpc.update_pool_status(pool['id'])
 
     @log_helpers.log_method_call
-    def _update_listener_status(self, service):
+    def _update_listener_status(self, service, rpc=None):
         """Update listener status in OpenStack."""
+        rpc = rpc or self.plugin_rpc
         listeners = service['listeners']
         for listener in listeners:
             if 'provisioning_status' in listener:
                 provisioning_status = listener['provisioning_status']
                 if provisioning_status in self.positive_plugin_const_state:
-                    self.plugin_rpc.update_listener_status(
+                    rpc.update_listener_status(
                         listener['id'],
                         f5const.F5_ACTIVE,
                         listener['operating_status']
@@ -2117,57 +2387,61 @@ class iControlDriver(LBaaSBaseDriver):
                     listener['provisioning_status'] = \
                         f5const.F5_ACTIVE
                 elif provisioning_status == f5const.F5_PENDING_DELETE:
-                    self.plugin_rpc.listener_destroyed(
+                    rpc.listener_destroyed(
                         listener['id'])
                 elif provisioning_status == f5const.F5_ERROR:
-                    self.plugin_rpc.update_listener_status(
+                    rpc.update_listener_status(
                         listener['id'],
                         provisioning_status,
                         f5const.F5_OFFLINE)
 
     @log_helpers.log_method_call
-    def _update_l7rule_status(self, l7rules):
+    def _update_l7rule_status(self, l7rules, rpc=None):
         """Update l7rule status in OpenStack."""
+        rpc = rpc or self.plugin_rpc
         for l7rule in l7rules:
             if 'provisioning_status' in l7rule:
                 provisioning_status = l7rule['provisioning_status']
                 if provisioning_status in self.positive_plugin_const_state:
-                    self.plugin_rpc.update_l7rule_status(
+                    rpc.update_l7rule_status(
                         l7rule['id'],
                         l7rule['policy_id'],
                         f5const.F5_ACTIVE,
                         f5const.F5_ONLINE
                     )
                 elif provisioning_status == f5const.F5_PENDING_DELETE:
-                    self.plugin_rpc.l7rule_destroyed(
+                    rpc.l7rule_destroyed(
                         l7rule['id'])
                 elif provisioning_status == f5const.F5_ERROR:
-                    self.plugin_rpc.update_l7rule_status(
+                    rpc.update_l7rule_status(
                         l7rule['id'], l7rule['policy_id'])
 
     @log_helpers.log_method_call
-    def _update_l7policy_status(self, l7policies):
+    def _update_l7policy_status(self, l7policies, rpc=None):
         LOG.debug("_update_l7policy_status")
         """Update l7policy status in OpenStack."""
+        rpc = rpc or self.plugin_rpc
         for l7policy in l7policies:
             if 'provisioning_status' in l7policy:
                 provisioning_status = l7policy['provisioning_status']
                 if provisioning_status in self.positive_plugin_const_state:
-                    self.plugin_rpc.update_l7policy_status(
+                    rpc.update_l7policy_status(
                         l7policy['id'],
                         f5const.F5_ACTIVE,
                         f5const.F5_ONLINE
                     )
                 elif provisioning_status == f5const.F5_PENDING_DELETE:
                     LOG.debug("calling l7policy_destroyed")
-                    self.plugin_rpc.l7policy_destroyed(
+                    rpc.l7policy_destroyed(
                         l7policy['id'])
                 elif provisioning_status == f5const.F5_ERROR:
-                    self.plugin_rpc.update_l7policy_status(l7policy['id'])
+                    rpc.update_l7policy_status(l7policy['id'])
 
     @log_helpers.log_method_call
-    def _update_loadbalancer_status(self, service, timed_out=False):
+    def _update_loadbalancer_status(self, service, timed_out=False,
+                                    rpc=None):
         """Update loadbalancer status in OpenStack."""
+        rpc = rpc or self.plugin_rpc
         loadbalancer = service.get('loadbalancer', {})
         provisioning_status = loadbalancer.get('provisioning_status',
                                                f5const.F5_ERROR)
@@ -2186,16 +2460,16 @@ class iControlDriver(LBaaSBaseDriver):
                 loadbalancer['provisioning_status'] = \
                     f5const.F5_ACTIVE
 
-            self.plugin_rpc.update_loadbalancer_status(
+            rpc.update_loadbalancer_status(
                 loadbalancer['id'],
                 loadbalancer['provisioning_status'],
                 operating_status)
 
         elif provisioning_status == f5const.F5_PENDING_DELETE:
-            self.plugin_rpc.loadbalancer_destroyed(
+            rpc.loadbalancer_destroyed(
                 loadbalancer['id'])
         elif provisioning_status == f5const.F5_ERROR:
-            self.plugin_rpc.update_loadbalancer_status(
+            rpc.update_loadbalancer_status(
                 loadbalancer['id'],
                 provisioning_status,
                 f5const.F5_OFFLINE)
@@ -2217,17 +2491,48 @@ class iControlDriver(LBaaSBaseDriver):
                     return
 
             # get currrent member status
+            reported = dict((member['id'], member.get('operating_status'))
+                            for member in service['members'])
             self.lbaas_builder.update_operating_status(service)
 
-            # udpate Neutron
+            # udpate Neutron with the member status which changed
             for member in service['members']:
                 if member['provisioning_status'] == f5const.F5_ACTIVE:
                     operating_status = member.get('operating_status', None)
+                    if operating_status == reported[member['id']]:
+                        continue
                     self.plugin_rpc.update_member_status(
                         member['id'],
                         provisioning_status=None,
                         operating_status=operating_status)
 
+        loadbalancer = service['loadbalancer']
+        pools = [self.service_adapter.init_pool_name(loadbalancer, pool)
+                 for pool in service.get('pools', [])]
+        self.member_states.watch(
+            loadbalancer['id'],
+            [(pool['partition'], pool['name']) for pool in pools])
+
+    @is_operational
+    def get_operating_status_changes(self, loadbalancer_ids):
+        """Return the loadbalancers whose member status may have changed.
+
+        The member states of all pools are polled from the active BIG-IP
+        with one request. Loadbalancers whose operating status was not
+        updated before are always returned, and all of them are if the
+        poll fails.
+        """
+        self.member_states.retain(loadbalancer_ids)
+        try:
+            changed = self.member_states.poll(self.get_active_bigip())
+        except Exception as exc:
+            LOG.error("Error polling pool member states: %s" % exc)
+            return list(loadbalancer_ids)
+
+        return [loadbalancer_id for loadbalancer_id in loadbalancer_ids
+                if loadbalancer_id in changed or
+                loadbalancer_id not in self.member_states]
+
     def get_active_bigip(self):
         bigips = self.get_all_bigips()
 
@@ -2365,42 +2670,42 @@ class iControlDriver(LBaaSBaseDriver):
                    f5const.MIN_TMOS_MINOR_VERSION))
         return major_version, minor_version
 
-    @serialized('create_l7policy')
+    @serialized('create_l7policy', coalesce=True)
     @is_operational
     def create_l7policy(self, l7policy, service):
         """Create lb l7policy."""
         LOG.debug("Creating l7policy")
         self._common_service_handler(service)
 
-    @serialized('update_l7policy')
+    @serialized('update_l7policy', coalesce=True)
     @is_operational
     def update_l7policy(self, old_l7policy, l7policy, service):
         """Update lb l7policy."""
         LOG.debug("Updating l7policy")
         self._common_service_handler(service)
 
-    @serialized('delete_l7policy')
+    @serialized('delete_l7policy', coalesce=True)
     @is_operational
     def delete_l7policy(self, l7policy, service):
         """Delete lb l7policy."""
         LOG.debug("Deleting l7policy")
         self._common_service_handler(service)
 
-    @serialized('create_l7rule')
+    @serialized('create_l7rule', coalesce=True)
     @is_operational
     def create_l7rule(self, pool, service):
         """Create lb l7rule."""
         LOG.debug("Creating l7rule")
         self._common_service_handler(service)
 
-    @serialized('update_l7rule')
+    @serialized('update_l7rule', coalesce=True)
     @is_operational
     def update_l7rule(self, old_l7rule, l7rule, service):
         """Update lb l7rule."""
         LOG.debug("Updating l7rule")
         self._common_service_handler(service)
 
-    @serialized('delete_l7rule')
+    @serialized('delete_l7rule', coalesce=True)
     @is_operational
     def delete_l7rule(self, l7rule, service):
         """Delete lb l7rule."""
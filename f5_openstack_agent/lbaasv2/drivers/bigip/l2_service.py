@@ -20,9 +20,13 @@ from time import time
 from oslo_log import log as logging
 from oslo_utils import importutils
 
+from f5_openstack_agent.lbaasv2.drivers.bigip.assured_cache import \
+    network_fingerprint
 from f5_openstack_agent.lbaasv2.drivers.bigip import exceptions as f5_ex
 from f5_openstack_agent.lbaasv2.drivers.bigip.fdb_connector_ml2 \
     import FDBConnectorML2
+from f5_openstack_agent.lbaasv2.drivers.bigip.fdb_shadow import \
+    FdbShadowTable
 from f5_openstack_agent.lbaasv2.drivers.bigip.network_helper import \
     NetworkHelper
 from f5_openstack_agent.lbaasv2.drivers.bigip.service_adapter import \
@@ -80,6 +84,7 @@ class L2ServiceBuilder(object):
         self.tagging_mapping = {}
         self.system_helper = SystemHelper()
         self.network_helper = NetworkHelper()
+        self.network_helper.fdb_table = FdbShadowTable()
         self.service_adapter = ServiceModelAdapter(self.conf)
 
         if not f5_global_routed_mode:
@@ -120,6 +125,12 @@ class L2ServiceBuilder(object):
         if self.fdb_connector:
             self.fdb_connector.advertise_tunnel_ips(tunnel_ips)
 
+    def invalidate_fdb_table(self, bigip=None):
+        # Load the fdb records of the tunnels of a bigip, or of all
+        # bigips, from the device again when next needed.
+        if self.network_helper.fdb_table is not None:
+            self.network_helper.fdb_table.invalidate(bigip)
+
     def set_tunnel_rpc(self, tunnel_rpc):
         # Provide FDB Connector with ML2 RPC access
         if self.fdb_connector:
@@ -186,7 +197,8 @@ class L2ServiceBuilder(object):
                       'Attempted to assure a network with no id..skipping.')
             return
 
-        if network['id'] in bigip.assured_networks:
+        if bigip.assured_networks.is_assured(
+                network['id'], network_fingerprint(network)):
             return
 
         if network['id'] in self.conf.common_network_ids:
@@ -225,7 +237,9 @@ class L2ServiceBuilder(object):
                             ' Cannot setup network.'
             LOG.error(error_message)
             raise f5_ex.InvalidNetworkType(error_message)
-        bigip.assured_networks[network['id']] = network_name
+        bigip.assured_networks.assured(
+            network['id'], network_name,
+            fingerprint=network_fingerprint(network))
 
         if time() - start_time > .001:
             LOG.debug("        assure bigip network took %.5f secs" %
@@ -450,8 +464,7 @@ class L2ServiceBuilder(object):
         else:
             LOG.error('Unsupported network type %s. Can not delete.'
                       % network['provider:network_type'])
-        if network['id'] in bigip.assured_networks:
-            del bigip.assured_networks[network['id']]
+        bigip.assured_networks.remove(network['id'])
 
     def _delete_device_vlan(self, bigip, network, network_folder):
         # Delete tagged vlan on specific bigip
@@ -624,7 +637,7 @@ class L2ServiceBuilder(object):
                             'net_fdb': net_fdb}
                 fdbs = self._get_bigip_network_fdbs(bigip, net_info)
                 if len(fdbs) > 0:
-                    fdb_method(fdb_entries=fdbs)
+                    fdb_method(bigip, fdb_entries=fdbs)
 
     def _get_bigip_network_fdbs(self, bigip, net_info):
         # Get network fdb entries to add to a bigip
@@ -688,6 +701,33 @@ class L2ServiceBuilder(object):
               'fdb_method': self.network_helper.delete_fdb_entries}]:
             self._operate_bigip_fdb(bigip, fdb, fdb_operation)
 
+    def apply_bigip_fdb(self, bigip, fdb_changes):
+        # Write the merged fdb changes of each tunnel with one update
+        folders = self.network_helper.get_tunnel_folders(bigip)
+        for network_id, network in fdb_changes.networks.iteritems():
+            if network['network_type'] not in ['vxlan', 'gre']:
+                continue
+            tunnel_name = _get_tunnel_name(
+                {'provider:network_type': network['network_type'],
+                 'provider:segmentation_id': network['segment_id']})
+            folder = folders.get(tunnel_name, None)
+            if not folder:
+                continue
+            add_records = {}
+            delete_records = {}
+            for mac_address, record in network['records'].iteritems():
+                # bigip does not need fdb entries for local addresses
+                if record['endpoint'] == bigip.local_ip:
+                    continue
+                records = delete_records if record['delete'] \
+                    else add_records
+                records[mac_address] = {'endpoint': record['endpoint'],
+                                        'ip_address': record['ip_address']}
+            if add_records or delete_records:
+                self.network_helper.update_fdb_entries(
+                    bigip, tunnel_name, folder, add_records=add_records,
+                    delete_records=delete_records)
+
     # Utilities
     def get_network_name(self, bigip, network):
         # This constructs a name for a tunnel or vlan interface
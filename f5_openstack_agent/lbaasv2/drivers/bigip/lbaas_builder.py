@@ -14,17 +14,23 @@
 # limitations under the License.
 #
 
+import copy
 from time import time
 
 from oslo_log import log as logging
 
+from f5_openstack_agent.lbaasv2.drivers.bigip import assure_planner
 from f5_openstack_agent.lbaasv2.drivers.bigip import constants_v2
 from f5_openstack_agent.lbaasv2.drivers.bigip import l7policy_service
 from f5_openstack_agent.lbaasv2.drivers.bigip.lbaas_service import \
     LbaasServiceObject
 from f5_openstack_agent.lbaasv2.drivers.bigip import listener_service
 from f5_openstack_agent.lbaasv2.drivers.bigip import pool_service
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import \
+    ResourceType
 from f5_openstack_agent.lbaasv2.drivers.bigip import virtual_address
+from f5_openstack_agent.lbaasv2.drivers.bigip.virtual_stats import \
+    VirtualStatsSnapshot
 from requests import HTTPError
 
 LOG = logging.getLogger(__name__)
@@ -42,12 +48,18 @@ class LBaaSBuilder(object):
         self.listener_builder = listener_service.ListenerServiceBuilder(
             self.service_adapter,
             driver.cert_manager,
-            conf.f5_parent_ssl_profile)
+            conf.f5_parent_ssl_profile,
+            driver.cluster_executor)
+        if conf.f5_stats_snapshot_interval:
+            self.listener_builder.stats_snapshot = VirtualStatsSnapshot(
+                conf.f5_stats_snapshot_interval)
         self.pool_builder = pool_service.PoolServiceBuilder(
             self.service_adapter
         )
         self.l7service = l7policy_service.L7PolicyService(conf)
         self.esd = None
+        # Planner comparing the service to the devices during assure_service
+        self._planner = None
 
     def init_esd(self, esd):
         self.esd = esd
@@ -59,6 +71,21 @@ class LBaaSBuilder(object):
         """Assure that a service is configured on the BIGIP."""
         start_time = time()
 
+        # Device resources are compared to the service before they are
+        # written, so only the resources which differ are changed.
+        self._planner = assure_planner.AssurePlanner()
+        try:
+            self._assure_service(service, all_subnet_hints)
+        finally:
+            LOG.debug("    _assure_service changes: %s" %
+                      self._planner.plan.summary())
+            self._planner = None
+
+        LOG.debug("    _assure_service took %.5f secs" %
+                  (time() - start_time))
+        return all_subnet_hints
+
+    def _assure_service(self, service, all_subnet_hints):
         LOG.debug("assuring loadbalancers")
 
         self._assure_loadbalancer_created(service, all_subnet_hints)
@@ -103,9 +130,112 @@ class LBaaSBuilder(object):
 
         self._assure_loadbalancer_deleted(service)
 
-        LOG.debug("    _assure_service took %.5f secs" %
-                  (time() - start_time))
-        return all_subnet_hints
+    def plan_service(self, service):
+        """Return the device changes assure_service would make.
+
+        This is a dry run of assure_service: device resources are read
+        and compared to the service, but nothing is written. Listeners
+        with TLS profiles or cookie persistence rules, and L7 policies,
+        are not compared and are always planned as modified.
+        """
+        service = copy.deepcopy(service)
+        planner = assure_planner.AssurePlanner()
+        bigips = self.driver.get_config_bigips()
+        loadbalancer = service["loadbalancer"]
+
+        vip_address = virtual_address.VirtualAddress(
+            self.service_adapter, loadbalancer)
+        for bigip in bigips:
+            planner.plan_resource(
+                bigip, ResourceType.virtual_address, vip_address.model(),
+                delete=self._is_pending_delete(loadbalancer))
+
+        for monitor in service.get("healthmonitors", list()):
+            svc = {"loadbalancer": loadbalancer,
+                   "healthmonitor": monitor}
+            for bigip in bigips:
+                planner.plan_resource(
+                    bigip, self.pool_builder.get_monitor_resource_type(svc),
+                    self.service_adapter.get_healthmonitor(svc),
+                    delete=self._is_pending_delete(monitor))
+
+        for pool in service.get("pools", list()):
+            svc = self._get_pool_service(service, pool)
+            for bigip in bigips:
+                planner.plan_resource(
+                    bigip, ResourceType.pool,
+                    self.service_adapter.get_pool(svc),
+                    delete=self._is_pending_delete(pool))
+
+        listener_policies = self._build_listener_policies(service)
+        for listener_id, policy in listener_policies.items():
+            if policy['f5_policy'].get('rules', list()):
+                for bigip in bigips:
+                    planner.plan_unknown(bigip, ResourceType.l7policy,
+                                         policy['f5_policy'])
+                listener = LbaasServiceObject(service).get_listener(
+                    listener_id)
+                if listener:
+                    listener['f5_policy'] = policy['f5_policy']
+
+        for listener in service.get("listeners", list()):
+            svc = self._get_listener_service(service, listener)
+            delete = self._is_pending_delete(listener)
+            for bigip in bigips:
+                vip = self.listener_builder.get_virtual_model(svc, bigip)
+                if vip is None and not delete:
+                    planner.plan_unknown(
+                        bigip, ResourceType.virtual,
+                        self.service_adapter.get_virtual(svc))
+                else:
+                    planner.plan_resource(
+                        bigip, ResourceType.virtual,
+                        vip or self.service_adapter.get_virtual_name(svc),
+                        delete=delete)
+
+        return planner.plan
+
+    def _get_planner(self):
+        # The planner of the running assure_service, or a private one
+        # for a single step.
+        return self._planner or assure_planner.AssurePlanner()
+
+    def _plan_bigips(self, bigips, resource_type, get_model):
+        """Return the BIG-IPs on which a resource is created or modified.
+
+        get_model(bigip) returns the desired resource model on a BIG-IP,
+        or None if the resource cannot be compared. BIG-IPs on which the
+        resource is as desired are left out. A BIG-IP whose resource
+        cannot be compared is planned as a create, which falls back to a
+        modify if the resource exists. When the resource is created on
+        every BIG-IP, bigips is returned as the creates.
+        """
+        planner = self._get_planner()
+        creates = list()
+        modifies = list()
+        unchanged = list()
+        for bigip in bigips:
+            try:
+                model = get_model(bigip)
+                if model is None:
+                    creates.append(bigip)
+                    continue
+                change = planner.plan_resource(bigip, resource_type, model)
+            except Exception as err:
+                LOG.debug("Unable to compare %s resource: %s" %
+                          (resource_type.name, err.message))
+                creates.append(bigip)
+                continue
+            if not change:
+                unchanged.append(bigip)
+            elif change.action == assure_planner.CREATE:
+                creates.append(bigip)
+            else:
+                modifies.append(bigip)
+
+        if not modifies and not unchanged:
+            return bigips, list()
+        return creates, modifies
 
     @staticmethod
     def _set_status_as_active(svc_obj, force=False):
@@ -144,9 +274,15 @@ class LBaaSBuilder(object):
             vip_address = virtual_address.VirtualAddress(
                 self.service_adapter,
                 loadbalancer)
-            for bigip in bigips:
+            creates, modifies = self._plan_bigips(
+                bigips, ResourceType.virtual_address,
+                lambda bigip: vip_address.model())
+            for bigip in creates + modifies:
                 try:
-                    vip_address.assure(bigip)
+                    if bigip in creates:
+                        vip_address.assure(bigip)
+                    else:
+                        vip_address.update(bigip)
                 except Exception as error:
                     LOG.error(str(error))
                     self._set_status_as_error(loadbalancer)
@@ -172,26 +308,22 @@ class LBaaSBuilder(object):
 
         listeners = service["listeners"]
         loadbalancer = service["loadbalancer"]
-        networks = service.get("networks", list())
-        pools = service.get("pools", list())
-        l7policies = service.get("l7policies", list())
-        l7rules = service.get("l7policy_rules", list())
         bigips = self.driver.get_config_bigips()
 
         for listener in listeners:
             error = False
             if self._is_not_pending_delete(listener):
 
-                svc = {"loadbalancer": loadbalancer,
-                       "listener": listener,
-                       "pools": pools,
-                       "l7policies": l7policies,
-                       "l7policy_rules": l7rules,
-                       "networks": networks}
+                svc = self._get_listener_service(service, listener)
 
-                # create_listener() will do an update if VS exists
-                error = self.listener_builder.create_listener(
-                    svc, bigips)
+                creates, modifies = self._plan_listener_bigips(svc, bigips)
+                if creates:
+                    # create_listener() will do an update if VS exists
+                    error = self.listener_builder.create_listener(
+                        svc, creates)
+                if modifies:
+                    error = self.listener_builder.update_listener(
+                        svc, modifies) or error
 
                 if error:
                     loadbalancer['provisioning_status'] = \
@@ -202,27 +334,45 @@ class LBaaSBuilder(object):
                     if listener['admin_state_up']:
                         listener['operating_status'] = constants_v2.F5_ONLINE
 
+    @staticmethod
+    def _get_listener_service(service, listener):
+        return {"loadbalancer": service["loadbalancer"],
+                "listener": listener,
+                "pools": service.get("pools", list()),
+                "l7policies": service.get("l7policies", list()),
+                "l7policy_rules": service.get("l7policy_rules", list()),
+                "networks": service.get("networks", list())}
+
+    def _plan_listener_bigips(self, service, bigips):
+        # Listeners which also assure TLS profiles or cookie persistence
+        # rules have no model to compare and are created.
+        return self._plan_bigips(
+            bigips, ResourceType.virtual,
+            lambda bigip: self.listener_builder.get_virtual_model(
+                service, bigip))
+
     def _assure_pools_created(self, service):
         if "pools" not in service:
             return
 
         pools = service.get("pools", list())
         loadbalancer = service.get("loadbalancer", dict())
-        monitors = \
-            [monitor for monitor in service.get("healthmonitors", list())
-             if monitor['provisioning_status'] !=
-             constants_v2.F5_PENDING_DELETE]
 
         bigips = self.driver.get_config_bigips()
         error = None
         for pool in pools:
             if pool['provisioning_status'] != constants_v2.F5_PENDING_DELETE:
-                svc = {"loadbalancer": loadbalancer,
-                       "pool": pool}
-                svc['members'] = self._get_pool_members(service, pool['id'])
-                svc['healthmonitors'] = monitors
-
-                error = self.pool_builder.create_pool(svc, bigips)
+                svc = self._get_pool_service(service, pool)
+
+                creates, modifies = self._plan_bigips(
+                    bigips, ResourceType.pool,
+                    lambda bigip: self.service_adapter.get_pool(svc))
+                error = None
+                if creates:
+                    error = self.pool_builder.create_pool(svc, creates)
+                if modifies:
+                    error = self.pool_builder.update_pool(
+                        svc, modifies) or error
                 if error:
                     pool['provisioning_status'] = constants_v2.F5_ERROR
                     loadbalancer['provisioning_status'] = constants_v2.F5_ERROR
@@ -230,6 +380,15 @@ class LBaaSBuilder(object):
                     pool['provisioning_status'] = constants_v2.F5_ACTIVE
                     pool['operating_status'] = constants_v2.F5_ONLINE
 
+    def _get_pool_service(self, service, pool):
+        monitors = \
+            [monitor for monitor in service.get("healthmonitors", list())
+             if self._is_not_pending_delete(monitor)]
+        return {"loadbalancer": service.get("loadbalancer", dict()),
+                "pool": pool,
+                "members": self._get_pool_members(service, pool['id']),
+                "healthmonitors": monitors}
+
     def _get_pool_members(self, service, pool_id):
         """Return a list of members associated with given pool."""
         members = []
@@ -249,7 +408,17 @@ class LBaaSBuilder(object):
                    "healthmonitor": monitor}
             if monitor['provisioning_status'] != \
                     constants_v2.F5_PENDING_DELETE:
-                if self.pool_builder.create_healthmonitor(svc, bigips):
+                creates, modifies = self._plan_bigips(
+                    bigips, self.pool_builder.get_monitor_resource_type(svc),
+                    lambda bigip: self.service_adapter.get_healthmonitor(svc))
+                error = None
+                if creates:
+                    error = self.pool_builder.create_healthmonitor(
+                        svc, creates)
+                if modifies:
+                    error = self.pool_builder.update_healthmonitor(
+                        svc, modifies) or error
+                if error:
                     monitor['provisioning_status'] = constants_v2.F5_ERROR
                     force_active_status = False
 
@@ -429,24 +598,9 @@ class LBaaSBuilder(object):
         if 'l7policies' not in service:
             return
 
-        listener_policy_map = dict()
         bigips = self.driver.get_config_bigips()
         lbaas_service = LbaasServiceObject(service)
-
-        l7policies = service['l7policies']
-        LOG.debug("L7 debug: processing policies: %s", l7policies)
-        for l7policy in l7policies:
-            LOG.debug("L7 debug: assuring policy: %s", l7policy)
-            name = l7policy.get('name', None)
-            if not self.esd.is_esd(name):
-                listener_id = l7policy.get('listener_id', None)
-                if not listener_id or listener_id in listener_policy_map:
-                    LOG.debug(
-                        "L7 debug: listener policies already added: %s",
-                        listener_id)
-                    continue
-                listener_policy_map[listener_id] = \
-                    self.l7service.build_policy(l7policy, lbaas_service)
+        listener_policy_map = self._build_listener_policies(service)
 
         for listener_id, policy in listener_policy_map.items():
             error = False
@@ -470,6 +624,30 @@ class LBaaSBuilder(object):
                 loadbalancer['provisioning_status'] = \
                     constants_v2.F5_ERROR
 
+    def _build_listener_policies(self, service):
+        # Map each listener with L7 policies, other than ESDs, to its
+        # BIG-IP policy definition.
+        listener_policy_map = dict()
+        if 'l7policies' not in service:
+            return listener_policy_map
+        lbaas_service = LbaasServiceObject(service)
+
+        l7policies = service['l7policies']
+        LOG.debug("L7 debug: processing policies: %s", l7policies)
+        for l7policy in l7policies:
+            LOG.debug("L7 debug: assuring policy: %s", l7policy)
+            name = l7policy.get('name', None)
+            if not self.esd.is_esd(name):
+                listener_id = l7policy.get('listener_id', None)
+                if not listener_id or listener_id in listener_policy_map:
+                    LOG.debug(
+                        "L7 debug: listener policies already added: %s",
+                        listener_id)
+                    continue
+                listener_policy_map[listener_id] = \
+                    self.l7service.build_policy(l7policy, lbaas_service)
+        return listener_policy_map
+
     def _assure_l7policies_deleted(self, service):
         if 'l7policies' not in service:
             return
@@ -560,6 +738,9 @@ class LBaaSBuilder(object):
         status_keys = ['status.availabilityState',
                        'status.enabledState']
 
+        # The status of the members of each pool is loaded with one
+        # request, the first time a member of the pool is updated.
+        pools_status = dict()
         members = service["members"]
         for member in members:
             if member['provisioning_status'] == constants_v2.F5_ACTIVE:
@@ -567,8 +748,12 @@ class LBaaSBuilder(object):
                 svc = {"loadbalancer": loadbalancer,
                        "member": member,
                        "pool": pool}
-                status = self.pool_builder.get_member_status(
-                    svc, bigip, status_keys)
+                if member["pool_id"] not in pools_status:
+                    pools_status[member["pool_id"]] = \
+                        self.pool_builder.get_members_status(
+                            svc, bigip, status_keys)
+                member_name = self.service_adapter.get_member(svc)["name"]
+                status = pools_status[member["pool_id"]].get(member_name, {})
                 member['operating_status'] = self.convert_operating_status(
                     status)
 
@@ -13,6 +13,9 @@
 # limitations under the License.
 #
 
+from f5_openstack_agent.lbaasv2.drivers.bigip.service_scheduler import \
+    ServiceScheduler
+
 
 class LBaaSBaseDriver(object):
     """Abstract base LBaaS Driver class for interfacing with Agent Manager."""
@@ -25,7 +28,7 @@ class LBaaSBaseDriver(object):
         self.agent_id = None
         self.plugin_rpc = None  # XXX overridden in the only known subclass
         self.connected = False  # XXX overridden in the only known subclass
-        self.service_queue = []
+        self.service_queue = ServiceScheduler()
         self.agent_configurations = {}  # XXX overridden in subclass
 
     def set_context(self, context):
@@ -35,6 +38,9 @@ class LBaaSBaseDriver(object):
     def set_plugin_rpc(self, plugin_rpc):
         """Provide LBaaS Plugin RPC access."""
 
+    def update_superseded_service_status(self, service, newer_service):
+        """Report status for a request replaced by a newer one."""
+
     def set_agent_report_state(self, report_state_callback):
         """Set Agent Report State."""
         raise NotImplementedError()
@@ -67,6 +73,10 @@ class LBaaSBaseDriver(object):
         """Update pool member operational status from devices to controller."""
         raise NotImplemented
 
+    def get_operating_status_changes(self, loadbalancer_ids):
+        """Return the loadbalancers whose operating status may have changed."""
+        return loadbalancer_ids
+
     def recover_errored_devices(self):
         """Trigger attempt to reconnect any errored devices."""
         raise NotImplemented
@@ -75,6 +85,10 @@ class LBaaSBaseDriver(object):
         """Get Stats for a loadbalancer Service."""
         raise NotImplementedError()
 
+    def get_stats_request_count(self, service):
+        """Return the stats requests get_stats makes to each device."""
+        return len(service.get('listeners', []))
+
     def get_all_deployed_loadbalancers(self, purge_orphaned_folders=True):
         """Get all Loadbalancers defined on devices."""
         raise NotImplemented
@@ -88,6 +102,12 @@ class LBaaSBaseDriver(object):
         """Check If LBaaS Service is Defined on Driver Target."""
         raise NotImplementedError()
 
+    def open_resource_snapshot(self):
+        """Share Driver Target state between service_exists calls."""
+
+    def close_resource_snapshot(self):
+        """Discard state shared by open_resource_snapshot."""
+
     def sync(self, service):
         """Force Sync a Service on Driver Target."""
         raise NotImplementedError()
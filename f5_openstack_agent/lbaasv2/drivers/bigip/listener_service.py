@@ -16,6 +16,8 @@
 
 from oslo_log import log as logging
 
+from f5_openstack_agent.lbaasv2.drivers.bigip.cluster_executor import \
+    ClusterExecutor
 from f5_openstack_agent.lbaasv2.drivers.bigip import resource_helper
 from f5_openstack_agent.lbaasv2.drivers.bigip import ssl_profile
 from requests import HTTPError
@@ -33,12 +35,16 @@ class ListenerServiceBuilder(object):
     defined in service object to a BIG-IP virtual server.
     """
 
-    def __init__(self, service_adapter, cert_manager, parent_ssl_profile=None):
+    def __init__(self, service_adapter, cert_manager, parent_ssl_profile=None,
+                 cluster_executor=None):
         self.cert_manager = cert_manager
+        self.cluster_executor = cluster_executor or ClusterExecutor()
         self.parent_ssl_profile = parent_ssl_profile
         self.vs_helper = resource_helper.BigIPResourceHelper(
             resource_helper.ResourceType.virtual)
         self.service_adapter = service_adapter
+        # VirtualStatsSnapshot serving get_stats, if stats are shared
+        self.stats_snapshot = None
         LOG.debug("ListenerServiceBuilder: using parent_ssl_profile %s ",
                   parent_ssl_profile)
 
@@ -106,6 +112,55 @@ class ListenerServiceBuilder(object):
 
         return error
 
+    def get_virtual_model(self, service, bigip):
+        u"""Return the virtual server of a listener on a BIG-IP.
+
+        Returns None for listeners with TLS profiles or cookie persistence
+        rules, which are only completed by create_listener.
+
+        :param service: Dictionary which contains a both a listener
+        and load balancer definition.
+        :param bigip: Single BigIP instance the listener is on.
+        """
+        vip = self.service_adapter.get_virtual(service)
+        listener = service.get('listener', dict())
+        persist = listener.get("session_persistence", None) or dict()
+        if self.service_adapter.get_tls(service) or \
+                persist.get('type', "") == "APP_COOKIE":
+            return None
+
+        network_id = service.get('loadbalancer', dict()).get('network_id', "")
+        vip['vlans'] = list(vip.get('vlans', list()))
+        self.service_adapter.get_vlan(vip, bigip, network_id)
+        return vip
+
+    def update_listener(self, service, bigips):
+        u"""Update listener on set of BIG-IPs.
+
+        Modifies the BIG-IP virtual server of a listener without TLS
+        profiles or cookie persistence rules.
+
+        :param service: Dictionary which contains a both a listener
+        and load balancer definition.
+        :param bigips: Array of BigIP class instances to update Listener.
+        """
+        error = None
+        for bigip in bigips:
+            vip = self.get_virtual_model(service, bigip)
+            try:
+                self.vs_helper.update(bigip, vip)
+            except Exception as err:
+                error = f5_ex.VirtualServerUpdateException(err.message)
+                LOG.error("Virtual server update error: %s" %
+                          error.message)
+
+            try:
+                self._remove_cookie_persist_rule(vip, bigip)
+            except HTTPError as err:
+                LOG.exception(err.message)
+
+        return error
+
     def get_listener(self, service, bigip):
         u"""Retrieve BIG-IP virtual from a single BIG-IP system.
 
@@ -373,19 +428,19 @@ class ListenerServiceBuilder(object):
 
         virtual = self.service_adapter.get_virtual(service)
         part = virtual["partition"]
-        for bigip in bigips:
-            try:
-                vs_stats = self.vs_helper.get_stats(
-                    bigip,
-                    name=virtual["name"],
-                    partition=part,
-                    stat_keys=stat_keys)
-                for stat_key in stat_keys:
-                    if stat_key in vs_stats:
-                        collected_stats[stat_key] += vs_stats[stat_key]
-
-            except Exception as e:
-                # log error but continue on
-                LOG.error("Error getting virtual server stats: %s", e.message)
+        get_stats = self.vs_helper.get_stats
+        if self.stats_snapshot is not None:
+            get_stats = self.stats_snapshot.get_stats
+        results = self.cluster_executor.execute(
+            bigips, get_stats, name=virtual["name"],
+            partition=part, stat_keys=stat_keys)
+        for vs_stats in results.values():
+            for stat_key in stat_keys:
+                if stat_key in vs_stats:
+                    collected_stats[stat_key] += vs_stats[stat_key]
+
+        for _, e, _ in results.errors.values():
+            # log error but continue on
+            LOG.error("Error getting virtual server stats: %s", e.message)
 
         return collected_stats
@@ -0,0 +1,129 @@
+"""Change detection of the pool member states on a BIG-IP."""
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+
+def parse_member_states(pools):
+    """Return the state of the members of each pool.
+
+    pools is the JSON of the pool collection with its members expanded,
+    as in:
+
+        {'items': [
+            {'name': 'Project_pool1', 'partition': 'Project_t1',
+             'membersReference': {'items': [
+                 {'name': '10.2.0.4%2:80', 'state': 'up',
+                  'session': 'monitor-enabled'}]}}]}
+
+    The states are keyed by (partition, pool name), each a dict of
+    (state, session) by member name.
+    """
+    member_states = dict()
+    for pool in pools.get('items', None) or []:
+        members = pool.get('membersReference', {}).get('items', None) or []
+        member_states[(pool.get('partition'), pool.get('name'))] = dict(
+            (member.get('name'),
+             (member.get('state', None), member.get('session', None)))
+            for member in members)
+    return member_states
+
+
+class MemberStateTracker(object):
+    """Member states of the pools of each load balancer, polled in bulk.
+
+    The pools of a load balancer are watched once its operating status
+    has been updated. Each poll then loads the members of every pool
+    on the BIG-IP with one request, and returns the load balancers with
+    a member whose state changed, or which was added or removed, since
+    their operating status was last updated. The states polled for the
+    pools of a load balancer are only kept when it is watched again, so
+    a load balancer whose update fails keeps being reported. Pools not
+    polled before they were watched, and all pools when polling a
+    different BIG-IP, are reported as changed.
+    """
+
+    def __init__(self):
+        # loadbalancer id -> set((partition, pool name))
+        self._loadbalancer_pools = dict()
+        # (partition, pool name) -> loadbalancer id
+        self._pool_loadbalancers = dict()
+        # (partition, pool name) -> {member name -> (state, session)}
+        self._states = dict()
+        # states of the last poll, not yet updated on their load balancer
+        self._polled = dict()
+        self._hostname = None
+
+    def __contains__(self, loadbalancer_id):
+        return loadbalancer_id in self._loadbalancer_pools
+
+    def watch(self, loadbalancer_id, pools):
+        """Watch the pools of a load balancer, as (partition, name).
+
+        The states last polled for the pools are taken as those the
+        operating status of the load balancer was updated with.
+        """
+        pools = set(pools)
+        for pool in self._loadbalancer_pools.get(loadbalancer_id, set()) - \
+                pools:
+            self._forget_pool(pool)
+        self._loadbalancer_pools[loadbalancer_id] = pools
+        for pool in pools:
+            self._pool_loadbalancers[pool] = loadbalancer_id
+            if pool in self._polled:
+                self._states[pool] = self._polled.pop(pool)
+
+    def forget(self, loadbalancer_id):
+        for pool in self._loadbalancer_pools.pop(loadbalancer_id, ()):
+            self._forget_pool(pool)
+
+    def _forget_pool(self, pool):
+        self._pool_loadbalancers.pop(pool, None)
+        self._states.pop(pool, None)
+        self._polled.pop(pool, None)
+
+    def retain(self, loadbalancer_ids):
+        """Forget the load balancers which are not in loadbalancer_ids."""
+        loadbalancer_ids = set(loadbalancer_ids)
+        for loadbalancer_id in list(self._loadbalancer_pools):
+            if loadbalancer_id not in loadbalancer_ids:
+                self.forget(loadbalancer_id)
+
+    def poll(self, bigip):
+        """Return the watched load balancers whose member states changed."""
+        member_states = self._load(bigip)
+        if bigip.hostname != self._hostname:
+            self._states = dict()
+            self._hostname = bigip.hostname
+
+        changed = set()
+        self._polled = dict()
+        for pool, loadbalancer_id in self._pool_loadbalancers.items():
+            states = member_states.get(pool, {})
+            if self._states.get(pool, None) != states:
+                changed.add(loadbalancer_id)
+                self._polled[pool] = states
+        LOG.debug("member states changed for %d of %d loadbalancers on %s" %
+                  (len(changed), len(self._loadbalancer_pools),
+                   bigip.hostname))
+        return changed
+
+    def _load(self, bigip):
+        pools = bigip.tm.ltm.pools
+        response = bigip.icrs.get(
+            pools._meta_data['uri'] + '?expandSubcollections=true')
+        return parse_member_states(response.json())
@@ -23,6 +23,8 @@ from oslo_log import log as logging
 from requests.exceptions import HTTPError
 
 from f5.bigip.tm.net.vlan import TagModeDisallowedForTMOSVersion
+from f5_openstack_agent.lbaasv2.drivers.bigip.address_index import \
+    AddressIndex
 from f5_openstack_agent.lbaasv2.drivers.bigip import resource_helper
 from f5_openstack_agent.lbaasv2.drivers.bigip.utils import get_filter
 
@@ -69,6 +71,8 @@ class NetworkHelper(object):
     def __init__(self, conf=None):
         if conf:
             self.conf = conf
+        # FdbShadowTable of the tunnel fdb records, if they are shadowed
+        self.fdb_table = None
 
     @log_helpers.log_method_call
     def create_l2gre_multipoint_profile(self, bigip, name,
@@ -144,6 +148,9 @@ class NetworkHelper(object):
             obj = t.load(name=payload['name'], partition=payload['partition'])
         else:
             obj = t.create(**payload)
+            if self.fdb_table is not None:
+                self.fdb_table.invalidate(bigip, payload['name'],
+                                          payload['partition'])
             if not payload['partition'] == const.DEFAULT_PARTITION:
                 self.add_vlan_to_domain_by_id(bigip, payload['name'],
                                               payload['partition'],
@@ -279,21 +286,9 @@ class NetworkHelper(object):
 
     @log_helpers.log_method_call
     def _get_next_domain_id(self, bigip):
-        """Get next route domain id """
-        rd_ids = sorted(self.get_route_domain_ids(bigip, partition=''))
-        rd_ids.remove(0)
-
-        lowest_available_index = 1
-        for i in range(len(rd_ids)):
-            if lowest_available_index < rd_ids[i]:
-                break
-            elif rd_ids[i] == lowest_available_index:
-                lowest_available_index = lowest_available_index + 1
-            else:
-                raise LookupError(
-                    "The list of route domain ids is out of order")
-
-        return lowest_available_index
+        """Reserve the next route domain id """
+        return bigip.route_domain_ids.reserve(
+            lambda: self.get_route_domain_ids(bigip, partition=''))
 
     @log_helpers.log_method_call
     def create_route_domain(self, bigip, partition=const.DEFAULT_PARTITION,
@@ -305,6 +300,10 @@ class NetworkHelper(object):
         create a Route Domain on the Common partition labeling it by:
             rd-h<name given>
 
+        The id is reserved from the route domain ids of the bigip. If the
+        id turns out to be in use on the device, the ids are loaded again
+        and the route domain is created once more with a new id.
+
         args:
             bigip - f5.bigip.RootManager object instance
         kwargs:
@@ -318,18 +317,32 @@ class NetworkHelper(object):
         else:
             name = partition
         rd = bigip.tm.net.route_domains.route_domain
-        id = self._get_next_domain_id(bigip)
-        if is_aux:
-            name += '_aux_' + str(id)
-        payload = NetworkHelper.route_domain_defaults
-        payload['name'] = name
-        payload['partition'] = '/' + partition
-        payload['id'] = id
-        if strictness:
-            payload['strict'] = 'enabled'
-        else:
-            payload['parent'] = '/' + const.DEFAULT_PARTITION + '/0'
-        return rd.create(**payload)
+        for attempt in range(2):
+            id = self._get_next_domain_id(bigip)
+            payload = dict(NetworkHelper.route_domain_defaults)
+            payload['name'] = name
+            if is_aux:
+                payload['name'] += '_aux_' + str(id)
+            payload['partition'] = '/' + partition
+            payload['id'] = id
+            if strictness:
+                payload['strict'] = 'enabled'
+            else:
+                payload['parent'] = '/' + const.DEFAULT_PARTITION + '/0'
+            try:
+                return rd.create(**payload)
+            except HTTPError as err:
+                if err.response.status_code == 409 and not attempt:
+                    LOG.debug("Route domain id %d conflicts on %s, "
+                              "reloading route domain ids" %
+                              (id, bigip.hostname))
+                    bigip.route_domain_ids.invalidate()
+                    continue
+                bigip.route_domain_ids.release(id)
+                raise
+            except Exception:
+                bigip.route_domain_ids.release(id)
+                raise
 
     @log_helpers.log_method_call
     def delete_route_domain(self, bigip, partition=const.DEFAULT_PARTITION,
@@ -353,6 +366,7 @@ class NetworkHelper(object):
         r = bigip.tm.net.route_domains.route_domain
         obj = r.load(name=name, partition=partition)
         obj.delete()
+        bigip.route_domain_ids.release(obj.id)
 
     @log_helpers.log_method_call
     def get_route_domain_ids(self, bigip, partition=const.DEFAULT_PARTITION):
@@ -715,6 +729,34 @@ class NetworkHelper(object):
 
         return virtual_services
 
+    @log_helpers.log_method_call
+    def get_address_index(self, bigip, partition=const.DEFAULT_PARTITION):
+        """Returns an index of the virtual and node addresses in a partition
+
+        The virtual servers, virtual addresses and nodes of the partition
+        are each fetched with a single collection query.
+        """
+        vs_helper = resource_helper.BigIPResourceHelper(
+            resource_helper.ResourceType.virtual)
+        va_helper = resource_helper.BigIPResourceHelper(
+            resource_helper.ResourceType.virtual_address)
+        virtual_addresses = dict(
+            (vaddr.name, vaddr.address) for vaddr in
+            va_helper.get_resources(bigip, partition=partition))
+
+        addresses = []
+        for virtual_server in vs_helper.get_resources(bigip,
+                                                      partition=partition):
+            dest = os.path.basename(virtual_server.destination)
+            (vip_addr, vip_port) = self.split_addr_port(dest)
+            # As in get_virtual_service_insertion, only virtual servers
+            # whose destination is a virtual address are indexed.
+            if vip_addr in virtual_addresses:
+                addresses.append(virtual_addresses[vip_addr])
+
+        addresses.extend(self.get_node_addresses(bigip, partition=partition))
+        return AddressIndex(addresses)
+
     @log_helpers.log_method_call
     def get_node_addresses(self, bigip, partition=const.DEFAULT_PARTITION):
         """Get the addresses of nodes within the partition."""
@@ -825,6 +867,12 @@ class NetworkHelper(object):
     @log_helpers.log_method_call
     def add_fdb_entries(self, bigip, fdb_entries=None):
         # Add vxlan fdb entries
+        if self.fdb_table is not None:
+            for tunnel_name in fdb_entries:
+                self.update_fdb_entries(
+                    bigip, tunnel_name, fdb_entries[tunnel_name]['folder'],
+                    add_records=fdb_entries[tunnel_name]['records'])
+            return
         for tunnel_name in fdb_entries:
             folder = fdb_entries[tunnel_name]['folder']
             existing_records = self.get_fdb_entry(bigip,
@@ -863,6 +911,12 @@ class NetworkHelper(object):
 
     @log_helpers.log_method_call
     def delete_fdb_entries(self, bigip, tunnel_name=None, fdb_entries=None):
+        if self.fdb_table is not None:
+            for tunnel_name in fdb_entries:
+                self.update_fdb_entries(
+                    bigip, tunnel_name, fdb_entries[tunnel_name]['folder'],
+                    delete_records=fdb_entries[tunnel_name]['records'])
+            return bool(fdb_entries)
         for tunnel_name in fdb_entries:
             folder = fdb_entries[tunnel_name]['folder']
             existing_records = self.get_fdb_entry(bigip,
@@ -900,6 +954,82 @@ class NetworkHelper(object):
             return True
         return False
 
+    @log_helpers.log_method_call
+    def update_fdb_entries(self, bigip, tunnel_name, folder,
+                           add_records=None, delete_records=None):
+        """Add and delete the fdb records of a tunnel with one update.
+
+        Records are dicts of {'endpoint', 'ip_address'} by MAC address.
+        The tunnel is not modified if its records would not change. The
+        records are taken from the fdb table if there is one, rather
+        than read from the device. Returns False if the tunnel does not
+        exist.
+        """
+        add_records = add_records or {}
+        delete_records = delete_records or {}
+        if self.fdb_table is not None:
+            deleted = self.fdb_table.update(
+                bigip, tunnel_name, folder, add_records=add_records,
+                delete_records=delete_records)
+        else:
+            deleted = self._update_tunnel_records(
+                bigip, tunnel_name, folder, add_records, delete_records)
+        if deleted is None:
+            return False
+
+        if const.FDB_POPULATE_STATIC_ARP:
+            for mac_address in deleted:
+                if delete_records[mac_address]['ip_address']:
+                    self.arp_delete(
+                        bigip,
+                        ip_address=delete_records[mac_address]['ip_address'],
+                        partition='Common')
+        return True
+
+    def _update_tunnel_records(self, bigip, tunnel_name, folder,
+                               add_records, delete_records):
+        # Read, merge and write the records of a tunnel. Returns the
+        # MAC addresses deleted, or None if the tunnel does not exist.
+        try:
+            obj = bigip.tm.net.fdb.tunnels.tunnel.load(
+                name=tunnel_name, partition=folder)
+        except HTTPError as err:
+            if err.response.status_code == 404:
+                LOG.debug("Tunnel %s does not exist." % tunnel_name)
+                return None
+            raise
+
+        existing_records = getattr(obj, 'records', None) or []
+        new_records = []
+        deleted = []
+        changed = False
+        for record in existing_records:
+            mac_address = record['name']
+            if mac_address in delete_records:
+                deleted.append(mac_address)
+                changed = True
+            elif mac_address in add_records:
+                if record.get('endpoint') != \
+                        add_records[mac_address]['endpoint']:
+                    changed = True
+            else:
+                new_records.append(record)
+        existing_macs = set(record['name'] for record in existing_records)
+        for mac_address, record in add_records.iteritems():
+            new_records.append({'name': mac_address,
+                                'endpoint': record['endpoint']})
+            if mac_address not in existing_macs:
+                changed = True
+
+        if changed:
+            obj.modify(records=new_records or None)
+        return deleted
+
+    def get_tunnel_folders(self, bigip):
+        """Return the partitions of the fdb tunnels by tunnel name."""
+        return dict((tunnel.name, tunnel.partition) for tunnel in
+                    bigip.tm.net.fdb.tunnels.get_collection())
+
     @log_helpers.log_method_call
     def get_fdb_entry(self,
                       bigip,
@@ -935,6 +1065,8 @@ class NetworkHelper(object):
             tunnel_name,
             partition=const.DEFAULT_PARTITION):
         """Delete all fdb entries."""
+        if self.fdb_table is not None:
+            self.fdb_table.invalidate(bigip, tunnel_name, partition)
         try:
             t = bigip.tm.net.fdb.tunnels.tunnel
             obj = t.load(name=tunnel_name, partition=partition)
@@ -953,6 +1085,8 @@ class NetworkHelper(object):
             tunnel_name,
             partition=const.DEFAULT_PARTITION):
         """Delete a vxlan or gre tunnel."""
+        if self.fdb_table is not None:
+            self.fdb_table.invalidate(bigip, tunnel_name, partition)
         t = bigip.tm.net.fdb.tunnels.tunnel
         try:
             if t.exists(name=tunnel_name, partition=partition):
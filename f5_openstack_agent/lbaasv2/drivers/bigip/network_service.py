@@ -13,12 +13,13 @@
 # limitations under the License.
 #
 
-import itertools
 import netaddr
 from requests import HTTPError
 
 from oslo_log import log as logging
 
+from f5_openstack_agent.lbaasv2.drivers.bigip.assured_cache import \
+    subnet_fingerprint
 from f5_openstack_agent.lbaasv2.drivers.bigip import constants_v2
 from f5_openstack_agent.lbaasv2.drivers.bigip import exceptions as f5_ex
 from f5_openstack_agent.lbaasv2.drivers.bigip.l2_service import \
@@ -26,9 +27,11 @@ from f5_openstack_agent.lbaasv2.drivers.bigip.l2_service import \
 from f5_openstack_agent.lbaasv2.drivers.bigip.network_helper import \
     NetworkHelper
 from f5_openstack_agent.lbaasv2.drivers.bigip import resource_helper
+from f5_openstack_agent.lbaasv2.drivers.bigip import resource_snapshot
+from f5_openstack_agent.lbaasv2.drivers.bigip.route_domain_cache import \
+    RouteDomainCache
 from f5_openstack_agent.lbaasv2.drivers.bigip.selfips import BigipSelfIpManager
 from f5_openstack_agent.lbaasv2.drivers.bigip.snats import BigipSnatManager
-from f5_openstack_agent.lbaasv2.drivers.bigip.utils import strip_domain_address
 
 LOG = logging.getLogger(__name__)
 
@@ -49,7 +52,8 @@ class NetworkServiceBuilder(object):
 
         self.vlan_manager = resource_helper.BigIPResourceHelper(
             resource_helper.ResourceType.vlan)
-        self.rds_cache = {}
+        self.rds_cache = RouteDomainCache(
+            self.conf.max_route_domain_cache_tenants)
         self.interface_mapping = self.l2_service.interface_mapping
         self.network_helper = NetworkHelper(conf=self.conf)
         self.service_adapter = self.driver.service_adapter
@@ -187,20 +191,10 @@ class NetworkServiceBuilder(object):
 
         # Per Device Network Connectivity (VLANs or Tunnels)
         subnetsinfo = self._get_subnets_to_assure(service)
-        for (assure_bigip, subnetinfo) in (
-                itertools.product(self.driver.get_all_bigips(), subnetsinfo)):
-            LOG.debug("Assuring per device network connectivity "
-                      "for %s on subnet %s." % (assure_bigip.hostname,
-                                                subnetinfo['subnet']))
-
-            # Make sure the L2 network is established
-            self.l2_service.assure_bigip_network(
-                assure_bigip, subnetinfo['network'])
-
-            # Connect the BigIP device to network, by getting
-            # a self-ip address on the subnet.
-            self.bigip_selfip_manager.assure_bigip_selfip(
-                assure_bigip, service, subnetinfo)
+        self._allocate_service_ports(service, subnetsinfo)
+        self.driver.cluster_executor.map(
+            self.driver.get_all_bigips(), self._assure_device_networking,
+            service, subnetsinfo)
 
         # L3 Shared Config
         assure_bigips = self.driver.get_config_bigips()
@@ -222,6 +216,53 @@ class NetworkServiceBuilder(object):
                     self.bigip_selfip_manager.assure_gateway_on_subnet(
                         assure_bigip, subnetinfo, traffic_group)
 
+    def _allocate_service_ports(self, service, subnetsinfo):
+        # Look up, and create if missing, the neutron ports of the
+        # selfips, snats and gateways the service needs with one bulk
+        # lookup and one bulk create, so assuring the networking of each
+        # bigip and subnet finds its ports in the port allocator cache.
+        tenant_id = service['loadbalancer']['tenant_id']
+        lb_id = service['loadbalancer']['id']
+        snats_per_subnet = self.conf.f5_snat_addresses_per_subnet
+        ports = list()
+        lookups = list()
+        for subnetinfo in subnetsinfo:
+            subnet = subnetinfo['subnet']
+            if not subnetinfo['network'] or not subnet:
+                continue
+            key = (tenant_id, subnet['id'])
+            fingerprint = subnet_fingerprint(subnet)
+            for bigip in self.driver.get_all_bigips():
+                if not bigip.assured_tenant_snat_subnets.is_assured(
+                        key, fingerprint):
+                    ports.append(self.bigip_selfip_manager.get_selfip_port(
+                        bigip, subnet, lb_id))
+            if snats_per_subnet > 0 and any(
+                    not bigip.assured_tenant_snat_subnets.is_assured(
+                        key, fingerprint)
+                    for bigip in self.driver.get_config_bigips()):
+                ports.extend(self.bigip_snat_manager.get_snat_ports(
+                    subnet, tenant_id, snats_per_subnet, lb_id))
+            if subnetinfo['is_for_member'] and not self.conf.f5_snat_mode:
+                lookups.append((subnet['id'], "gw-" + subnet['id']))
+        if ports or lookups:
+            self.driver.port_allocator.allocate(ports, lookups=lookups)
+
+    def _assure_device_networking(self, assure_bigip, service, subnetsinfo):
+        for subnetinfo in subnetsinfo:
+            LOG.debug("Assuring per device network connectivity "
+                      "for %s on subnet %s." % (assure_bigip.hostname,
+                                                subnetinfo['subnet']))
+
+            # Make sure the L2 network is established
+            self.l2_service.assure_bigip_network(
+                assure_bigip, subnetinfo['network'])
+
+            # Connect the BigIP device to network, by getting
+            # a self-ip address on the subnet.
+            self.bigip_selfip_manager.assure_bigip_selfip(
+                assure_bigip, service, subnetinfo)
+
     def _annotate_service_route_domains(self, service):
         # Add route domain notation to pool member and vip addresses.
         tenant_id = service['loadbalancer']['tenant_id']
@@ -312,9 +353,10 @@ class NetworkServiceBuilder(object):
         LOG.debug("assign route domain checking for available route domain")
         check_cidr = netaddr.IPNetwork(subnet['cidr'])
         placed_route_domain_id = None
-        for route_domain_id in self.rds_cache[tenant_id]:
+        tenant_rds = self.rds_cache.get_route_domains(tenant_id)
+        for route_domain_id in tenant_rds:
             LOG.debug("checking rd %s" % route_domain_id)
-            rd_entry = self.rds_cache[tenant_id][route_domain_id]
+            rd_entry = tenant_rds[route_domain_id]
             overlapping_subnet = None
             for net_shortname in rd_entry:
                 LOG.debug("checking net %s" % net_shortname)
@@ -337,23 +379,20 @@ class NetworkServiceBuilder(object):
                 break
 
         if placed_route_domain_id is None:
-            if (len(self.rds_cache[tenant_id]) <
+            if (len(tenant_rds) <
                     self.conf.max_namespaces_per_tenant):
                 placed_route_domain_id = self._create_aux_rd(tenant_id)
-                self.rds_cache[tenant_id][placed_route_domain_id] = {}
+                self.rds_cache.add_route_domain(
+                    tenant_id, placed_route_domain_id)
                 LOG.debug("Tenant %s now has %d route domains" %
-                          (tenant_id, len(self.rds_cache[tenant_id])))
+                          (tenant_id, len(tenant_rds)))
             else:
                 raise Exception("Cannot allocate route domain")
 
         LOG.debug("Placed in route domain %s" % placed_route_domain_id)
-        rd_entry = self.rds_cache[tenant_id][placed_route_domain_id]
-
         net_short_name = self.get_neutron_net_short_name(network)
-        if net_short_name not in rd_entry:
-            rd_entry[net_short_name] = {'subnets': {}}
-        net_subnets = rd_entry[net_short_name]['subnets']
-        net_subnets[subnet['id']] = {'cidr': check_cidr}
+        self.rds_cache.add_subnet(tenant_id, placed_route_domain_id,
+                                  net_short_name, subnet['id'], check_cidr)
         network['route_domain_id'] = placed_route_domain_id
 
     def _create_aux_rd(self, tenant_id):
@@ -380,102 +419,96 @@ class NetworkServiceBuilder(object):
     # The purpose of the route domain subnet cache is to
     # determine whether there is an existing bigip
     # subnet that conflicts with a new one being
-    # assigned to the route domain.
-    """
-    # route domain subnet cache
-    rds_cache =
-        {'<tenant_id>': {
-            {'0': {
-                '<network type>-<segmentation id>': [
-                    'subnets': [
-                        '<subnet id>': {
-                            'cidr': '<cidr>'
-                        }
-                ],
-            '1': {}}}}
-    """
+    # assigned to the route domain. See RouteDomainCache.
     def update_rds_cache(self, tenant_id):
         # Update the route domain cache from bigips
-        if tenant_id not in self.rds_cache:
-            LOG.debug("rds_cache: adding tenant %s" % tenant_id)
-            self.rds_cache[tenant_id] = {}
-            for bigip in self.driver.get_all_bigips():
-                self.update_rds_cache_bigip(tenant_id, bigip)
-            LOG.debug("rds_cache updated: " + str(self.rds_cache))
+        if tenant_id in self.rds_cache:
+            # mark the tenant as recently used
+            self.rds_cache.add_tenant(tenant_id)
+            return
+
+        LOG.debug("rds_cache: adding tenant %s" % tenant_id)
+        self.rds_cache.add_tenant(tenant_id)
+        for bigip in self.driver.get_all_bigips():
+            self.update_rds_cache_bigip(tenant_id, bigip)
+        LOG.debug("rds_cache updated: " + str(self.rds_cache))
+
+    def invalidate_rds_cache(self, tenant_id=None):
+        # Forget the route domains of a tenant, or of all tenants, so
+        # they are loaded from the bigips when next needed.
+        self.rds_cache.invalidate(tenant_id)
 
     def update_rds_cache_bigip(self, tenant_id, bigip):
         # Update the route domain cache for this tenant
-        # with information from bigip's vlan and tunnels
+        # with information from bigip's vlan and tunnels.
+        # The route domains, vlans, tunnels and selfips of the
+        # tenant partition are each loaded with one collection query.
         LOG.debug("rds_cache: processing bigip %s" % bigip.device_name)
 
-        route_domain_ids = self.network_helper.get_route_domain_ids(
-            bigip,
-            partition=self.service_adapter.get_folder_name(tenant_id))
-        # LOG.debug("rds_cache: got bigip route domains: %s" % route_domains)
-        for route_domain_id in route_domain_ids:
-            self.update_rds_cache_bigip_rd_vlans(
-                tenant_id, bigip, route_domain_id)
-
-    def update_rds_cache_bigip_rd_vlans(
-            self, tenant_id, bigip, route_domain_id):
-        # Update the route domain cache with information
-        # from the bigip vlans and tunnels from
-        # this route domain
-        LOG.debug("rds_cache: processing bigip %s rd %s"
-                  % (bigip.device_name, route_domain_id))
-        # this gets tunnels too
         partition_id = self.service_adapter.get_folder_name(tenant_id)
-        rd_vlans = self.network_helper.get_vlans_in_route_domain_by_id(
-            bigip,
-            partition=partition_id,
-            id=route_domain_id
-        )
-        LOG.debug("rds_cache: bigip %s rd %s vlans: %s"
-                  % (bigip.device_name, route_domain_id, rd_vlans))
-        if len(rd_vlans) == 0:
-            LOG.debug("No vlans found for route domain: %d" %
-                      (route_domain_id))
+        snapshot = resource_snapshot.BigIPResourceSnapshot()
+
+        def get_resources(resource_type):
+            return snapshot.get_resources(bigip, resource_type, partition_id)
+
+        route_domains = get_resources(
+            resource_helper.ResourceType.route_domain)
+        if not [rd for rd in route_domains if getattr(rd, 'vlans', None)]:
             return
 
-        # make sure this rd has a cache entry
-        tenant_entry = self.rds_cache[tenant_id]
-        if route_domain_id not in tenant_entry:
-            tenant_entry[route_domain_id] = {}
-
-        # for every VLAN or TUNNEL on this bigip...
-        for rd_vlan in rd_vlans:
-            self.update_rds_cache_bigip_vlan(
-                tenant_id, bigip, route_domain_id, rd_vlan)
-
-    def update_rds_cache_bigip_vlan(
-            self, tenant_id, bigip, route_domain_id, rd_vlan):
-        # Update the route domain cache with information
-        #    from the bigip vlan or tunnel
-        LOG.debug("rds_cache: processing bigip %s rd %d vlan %s"
-                  % (bigip.device_name, route_domain_id, rd_vlan))
-        net_short_name = self.get_bigip_net_short_name(
-            bigip, tenant_id, rd_vlan)
+        net_short_names = dict()
+        for vlan in get_resources(resource_helper.ResourceType.vlan):
+            net_short_names[vlan.name] = 'vlan-%s' % vlan.tag
+        for tunnel in get_resources(resource_helper.ResourceType.tunnel):
+            if 'tunnel-gre-' in tunnel.name:
+                net_short_names[tunnel.name] = 'gre-%s' % tunnel.key
+            elif 'tunnel-vxlan-' in tunnel.name:
+                net_short_names[tunnel.name] = 'vxlan-%s' % tunnel.key
+
+        vlan_selfips = dict()
+        for selfip in get_resources(resource_helper.ResourceType.selfip):
+            vlan_selfips.setdefault(selfip.vlan, list()).append(selfip)
+
+        for rd in route_domains:
+            rd_vlans = getattr(rd, 'vlans', None) or list()
+            LOG.debug("rds_cache: bigip %s rd %s vlans: %s"
+                      % (bigip.device_name, rd.id, rd_vlans))
+            if len(rd_vlans) == 0:
+                LOG.debug("No vlans found for route domain: %d" % rd.id)
+                continue
+
+            # make sure this rd has a cache entry
+            self.rds_cache.add_route_domain(tenant_id, rd.id)
+
+            # for every VLAN or TUNNEL on this bigip...
+            for rd_vlan in rd_vlans:
+                vlan_name = rd_vlan
+                if not vlan_name.startswith('/'):
+                    vlan_name = "/%s/%s" % (partition_id, vlan_name)
+                net_short_name = net_short_names.get(
+                    vlan_name.split('/')[-1], None)
+                if net_short_name is None:
+                    # not in the tenant partition
+                    net_short_name = self.get_bigip_net_short_name(
+                        bigip, tenant_id, rd_vlan)
+                self.update_rds_cache_bigip_vlan(
+                    tenant_id, bigip, rd.id, net_short_name,
+                    vlan_selfips.get(vlan_name, list()))
+
+    def update_rds_cache_bigip_vlan(self, tenant_id, bigip, route_domain_id,
+                                    net_short_name, selfips):
+        # Update the route domain cache with the selfips
+        #    of a bigip vlan or tunnel
+        LOG.debug("rds_cache: processing bigip %s rd %d net %s"
+                  % (bigip.device_name, route_domain_id, net_short_name))
 
         # make sure this net has a cache entry
-        tenant_entry = self.rds_cache[tenant_id]
-        rd_entry = tenant_entry[route_domain_id]
-        if net_short_name not in rd_entry:
-            rd_entry[net_short_name] = {'subnets': {}}
-        net_subnets = rd_entry[net_short_name]['subnets']
-
-        partition_id = self.service_adapter.get_folder_name(tenant_id)
-        LOG.debug("Calling get_selfips with: partition %s and vlan_name %s",
-                  partition_id, rd_vlan)
-        selfips = self.bigip_selfip_manager.get_selfips(
-            bigip,
-            partition=partition_id,
-            vlan_name=rd_vlan
-        )
+        net_subnets = self.rds_cache.add_network(
+            tenant_id, route_domain_id, net_short_name)
 
-        LOG.debug("rds_cache: got selfips")
         for selfip in selfips:
-            LOG.debug("rds_cache: processing bigip %s rd %s vlan %s self %s" %
-                      (bigip.device_name, route_domain_id, rd_vlan,
+            LOG.debug("rds_cache: processing bigip %s rd %s net %s self %s" %
+                      (bigip.device_name, route_domain_id, net_short_name,
                        selfip.name))
             if bigip.device_name not in selfip.name:
                 LOG.error("rds_cache: Found unexpected selfip %s for tenant %s"
@@ -486,23 +519,19 @@ class NetworkServiceBuilder(object):
             # convert 10.1.1.1%1/24 to 10.1.1.1/24
             (addr, netbits) = selfip.address.split('/')
             addr = addr.split('%')[0]
-            selfip.address = addr + '/' + netbits
 
             # selfip addresses will have slash notation: 10.1.1.1/24
-            netip = netaddr.IPNetwork(selfip.address)
+            netip = netaddr.IPNetwork(addr + '/' + netbits)
             LOG.debug("rds_cache: updating subnet %s with %s"
                       % (subnet_id, str(netip.cidr)))
             net_subnets[subnet_id] = {'cidr': netip.cidr}
-            LOG.debug("rds_cache: now %s" % self.rds_cache)
 
     def get_route_domain_from_cache(self, network):
         # Get route domain from cache by network
         net_short_name = self.get_neutron_net_short_name(network)
-        for tenant_id in self.rds_cache:
-            tenant_cache = self.rds_cache[tenant_id]
-            for route_domain_id in tenant_cache:
-                if net_short_name in tenant_cache[route_domain_id]:
-                    return route_domain_id
+        route_domain_id = self.rds_cache.get_route_domain(net_short_name)
+        if route_domain_id is not None:
+            return route_domain_id
 
         # Not found
         raise f5_ex.RouteDomainCacheMiss(
@@ -512,25 +541,7 @@ class NetworkServiceBuilder(object):
         # Get route domain from cache by network
         LOG.debug("remove_from_rds_cache")
         net_short_name = self.get_neutron_net_short_name(network)
-        for tenant_id in self.rds_cache:
-            LOG.debug("rds_cache: processing remove for %s" % tenant_id)
-            deleted_rds = []
-            tenant_cache = self.rds_cache[tenant_id]
-            for route_domain_id in tenant_cache:
-                if net_short_name in tenant_cache[route_domain_id]:
-                    net_entry = tenant_cache[route_domain_id][net_short_name]
-                    if subnet['id'] in net_entry['subnets']:
-                        del net_entry['subnets'][subnet['id']]
-                        if len(net_entry['subnets']) == 0:
-                            del net_entry['subnets']
-                    if len(tenant_cache[route_domain_id][net_short_name]) == 0:
-                        del tenant_cache[route_domain_id][net_short_name]
-                if len(self.rds_cache[tenant_id][route_domain_id]) == 0:
-                    deleted_rds.append(route_domain_id)
-            for rd in deleted_rds:
-                LOG.debug("removing route domain %d from tenant %s" %
-                          (rd, tenant_id))
-                del self.rds_cache[tenant_id][rd]
+        self.rds_cache.remove_subnet(net_short_name, subnet['id'])
 
     def get_bigip_net_short_name(self, bigip, tenant_id, network_name):
         # Return <network_type>-<seg_id> for bigip network
@@ -584,9 +595,8 @@ class NetworkServiceBuilder(object):
 
         assure_bigips = \
             [bigip for bigip in assure_bigips
-                if tenant_id not in bigip.assured_tenant_snat_subnets or
-                subnet['id'] not in
-                bigip.assured_tenant_snat_subnets[tenant_id]]
+                if not bigip.assured_tenant_snat_subnets.is_assured(
+                    (tenant_id, subnet['id']), subnet_fingerprint(subnet))]
 
         LOG.debug("_assure_subnet_snats: getting snat addrs for: %s" %
                   subnet['id'])
@@ -620,8 +630,9 @@ class NetworkServiceBuilder(object):
                            "gateway ip address specified.")
 
         gw_name = "gw-" + subnet['id']
-        ports = self.driver.plugin_rpc.get_port_by_name(port_name=gw_name)
-        if len(ports) < 1:
+        port_allocator = self.driver.port_allocator
+        ports = port_allocator.allocate([], lookups=[(subnet['id'], gw_name)])
+        if not ports[gw_name]:
             need_port_for_gateway = True
 
         # There was no port on this agent's host, so get one from Neutron
@@ -631,6 +642,7 @@ class NetworkServiceBuilder(object):
                 new_port = rpc.create_port_on_subnet_with_specific_ip(
                     subnet_id=subnet['id'], mac_address=None,
                     name=gw_name, ip_address=subnet['gateway_ip'])
+                port_allocator.add_port(subnet['id'], gw_name, new_port)
                 LOG.info('gateway IP for subnet %s will be port %s'
                          % (subnet['id'], new_port['id']))
             except Exception as exc:
@@ -652,6 +664,9 @@ class NetworkServiceBuilder(object):
         # Non Shared Config -  Local Per BIG-IP
         self.update_bigip_l2(service)
 
+        # Addresses in use, indexed once per bigip for this pass
+        address_indexes = dict()
+
         # Delete shared config objects
         deleted_names = set()
         for bigip in self.driver.get_config_bigips():
@@ -661,7 +676,8 @@ class NetworkServiceBuilder(object):
             subnet_hints = all_subnet_hints[bigip.device_name]
             deleted_names = deleted_names.union(
                 self._assure_delete_nets_shared(bigip, service,
-                                                subnet_hints))
+                                                subnet_hints,
+                                                address_indexes))
 
         # Delete non shared config objects
         for bigip in self.driver.get_all_bigips():
@@ -673,7 +689,7 @@ class NetworkServiceBuilder(object):
 
             deleted_names = deleted_names.union(
                 self._assure_delete_nets_nonshared(
-                    bigip, service, subnet_hints)
+                    bigip, service, subnet_hints, address_indexes)
             )
 
         for port_name in deleted_names:
@@ -682,6 +698,7 @@ class NetworkServiceBuilder(object):
                       % port_name)
             self.driver.plugin_rpc.delete_port_by_name(
                 port_name=port_name)
+            self.driver.port_allocator.remove_port(port_name)
 
     def update_bigip_l2(self, service):
         # Update fdb entries on bigip
@@ -730,7 +747,8 @@ class NetworkServiceBuilder(object):
 
         LOG.debug("update_bigip_l2 complete")
 
-    def _assure_delete_nets_shared(self, bigip, service, subnet_hints):
+    def _assure_delete_nets_shared(self, bigip, service, subnet_hints,
+                                   address_indexes=None):
         # Assure shared configuration (which syncs) is deleted
         deleted_names = set()
         tenant_id = service['loadbalancer']['tenant_id']
@@ -738,7 +756,8 @@ class NetworkServiceBuilder(object):
         delete_gateway = self.bigip_selfip_manager.delete_gateway_on_subnet
         for subnetinfo in self._get_subnets_to_delete(bigip,
                                                       service,
-                                                      subnet_hints):
+                                                      subnet_hints,
+                                                      address_indexes):
             try:
                 if not self.conf.f5_snat_mode:
                     gw_name = delete_gateway(bigip, subnetinfo)
@@ -759,12 +778,14 @@ class NetworkServiceBuilder(object):
 
         return deleted_names
 
-    def _assure_delete_nets_nonshared(self, bigip, service, subnet_hints):
+    def _assure_delete_nets_nonshared(self, bigip, service, subnet_hints,
+                                      address_indexes=None):
         # Delete non shared base objects for networks
         deleted_names = set()
         for subnetinfo in self._get_subnets_to_delete(bigip,
                                                       service,
-                                                      subnet_hints):
+                                                      subnet_hints,
+                                                      address_indexes):
             try:
                 network = subnetinfo['network']
                 if self.l2_service.is_common_network(network):
@@ -821,11 +842,8 @@ class NetworkServiceBuilder(object):
 
                 self.remove_from_rds_cache(network, subnet)
                 tenant_id = service['loadbalancer']['tenant_id']
-                if tenant_id in bigip.assured_tenant_snat_subnets:
-                    tenant_snat_subnets = \
-                        bigip.assured_tenant_snat_subnets[tenant_id]
-                    if subnet['id'] in tenant_snat_subnets:
-                        tenant_snat_subnets.remove(subnet['id'])
+                bigip.assured_tenant_snat_subnets.remove(
+                    (tenant_id, subnet['id']))
             except f5_ex.F5NeutronException as exc:
                 LOG.error("assure_delete_nets_nonshared: exception: %s"
                           % str(exc.msg))
@@ -835,9 +853,12 @@ class NetworkServiceBuilder(object):
 
         return deleted_names
 
-    def _get_subnets_to_delete(self, bigip, service, subnet_hints):
+    def _get_subnets_to_delete(self, bigip, service, subnet_hints,
+                               address_indexes=None):
         # Clean up any Self IP, SNATs, networks, and folder for
         # services items that we deleted.
+        if address_indexes is None:
+            address_indexes = dict()
         subnets_to_delete = []
         for subnetinfo in subnet_hints['check_for_delete_subnets'].values():
             subnet = self.service_adapter.get_subnet_from_service(
@@ -849,69 +870,38 @@ class NetworkServiceBuilder(object):
             route_domain = network.get('route_domain_id', None)
             if not subnet:
                 continue
+            if bigip.hostname not in address_indexes:
+                address_indexes[bigip.hostname] = \
+                    self._get_address_index(bigip, service)
             if not self._ips_exist_on_subnet(
                     bigip,
                     service,
                     subnet,
-                    route_domain):
+                    route_domain,
+                    address_indexes[bigip.hostname]):
                 subnets_to_delete.append(subnetinfo)
 
         return subnets_to_delete
 
-    def _ips_exist_on_subnet(self, bigip, service, subnet, route_domain):
-        # Does the big-ip have any IP addresses on this subnet?
-        LOG.debug("_ips_exist_on_subnet entry %s rd %s"
-                  % (str(subnet['cidr']), route_domain))
-        route_domain = str(route_domain)
-        ipsubnet = netaddr.IPNetwork(subnet['cidr'])
-
-        # Are there any virtual addresses on this subnet?
+    def _get_address_index(self, bigip, service):
+        # Index the virtual and node addresses of the tenant partition
         folder = self.service_adapter.get_folder_name(
             service['loadbalancer']['tenant_id']
         )
-        virtual_services = self.network_helper.get_virtual_service_insertion(
-            bigip,
-            partition=folder
-        )
-        for virt_serv in virtual_services:
-            (_, dest) = virt_serv.items()[0]
-            LOG.debug("            _ips_exist_on_subnet: checking vip %s"
-                      % str(dest['address']))
-            if len(dest['address'].split('%')) > 1:
-                vip_route_domain = dest['address'].split('%')[1]
-            else:
-                vip_route_domain = '0'
-            if vip_route_domain != route_domain:
-                continue
-            vip_addr = strip_domain_address(dest['address'])
-            if netaddr.IPAddress(vip_addr) in ipsubnet:
-                LOG.debug("            _ips_exist_on_subnet: found")
-                return True
-
-        # If there aren't any virtual addresses, are there
-        # node addresses on this subnet?
-        nodes = self.network_helper.get_node_addresses(
-            bigip,
-            partition=folder
-        )
-        for node in nodes:
-            LOG.debug("            _ips_exist_on_subnet: checking node %s"
-                      % str(node))
-            if len(node.split('%')) > 1:
-                node_route_domain = node.split('%')[1]
-            else:
-                node_route_domain = '0'
-            if node_route_domain != route_domain:
-                continue
-            node_addr = strip_domain_address(node)
-            if netaddr.IPAddress(node_addr) in ipsubnet:
-                LOG.debug("        _ips_exist_on_subnet: found")
-                return True
+        return self.network_helper.get_address_index(bigip, partition=folder)
+
+    def _ips_exist_on_subnet(self, bigip, service, subnet, route_domain,
+                             address_index=None):
+        # Does the big-ip have any IP addresses on this subnet?
+        LOG.debug("_ips_exist_on_subnet entry %s rd %s"
+                  % (str(subnet['cidr']), route_domain))
+        if address_index is None:
+            address_index = self._get_address_index(bigip, service)
 
-        LOG.debug("            _ips_exist_on_subnet exit %s"
-                  % str(subnet['cidr']))
-        # nothing found
-        return False
+        # Are there any virtual or node addresses on this subnet?
+        exists = address_index.has_address_in(subnet['cidr'], route_domain)
+        LOG.debug("            _ips_exist_on_subnet exit %s" % exists)
+        return exists
 
     def add_bigip_fdb(self, bigip, fdb):
         self.l2_service.add_bigip_fdb(bigip, fdb)
@@ -922,6 +912,9 @@ class NetworkServiceBuilder(object):
     def update_bigip_fdb(self, bigip, fdb):
         self.l2_service.update_bigip_fdb(bigip, fdb)
 
+    def apply_bigip_fdb(self, bigip, fdb_changes):
+        self.l2_service.apply_bigip_fdb(bigip, fdb_changes)
+
     def set_context(self, context):
         self.l2_service.set_context(context)
 
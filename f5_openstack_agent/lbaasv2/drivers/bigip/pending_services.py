@@ -0,0 +1,99 @@
+"""Retry schedule for loadbalancers with pending services."""
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import datetime
+import random
+
+# Fraction of a retry delay which is randomly taken off, so loadbalancers
+# which became pending together are not retried together.
+DEFAULT_RETRY_JITTER = 0.25
+
+
+def get_service_network_ids(service):
+    """Return the networks a service needs to be connected to."""
+    network_ids = set()
+    network_id = service.get('loadbalancer', dict()).get('network_id', None)
+    if network_id:
+        network_ids.add(network_id)
+    for member in service.get('members', list()):
+        if member.get('network_id', None):
+            network_ids.add(member['network_id'])
+    return network_ids
+
+
+class PendingRetry(object):
+    """Retry state of one pending loadbalancer."""
+
+    def __init__(self):
+        self.attempts = 0
+        self.next_retry = None
+        self.network_ids = set()
+
+
+class PendingServiceBackoff(object):
+    """Exponential backoff of pending service refreshes.
+
+    A loadbalancer whose service stays pending after a refresh is retried
+    after interval seconds, doubling with each attempt up to max_interval
+    seconds. Pending loadbalancers which wait for a network can be woken
+    up to be retried at once when the network changes.
+    """
+
+    def __init__(self, interval, max_interval, jitter=DEFAULT_RETRY_JITTER):
+        self.interval = max(0, interval)
+        self.max_interval = max(self.interval, max_interval)
+        self.jitter = jitter
+        self._retries = {}
+
+    def __contains__(self, lb_id):
+        return lb_id in self._retries
+
+    def __len__(self):
+        return len(self._retries)
+
+    def schedule(self, lb_id, now, network_ids=None):
+        """Schedule the next refresh of a loadbalancer still pending."""
+        retry = self._retries.setdefault(lb_id, PendingRetry())
+        retry.attempts += 1
+        delay = min(self.max_interval,
+                    self.interval * 2 ** (retry.attempts - 1))
+        delay -= delay * self.jitter * random.random()
+        retry.next_retry = now + datetime.timedelta(seconds=delay)
+        retry.network_ids = set(network_ids or list())
+        return retry.next_retry
+
+    def is_due(self, lb_id, now):
+        """Return whether a pending loadbalancer should be refreshed."""
+        retry = self._retries.get(lb_id, None)
+        return retry is None or retry.next_retry is None or \
+            now >= retry.next_retry
+
+    def remove(self, lb_id):
+        self._retries.pop(lb_id, None)
+
+    def wake(self, network_ids=None):
+        """Make loadbalancers due which wait for any of the networks.
+
+        All loadbalancers are woken up if network_ids is None. Returns
+        the ids of the loadbalancers woken up.
+        """
+        if network_ids is not None:
+            network_ids = set(network_ids)
+        woken = list()
+        for lb_id, retry in self._retries.iteritems():
+            if network_ids is None or retry.network_ids & network_ids:
+                retry.next_retry = None
+                woken.append(lb_id)
+        return woken
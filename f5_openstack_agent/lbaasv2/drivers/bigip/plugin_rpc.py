@@ -30,7 +30,8 @@ class LBaaSv2PluginRPC(object):
 
     RPC_API_NAMESPACE = None
 
-    def __init__(self, topic, context, env, group, host):
+    def __init__(self, topic, context, env, group, host,
+                 services_batch_size=constants.SERVICES_BATCH_SIZE):
         """Initialize LBaaSv2PluginRPC."""
         super(LBaaSv2PluginRPC, self).__init__()
 
@@ -48,6 +49,14 @@ class LBaaSv2PluginRPC(object):
         self.group = group
         self.host = host
 
+        self.services_batch_size = max(1, services_batch_size or 1)
+        # Cleared when the plugin is found to predate bulk service retrieval
+        self.bulk_services_supported = True
+        # Cleared when the plugin is found to predate bulk port allocation
+        self.bulk_ports_supported = True
+        # Cleared when the plugin is found to predate bulk status updates
+        self.bulk_status_supported = True
+
     def _make_msg(self, method, **kwargs):
         return {'method': method,
                 'namespace': self.RPC_API_NAMESPACE,
@@ -276,6 +285,44 @@ class LBaaSv2PluginRPC(object):
             topic=self.topic
         )
 
+    @log_helpers.log_method_call
+    def update_statuses(self, loadbalancer_id, statuses):
+        """Update the database with the statuses of a loadbalancer's objects.
+
+        Each status is a dict with the type and id of the object and its
+        provisioning_status and operating_status, and the l7policy_id of
+        an l7rule. Plugins which do not implement the bulk update are
+        sent one status update per object.
+        """
+        if not statuses:
+            return
+        if self.bulk_status_supported:
+            try:
+                self._call(
+                    self.context,
+                    self._make_msg('update_statuses',
+                                   loadbalancer_id=loadbalancer_id,
+                                   statuses=statuses),
+                    topic=self.topic
+                )
+                return
+            except messaging.RemoteError as exc:
+                if exc.exc_type not in ('NoSuchMethod',
+                                        'UnsupportedVersion'):
+                    raise
+                LOG.info("plugin does not support update_statuses, "
+                         "updating statuses one object at a time")
+                self.bulk_status_supported = False
+
+        for status in statuses:
+            object_type = status['type']
+            kwargs = dict(provisioning_status=status['provisioning_status'],
+                          operating_status=status['operating_status'])
+            if object_type == 'l7rule':
+                kwargs['l7policy_id'] = status['l7policy_id']
+            getattr(self, 'update_%s_status' % object_type)(
+                status['id'], **kwargs)
+
     # for L3 binding
     @log_helpers.log_method_call
     def add_allowed_address(self, port_id=None, ip_address=None):
@@ -424,6 +471,58 @@ class LBaaSv2PluginRPC(object):
             topic=self.topic
         )
 
+    def get_ports_by_names(self, port_names=None):
+        """Get the ports named each of port_names.
+
+        Returns a dict of lists of ports by port name. Plugins which do
+        not implement the bulk lookup are called once per name.
+        """
+        port_names = list(port_names or list())
+        ports = self._call_bulk_ports('get_ports_by_names',
+                                      port_names=port_names)
+        if ports is None:
+            ports = dict((port_name, self.get_port_by_name(
+                port_name=port_name)) for port_name in port_names)
+        return ports
+
+    def create_ports_on_subnets(self, ports=None):
+        """Add neutron ports to subnets.
+
+        Each port is a dict of create_port_on_subnet arguments. Returns a
+        dict of the created ports by port name, with None for the ports
+        which could not be created. Plugins which do not implement the
+        bulk creation are called once per port.
+        """
+        ports = list(ports or list())
+        created = self._call_bulk_ports('create_ports_on_subnets',
+                                        ports=ports, host=self.host)
+        if created is None:
+            created = dict((port['name'], self.create_port_on_subnet(**port))
+                           for port in ports)
+        return created
+
+    @log_helpers.log_method_call
+    def _call_bulk_ports(self, method, **kwargs):
+        # Returns None if the bulk method should not or could not be used.
+        if not self.bulk_ports_supported:
+            return None
+        try:
+            return self._call(
+                self.context,
+                self._make_msg(method, **kwargs),
+                topic=self.topic
+            ) or {}
+        except messaging.RemoteError as exc:
+            if exc.exc_type not in ('NoSuchMethod', 'UnsupportedVersion'):
+                raise
+            LOG.info("plugin does not support %s, allocating ports one "
+                     "at a time" % method)
+            self.bulk_ports_supported = False
+        except messaging.MessageDeliveryFailure:
+            LOG.error("agent->plugin RPC exception caught: ", method)
+
+        return None
+
     @log_helpers.log_method_call
     def get_service_by_loadbalancer_id(self,
                                        loadbalancer_id=None):
@@ -443,6 +542,70 @@ class LBaaSv2PluginRPC(object):
 
         return service
 
+    def get_services_by_loadbalancer_ids(self, loadbalancer_ids):
+        """Retrieve the service definitions for a list of loadbalancers.
+
+        Returns a dict of service definitions by loadbalancer id.
+        """
+        return dict(self.iter_services_by_loadbalancer_ids(loadbalancer_ids))
+
+    def iter_services_by_loadbalancer_ids(self, loadbalancer_ids):
+        """Generate (loadbalancer id, service) for a list of loadbalancers.
+
+        Service definitions are retrieved services_batch_size loadbalancers
+        at a time, so only one batch is held at once. Plugins which do not
+        implement the bulk retrieval are called once per loadbalancer, as
+        are the loadbalancers of a batch which fails. The service is None
+        for a loadbalancer whose service could not be retrieved.
+        """
+        loadbalancer_ids = list(loadbalancer_ids)
+        batch_size = self.services_batch_size
+        for index in range(0, len(loadbalancer_ids), batch_size):
+            batch = loadbalancer_ids[index:index + batch_size]
+            try:
+                services = self._get_services_batch(batch)
+            except Exception as exc:
+                LOG.error("Failed to retrieve the services of %d "
+                          "loadbalancers, retrieving them one at a time: %s"
+                          % (len(batch), exc))
+                services = {}
+            for loadbalancer_id in batch:
+                service = services.get(loadbalancer_id, None)
+                if service is None:
+                    try:
+                        service = self.get_service_by_loadbalancer_id(
+                            loadbalancer_id)
+                    except Exception as exc:
+                        LOG.error("Failed to retrieve the service of "
+                                  "loadbalancer %s: %s" %
+                                  (loadbalancer_id, exc))
+                yield loadbalancer_id, service
+
+    @log_helpers.log_method_call
+    def _get_services_batch(self, loadbalancer_ids):
+        services = {}
+        if not self.bulk_services_supported or len(loadbalancer_ids) < 2:
+            return services
+        try:
+            services = self._call(
+                self.context,
+                self._make_msg('get_services_by_loadbalancer_ids',
+                               loadbalancer_ids=loadbalancer_ids,
+                               host=self.host),
+                topic=self.topic
+            )
+        except messaging.RemoteError as exc:
+            if exc.exc_type not in ('NoSuchMethod', 'UnsupportedVersion'):
+                raise
+            LOG.info("plugin does not support get_services_by_loadbalancer_"
+                     "ids, retrieving services one loadbalancer at a time")
+            self.bulk_services_supported = False
+        except messaging.MessageDeliveryFailure:
+            LOG.error("agent->plugin RPC exception caught: ",
+                      "get_services_by_loadbalancer_ids")
+
+        return services or {}
+
     @log_helpers.log_method_call
     def get_all_loadbalancers(self, env=None, group=None, host=None):
         """Retrieve a list of loadbalancers in Neutron."""
@@ -164,6 +164,21 @@ class PoolServiceBuilder(object):
 
         return error
 
+    def update_healthmonitor(self, service, bigips):
+        hm = self.service_adapter.get_healthmonitor(service)
+        hm_helper = self._get_monitor_helper(service)
+        error = None
+
+        for bigip in bigips:
+            try:
+                hm_helper.update(bigip, hm)
+            except Exception as err:
+                error = f5_ex.MonitorUpdateException(err.message)
+                LOG.error("Failed to update monitor %s on %s: %s",
+                          hm['name'], bigip, error.message)
+
+        return error
+
     def delete_healthmonitor(self, service, bigips):
         # delete health monitor
         hm = self.service_adapter.get_healthmonitor(service)
@@ -259,6 +274,9 @@ class PoolServiceBuilder(object):
             hm = self.http_mon_helper
         return hm
 
+    def get_monitor_resource_type(self, service):
+        return self._get_monitor_helper(service).resource_type
+
     def member_exists(self, service, bigip):
         """Return True if a member exists in a pool.
 
@@ -318,3 +336,52 @@ class PoolServiceBuilder(object):
             LOG.error("Error getting member status: %s", e.message)
 
         return member_status
+
+    def get_members_status(self, service, bigip, status_keys):
+        """Return status values for all members of a pool.
+
+        The stats of all members of the pool are loaded with a single
+        request, instead of loading each member and its stats.
+
+        :param service: Has pool name/partition
+        :param bigip: BIG-IP to get member status from.
+        :param status_keys: Array of strings that define which status keys to
+        collect.
+        :return: A dict of member name to a dict with key/value pairs for
+        each status defined in input status_keys.
+        """
+        members_status = {}
+        pool = self.service_adapter.get_pool(service)
+        try:
+            uri = "%s~%s~%s/members/stats" % (
+                bigip.tm.ltm.pools._meta_data['uri'],
+                pool["partition"], urllib.quote(pool["name"]))
+            members_stats = bigip.icrs.get(uri).json()
+            members_status = self._parse_members_status(
+                members_stats, status_keys)
+        except Exception as e:
+            # log error but continue on
+            LOG.error("Error getting pool %s members status: %s",
+                      pool["name"], e.message)
+
+        return members_status
+
+    @staticmethod
+    def _parse_members_status(members_stats, status_keys):
+        # Entries are keyed by the member stats link, as in
+        # .../pool/~Project_t1~pool1/members/~Project_t1~10.2.0.4%252:80/stats
+        members_status = {}
+        for link, entry in (members_stats.get('entries', None) or {}).items():
+            name = urllib.unquote(
+                link.split('?')[0].rstrip('/').split('/')[-2]
+            ).split('~')[-1]
+            entries = entry.get('nestedStats', {}).get('entries', {})
+            status = {}
+            for status_key in status_keys:
+                value = entries.get(status_key, {})
+                if 'value' in value:
+                    status[status_key] = value['value']
+                elif 'description' in value:
+                    status[status_key] = value['description']
+            members_status[name] = status
+        return members_status
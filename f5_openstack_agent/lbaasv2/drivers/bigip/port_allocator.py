@@ -0,0 +1,103 @@
+"""Bulk allocation of the Neutron ports used by BIG-IP addresses."""
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+
+def get_port_address(port):
+    """Return the first fixed ip address of a port, or '' if it has none."""
+    if port and port.get('fixed_ips', None):
+        return port['fixed_ips'][0]['ip_address']
+    return ''
+
+
+class PortAllocator(object):
+    """Neutron ports of self IPs, SNAT addresses and gateways.
+
+    The agent names the ports it allocates, so they are found again by
+    name. Ports are cached by (subnet id, port name). Ports which are not
+    cached are looked up with one bulk RPC, and the ones which do not
+    exist are created with one more. Ports are removed from the cache
+    when the agent deletes them, and the cache is dropped when the
+    driver's caches are flushed.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self._ports = dict()
+
+    def __len__(self):
+        return len(self._ports)
+
+    def get_port(self, subnet_id, port_name):
+        return self._ports.get((subnet_id, port_name), None)
+
+    def add_port(self, subnet_id, port_name, port):
+        self._ports[(subnet_id, port_name)] = port
+
+    def allocate(self, ports, lookups=None):
+        """Get or create ports, and look up ports which are not created.
+
+        ports is a list of dicts of create_port_on_subnet arguments,
+        which must include subnet_id and name. lookups is a list of
+        (subnet id, port name) of ports which are only looked up. Returns
+        a dict of the ports by port name, with None for the ports which
+        do not exist or could not be created.
+        """
+        lookups = list(lookups or list())
+        wanted = [(port['subnet_id'], port['name']) for port in ports]
+        missing = [key for key in wanted + lookups if key not in self._ports]
+        if missing:
+            port_names = list()
+            for subnet_id, port_name in missing:
+                if port_name not in port_names:
+                    port_names.append(port_name)
+            found = self.driver.plugin_rpc.get_ports_by_names(
+                port_names=port_names)
+            for subnet_id, port_name in missing:
+                existing = found.get(port_name, None)
+                if existing:
+                    self.add_port(subnet_id, port_name, existing[0])
+
+            create = [port for port in ports
+                      if (port['subnet_id'], port['name']) not in self._ports]
+            if create:
+                LOG.debug("creating ports %s" %
+                          ', '.join(port['name'] for port in create))
+                created = self.driver.plugin_rpc.create_ports_on_subnets(
+                    ports=create)
+                for port in create:
+                    new_port = created.get(port['name'], None)
+                    if new_port:
+                        self.add_port(port['subnet_id'], port['name'],
+                                      new_port)
+
+        return dict((port_name, self.get_port(subnet_id, port_name))
+                    for subnet_id, port_name in wanted + lookups)
+
+    def remove_port(self, port_name):
+        """Forget the ports named port_name, after deleting them."""
+        for key in [key for key in self._ports if key[1] == port_name]:
+            del self._ports[key]
+
+    def invalidate(self, subnet_id=None):
+        """Forget the ports of a subnet, or of all subnets."""
+        if subnet_id is None:
+            self._ports.clear()
+            return
+        for key in [key for key in self._ports if key[0] == subnet_id]:
+            del self._ports[key]
@@ -115,7 +115,8 @@ class BigIPResourceHelper(object):
             obj = resource.load(name=name, partition=partition)
             obj.delete()
 
-    def load(self, bigip, name=None, partition=None):
+    def load(self, bigip, name=None, partition=None,
+             expand_subcollections=False):
         u"""Retrieve a BIG-IP resource from a BIG-IP.
 
         Populates a resource object with attributes for instance on a
@@ -124,9 +125,15 @@ class BigIPResourceHelper(object):
         :param bigip: BigIP instance to use for creating resource.
         :param name: Name of resource to load.
         :param partition: Partition name for resource.
+        :param expand_subcollections: Include subcollections, e.g. the
+        members of a pool, in the resource.
         :returns: created or updated resource object.
         """
         resource = self._resource(bigip)
+        if expand_subcollections:
+            return resource.load(
+                name=name, partition=partition,
+                requests_params={'params': 'expandSubcollections=true'})
         return resource.load(name=name, partition=partition)
 
     def update(self, bigip, model):
@@ -0,0 +1,139 @@
+# coding=utf-8
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from oslo_log import log as logging
+
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import \
+    BigIPResourceHelper
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import \
+    ResourceType
+from f5_openstack_agent.lbaasv2.drivers.bigip.system_helper import \
+    SystemHelper
+
+LOG = logging.getLogger(__name__)
+
+
+class BigIPResourceSnapshot(object):
+    """Resource collections loaded once per BIG-IP partition and shared.
+
+    Each resource type is fetched with a single collection query per
+    partition the first time it is needed. Existence questions for any
+    number of services are then answered from the loaded collections.
+    Callers which change a partition must invalidate it.
+    """
+
+    def __init__(self):
+        self.system_helper = SystemHelper()
+        self._folders = {}
+        self._collections = {}
+        self._names = {}
+        self._resources = {}
+        self._pool_members = {}
+
+    def get_folders(self, bigip):
+        """Return the set of folder names on a BIG-IP."""
+        if bigip.hostname not in self._folders:
+            self._folders[bigip.hostname] = \
+                set(self.system_helper.get_folders(bigip))
+        return self._folders[bigip.hostname]
+
+    def folder_exists(self, bigip, folder):
+        if folder == 'Common':
+            return True
+        return folder in self.get_folders(bigip)
+
+    def get_resources(self, bigip, resource_type, partition,
+                      expand_subcollections=False):
+        """Return the resources of a type in a partition.
+
+        A collection loaded with expanded subcollections also serves
+        requests that do not need them.
+        """
+        key = (bigip.hostname, resource_type, partition)
+        expanded, resources = self._collections.get(key, (False, None))
+        if resources is None or (expand_subcollections and not expanded):
+            resources = BigIPResourceHelper(resource_type).get_resources(
+                bigip, partition=partition,
+                expand_subcollections=expand_subcollections)
+            self._collections[key] = (expand_subcollections, resources)
+            self._names.pop(key, None)
+            self._resources.pop(key, None)
+            self._pool_members.pop(key, None)
+        return resources
+
+    def load_partitions(self, bigip, prefix, resource_types,
+                        expand_subcollections=False):
+        """Load the collections of every partition named with a prefix."""
+        for folder in self.get_folders(bigip):
+            if str(folder).startswith(prefix):
+                for resource_type in resource_types:
+                    self.get_resources(bigip, resource_type, folder,
+                                       expand_subcollections)
+
+    def get_names(self, bigip, resource_type, partition):
+        """Return the set of resource names of a type in a partition."""
+        key = (bigip.hostname, resource_type, partition)
+        resources = self.get_resources(bigip, resource_type, partition)
+        if key not in self._names:
+            self._names[key] = set(resource.name for resource in resources)
+        return self._names[key]
+
+    def get_resource(self, bigip, resource_type, name, partition,
+                     expand_subcollections=False):
+        """Return a resource of a type in a partition, or None."""
+        key = (bigip.hostname, resource_type, partition)
+        resources = self.get_resources(bigip, resource_type, partition,
+                                       expand_subcollections)
+        if key not in self._resources:
+            self._resources[key] = dict(
+                (resource.name, resource) for resource in resources)
+        return self._resources[key].get(name, None)
+
+    def exists(self, bigip, resource_type, name, partition):
+        return name in self.get_names(bigip, resource_type, partition)
+
+    def get_pool_members(self, bigip, partition, pool_name):
+        """Return the set of member names of a pool.
+
+        Returns None if the pool does not exist.
+        """
+        key = (bigip.hostname, ResourceType.pool, partition)
+        pools = self.get_resources(bigip, ResourceType.pool, partition,
+                                   expand_subcollections=True)
+        if key not in self._pool_members:
+            pool_members = {}
+            for pool in pools:
+                members = getattr(pool, 'membersReference', None) or {}
+                pool_members[pool.name] = set(
+                    member['name'] for member in members.get('items', []))
+            self._pool_members[key] = pool_members
+        return self._pool_members[key].get(pool_name, None)
+
+    def invalidate(self, bigip=None, partition=None):
+        """Forget loaded collections for a BIG-IP and/or partition."""
+        if bigip:
+            self._folders.pop(bigip.hostname, None)
+        else:
+            self._folders = {}
+        for key in list(self._collections):
+            if bigip and key[0] != bigip.hostname:
+                continue
+            if partition and key[2] != partition:
+                continue
+            del self._collections[key]
+            self._names.pop(key, None)
+            self._resources.pop(key, None)
+            self._pool_members.pop(key, None)
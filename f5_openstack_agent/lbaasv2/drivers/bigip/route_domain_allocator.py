@@ -0,0 +1,91 @@
+"""Allocation of the route domain ids of a BIG-IP."""
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import heapq
+
+from eventlet import semaphore
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+# Route domain ids available to tenants, 0 being the Common route domain.
+MIN_ROUTE_DOMAIN_ID = 1
+MAX_ROUTE_DOMAIN_ID = 65534
+
+
+class RouteDomainIdAllocator(object):
+    """The route domain ids in use on one BIG-IP.
+
+    The ids are loaded from the device the first time one is reserved.
+    Ids are then reserved from a free list of the gaps below the highest
+    id in use, lowest first, and then above it, so the ids handed out
+    are the same as walking the sorted route domains on the device,
+    without fetching them for every route domain created. Ids reserved
+    within the agent are never handed out twice; ids taken outside the
+    agent are found by loading the ids again after a conflict.
+    """
+
+    def __init__(self):
+        self._lock = semaphore.Semaphore()
+        self._used = None
+        self._free = list()
+        self._next_id = MIN_ROUTE_DOMAIN_ID
+
+    @property
+    def loaded(self):
+        return self._used is not None
+
+    def reserve(self, load_ids):
+        """Reserve the lowest free id, loading the ids with load_ids."""
+        with self._lock:
+            if self._used is None:
+                self._load(load_ids())
+            while self._free:
+                rd_id = heapq.heappop(self._free)
+                if rd_id not in self._used:
+                    break
+            else:
+                while self._next_id in self._used:
+                    self._next_id += 1
+                if self._next_id > MAX_ROUTE_DOMAIN_ID:
+                    raise LookupError("No route domain id available")
+                rd_id = self._next_id
+                self._next_id += 1
+            self._used.add(rd_id)
+            return rd_id
+
+    def release(self, rd_id):
+        """Return an id to the free list."""
+        if self._used is None or rd_id not in self._used:
+            return
+        self._used.discard(rd_id)
+        if rd_id >= MIN_ROUTE_DOMAIN_ID:
+            heapq.heappush(self._free, rd_id)
+
+    def invalidate(self):
+        """Load the ids again before the next one is reserved."""
+        self._used = None
+        self._free = list()
+        self._next_id = MIN_ROUTE_DOMAIN_ID
+
+    def _load(self, rd_ids):
+        self._used = set(rd_ids)
+        self._next_id = max(self._used | set([0])) + 1
+        self._free = [rd_id for rd_id in
+                      range(MIN_ROUTE_DOMAIN_ID, self._next_id)
+                      if rd_id not in self._used]
+        heapq.heapify(self._free)
+        LOG.debug("loaded %d route domain ids, %d free below %d" %
+                  (len(self._used), len(self._free), self._next_id))
@@ -0,0 +1,136 @@
+"""Cache of the networks and subnets placed in tenant route domains."""
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from collections import OrderedDict
+
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_MAX_TENANTS = 1000
+
+
+class RouteDomainCache(object):
+    """Route domain subnet cache, indexed by tenant and by network.
+
+    The cache determines whether there is an existing BIG-IP subnet that
+    conflicts with a new one being assigned to a route domain. Entries
+    are kept per tenant:
+
+        {'<tenant_id>': {
+            <route domain id>: {
+                '<network type>-<segmentation id>': {
+                    'subnets': {
+                        '<subnet id>': {'cidr': <netaddr.IPNetwork>}}}}}}
+
+    Networks are also indexed by their short name, so the route domain
+    of a network is found without scanning the tenants. At most
+    max_tenants tenants are cached; the least recently loaded tenant is
+    evicted first and is loaded again from the BIG-IPs when next used.
+    """
+
+    def __init__(self, max_tenants=DEFAULT_MAX_TENANTS):
+        self.max_tenants = max_tenants
+        self._tenants = OrderedDict()
+        # net short name -> OrderedDict of (tenant_id, route domain id)
+        self._networks = dict()
+
+    def __contains__(self, tenant_id):
+        return tenant_id in self._tenants
+
+    def __len__(self):
+        return len(self._tenants)
+
+    def __str__(self):
+        return str(dict(self._tenants))
+
+    def add_tenant(self, tenant_id):
+        """Add an empty tenant, or mark a cached tenant as recently used."""
+        if tenant_id in self._tenants:
+            self._tenants[tenant_id] = self._tenants.pop(tenant_id)
+            return
+        self._tenants[tenant_id] = dict()
+        while self.max_tenants and len(self._tenants) > self.max_tenants:
+            evicted = next(iter(self._tenants))
+            LOG.debug("rds_cache: evicting tenant %s" % evicted)
+            self.invalidate(evicted)
+
+    def get_route_domains(self, tenant_id):
+        """Return the route domain entries of a tenant.
+
+        The entries map route domain ids to the networks placed in them.
+        """
+        return self._tenants[tenant_id]
+
+    def add_route_domain(self, tenant_id, route_domain_id):
+        tenant_entry = self._tenants[tenant_id]
+        if route_domain_id not in tenant_entry:
+            tenant_entry[route_domain_id] = dict()
+        return tenant_entry[route_domain_id]
+
+    def add_network(self, tenant_id, route_domain_id, net_short_name):
+        """Place a network in a route domain and return its subnets."""
+        rd_entry = self.add_route_domain(tenant_id, route_domain_id)
+        if net_short_name not in rd_entry:
+            rd_entry[net_short_name] = {'subnets': dict()}
+            self._networks.setdefault(net_short_name, OrderedDict())[
+                (tenant_id, route_domain_id)] = True
+        return rd_entry[net_short_name]['subnets']
+
+    def add_subnet(self, tenant_id, route_domain_id, net_short_name,
+                   subnet_id, cidr):
+        net_subnets = self.add_network(
+            tenant_id, route_domain_id, net_short_name)
+        net_subnets[subnet_id] = {'cidr': cidr}
+
+    def get_route_domain(self, net_short_name):
+        """Return the route domain id of a network, or None if unknown."""
+        locations = self._networks.get(net_short_name, None)
+        if not locations:
+            return None
+        tenant_id, route_domain_id = next(iter(locations))
+        return route_domain_id
+
+    def remove_subnet(self, net_short_name, subnet_id):
+        """Remove a subnet, and its network and route domain if empty."""
+        locations = self._networks.get(net_short_name, dict())
+        for tenant_id, route_domain_id in list(locations):
+            rd_entry = self._tenants[tenant_id][route_domain_id]
+            net_subnets = rd_entry[net_short_name]['subnets']
+            net_subnets.pop(subnet_id, None)
+            if net_subnets:
+                continue
+            del rd_entry[net_short_name]
+            del locations[(tenant_id, route_domain_id)]
+            if not rd_entry:
+                LOG.debug("removing route domain %d from tenant %s" %
+                          (route_domain_id, tenant_id))
+                del self._tenants[tenant_id][route_domain_id]
+        if not locations:
+            self._networks.pop(net_short_name, None)
+
+    def invalidate(self, tenant_id=None):
+        """Forget a tenant, or all tenants if tenant_id is None."""
+        if tenant_id is None:
+            self._tenants.clear()
+            self._networks.clear()
+            return
+        tenant_entry = self._tenants.pop(tenant_id, dict())
+        for route_domain_id, rd_entry in tenant_entry.iteritems():
+            for net_short_name in rd_entry:
+                locations = self._networks.get(net_short_name, dict())
+                locations.pop((tenant_id, route_domain_id), None)
+                if not locations:
+                    self._networks.pop(net_short_name, None)
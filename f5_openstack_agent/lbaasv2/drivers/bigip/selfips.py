@@ -18,9 +18,13 @@ import constants_v2 as const
 import netaddr
 from oslo_log import log as logging
 
+from f5_openstack_agent.lbaasv2.drivers.bigip.assured_cache import \
+    subnet_fingerprint
 from f5_openstack_agent.lbaasv2.drivers.bigip import exceptions as f5_ex
 from f5_openstack_agent.lbaasv2.drivers.bigip.network_helper import \
     NetworkHelper
+from f5_openstack_agent.lbaasv2.drivers.bigip.port_allocator import \
+    get_port_address
 from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper \
     import BigIPResourceHelper
 from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper \
@@ -101,10 +105,10 @@ class BigipSelfIpManager(object):
         lb_id = service['loadbalancer']['id']
 
         # If we have already assured this subnet.. return.
-        # Note this cache is periodically cleared in order to
+        # Note the cache entries expire in order to periodically
         # force assurance that the configuration is present.
-        if tenant_id in bigip.assured_tenant_snat_subnets and \
-                subnet['id'] in bigip.assured_tenant_snat_subnets[tenant_id]:
+        if bigip.assured_tenant_snat_subnets.is_assured(
+                (tenant_id, subnet['id']), subnet_fingerprint(subnet)):
             return True
 
         selfip_address = self._get_bigip_selfip_address(bigip, subnet, lb_id)
@@ -139,29 +143,21 @@ class BigipSelfIpManager(object):
             self.l3_binding.bind_address(subnet_id=subnet['id'],
                                          ip_address=selfip_address)
 
+    def get_selfip_port(self, bigip, subnet, device_id):
+        # Get the arguments to create the selfip port of a bigip
+        return {'subnet_id': subnet['id'],
+                'mac_address': None,
+                'name': "local-" + bigip.device_name + "-" + subnet['id'],
+                'fixed_address_count': 1,
+                'device_id': device_id,
+                'vnic_type': "baremetal"}
+
     def _get_bigip_selfip_address(self, bigip, subnet, device_id):
         u"""Ensure a selfip address is allocated on Neutron network."""
         # Get ip address for selfip to use on BIG-IP.
-        selfip_address = ""
-        selfip_name = "local-" + bigip.device_name + "-" + subnet['id']
-        ports = self.driver.plugin_rpc.get_port_by_name(port_name=selfip_name)
-        if len(ports) > 0:
-            port = ports[0]
-        else:
-            port = self.driver.plugin_rpc.create_port_on_subnet(
-                subnet_id=subnet['id'],
-                mac_address=None,
-                name=selfip_name,
-                fixed_address_count=1,
-                device_id=device_id,
-                vnic_type="baremetal"
-            )
-
-        if port and 'fixed_ips' in port:
-            fixed_ip = port['fixed_ips'][0]
-            selfip_address = fixed_ip['ip_address']
-
-        return selfip_address
+        selfip_port = self.get_selfip_port(bigip, subnet, device_id)
+        ports = self.driver.port_allocator.allocate([selfip_port])
+        return get_port_address(ports[selfip_port['name']])
 
     def assure_gateway_on_subnet(self, bigip, subnetinfo, traffic_group):
         """Ensure """
@@ -181,7 +177,8 @@ class BigipSelfIpManager(object):
             raise KeyError("attempting to create gateway on subnet without "
                            "gateway ip address specified.")
 
-        if subnet['id'] in bigip.assured_gateway_subnets:
+        if bigip.assured_gateway_subnets.is_assured(
+                subnet['id'], subnet_fingerprint(subnet)):
             return True
 
         (network_name, preserve_network_name) = \
@@ -248,7 +245,8 @@ class BigipSelfIpManager(object):
                 "Failed to add virtual address to traffic group %s",
                 traffic_group)
 
-        bigip.assured_gateway_subnets.append(subnet['id'])
+        bigip.assured_gateway_subnets.assured(
+            subnet['id'], fingerprint=subnet_fingerprint(subnet))
 
     def delete_gateway_on_subnet(self, bigip, subnetinfo):
         network = None
@@ -301,8 +299,7 @@ class BigipSelfIpManager(object):
             raise f5_ex.VirtualServerDeleteException(
                 "Failed to delete gateway service on subnet %s", subnet['id'])
 
-        if subnet['id'] in bigip.assured_gateway_subnets:
-            bigip.assured_gateway_subnets.remove(subnet['id'])
+        bigip.assured_gateway_subnets.remove(subnet['id'])
 
         return gw_name
 
@@ -0,0 +1,169 @@
+"""Scheduler for driver service requests."""
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import uuid
+
+from eventlet import event
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENT_REQUESTS = 1
+
+
+class ServiceRequest(object):
+    """A queued or running driver request.
+
+    A request is keyed by the loadbalancer, tenant and networks of the
+    service it carries. Requests without a service (device wide scans,
+    purges and backups) have no keys and are run exclusively.
+
+    A queued request which may be coalesced is superseded when a newer
+    request for the same loadbalancer arrives before it has started. The
+    newer request takes its place in the queue and carries the list of
+    requests it superseded; those are woken with its result.
+    """
+
+    def __init__(self, method_name, service=None, tenant_id=None,
+                 coalesce=False):
+        self.request_id = uuid.uuid4()
+        self.method_name = method_name
+        self.service = service
+        self.loadbalancer_id = None
+        self.tenant_id = tenant_id
+        self.network_ids = set()
+        self.coalesce = coalesce
+        self.started = False
+        self.ready = event.Event()
+        self.superseded = []
+        self.superseded_by = None
+        self.result = None
+        self.error = None
+
+        if service:
+            loadbalancer = service.get('loadbalancer', None) or {}
+            self.loadbalancer_id = loadbalancer.get('id', None)
+            self.tenant_id = loadbalancer.get('tenant_id', tenant_id)
+            if loadbalancer.get('network_id', None):
+                self.network_ids.add(loadbalancer['network_id'])
+            self.network_ids.update(service.get('networks', None) or {})
+
+    @property
+    def exclusive(self):
+        return not (self.loadbalancer_id or self.tenant_id)
+
+    def conflicts(self, other):
+        """Return True if both requests can not run at the same time."""
+        if self.exclusive or other.exclusive:
+            return True
+        if self.loadbalancer_id and \
+                self.loadbalancer_id == other.loadbalancer_id:
+            return True
+        if self.tenant_id and self.tenant_id == other.tenant_id:
+            return True
+        return bool(self.network_ids & other.network_ids)
+
+    def supersedes(self, other):
+        """Return True if this request can run in place of other."""
+        return (self.coalesce and other.coalesce and
+                not other.started and
+                self.loadbalancer_id is not None and
+                self.loadbalancer_id == other.loadbalancer_id)
+
+
+class ServiceScheduler(object):
+    """Admit driver requests concurrently unless they conflict.
+
+    Requests for different loadbalancers, tenants and networks run in
+    parallel up to max_concurrent. Conflicting requests are run in the
+    order they were submitted; a request is never admitted ahead of an
+    earlier one it conflicts with. Waiters block on an event which is
+    sent when the request is admitted, rather than polling the queue.
+
+    A new request which may be coalesced replaces the most recent queued
+    request it conflicts with, if that request is for the same
+    loadbalancer and has not started. Only the newest service snapshot
+    is then provisioned.
+
+    The scheduler state is only changed from code which does no I/O, so
+    it can not be preempted by another greenthread while doing so.
+    """
+
+    def __init__(self, max_concurrent=DEFAULT_MAX_CONCURRENT_REQUESTS):
+        self.max_concurrent = max(1, max_concurrent or 1)
+        self.pending = []
+        self.running = []
+
+    def __len__(self):
+        return len(self.pending) + len(self.running)
+
+    def submit(self, method_name, service=None, tenant_id=None,
+               coalesce=False):
+        """Queue a request and block until it may run.
+
+        The returned request has superseded_by set if it was coalesced
+        into a newer request, in which case it must not be run.
+        """
+        request = ServiceRequest(method_name, service, tenant_id, coalesce)
+        older = self._last_conflict(request)
+        if older and request.supersedes(older):
+            self.pending[self.pending.index(older)] = request
+            request.superseded = older.superseded + [older]
+            older.superseded = []
+            for superseded in request.superseded:
+                superseded.superseded_by = request
+        else:
+            self.pending.append(request)
+        self._dispatch()
+        if not request.started:
+            request.ready.wait()
+        return request
+
+    def release(self, request):
+        """Mark a running request done and admit any it was blocking."""
+        if request in self.running:
+            self.running.remove(request)
+        elif request in self.pending:
+            self.pending.remove(request)
+        for superseded in request.superseded:
+            superseded.ready.send(True)
+        self._dispatch()
+
+    def _last_conflict(self, request):
+        for queued in reversed(self.pending):
+            if request.conflicts(queued):
+                return queued
+        return None
+
+    def _dispatch(self):
+        blocked = []
+        for request in list(self.pending):
+            if len(self.running) >= self.max_concurrent:
+                break
+            if self._blocked(request, self.running) or \
+                    self._blocked(request, blocked):
+                blocked.append(request)
+                continue
+            self.pending.remove(request)
+            self.running.append(request)
+            request.started = True
+            request.ready.send(True)
+
+    @staticmethod
+    def _blocked(request, others):
+        for other in others:
+            if request.conflicts(other):
+                return True
+        return False
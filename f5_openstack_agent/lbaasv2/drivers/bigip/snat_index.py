@@ -0,0 +1,94 @@
+"""Index of the SNAT translations used by the snatpools of a BIG-IP."""
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+import time
+
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_REVALIDATE_INTERVAL = 300
+
+
+class SNATMembershipIndex(object):
+    """Snatpools using each SNAT translation of one BIG-IP.
+
+    Snatpool members are indexed by their basename, as SNAT translation
+    names are unique across partitions. The index is loaded from the
+    device with one snatpool collection query, updated as the agent
+    adds and removes members, and loaded again once it is older than
+    revalidate_interval seconds, so changes made outside the agent are
+    eventually seen.
+    """
+
+    def __init__(self, revalidate_interval=DEFAULT_REVALIDATE_INTERVAL):
+        self.revalidate_interval = revalidate_interval
+        self.loaded_at = None
+        # member name -> set of (snatpool partition, snatpool name)
+        self._members = dict()
+        # (snatpool partition, snatpool name) -> set of member names
+        self._pools = dict()
+
+    def is_stale(self, now=None):
+        if self.loaded_at is None:
+            return True
+        if not self.revalidate_interval:
+            return False
+        now = time.time() if now is None else now
+        return now - self.loaded_at >= self.revalidate_interval
+
+    def load(self, bigip, now=None):
+        """Replace the index with the snatpools on a BIG-IP."""
+        self._members = dict()
+        self._pools = dict()
+        for snatpool in bigip.tm.ltm.snatpools.get_collection():
+            pool_key = (snatpool.partition, snatpool.name)
+            self._pools[pool_key] = set()
+            for member in getattr(snatpool, 'members', list()):
+                self.add_member(pool_key[0], pool_key[1], member)
+        self.loaded_at = time.time() if now is None else now
+        LOG.debug("snat index: loaded %d snatpools from %s" %
+                  (len(self._pools), bigip.hostname))
+
+    def invalidate(self):
+        self.loaded_at = None
+
+    def add_member(self, pool_partition, pool_name, member):
+        pool_key = (pool_partition, pool_name)
+        member_name = os.path.basename(member)
+        self._members.setdefault(member_name, set()).add(pool_key)
+        self._pools.setdefault(pool_key, set()).add(member_name)
+
+    def remove_member(self, pool_partition, pool_name, member):
+        pool_key = (pool_partition, pool_name)
+        member_name = os.path.basename(member)
+        pools = self._members.get(member_name, set())
+        pools.discard(pool_key)
+        if not pools:
+            self._members.pop(member_name, None)
+        self._pools.get(pool_key, set()).discard(member_name)
+
+    def remove_pool(self, pool_partition, pool_name):
+        pool_key = (pool_partition, pool_name)
+        for member_name in self._pools.pop(pool_key, set()):
+            self.remove_member(pool_partition, pool_name, member_name)
+
+    def get_member_use_count(self, member_name):
+        """Return how many snatpools have a member named member_name."""
+        return len(self._members.get(os.path.basename(member_name), set()))
+
+    def get_pools(self, member_name):
+        return set(self._members.get(os.path.basename(member_name), set()))
@@ -17,17 +17,27 @@ from requests.exceptions import HTTPError
 
 import os
 
+from f5_openstack_agent.lbaasv2.drivers.bigip.assured_cache import \
+    subnet_fingerprint
 from f5_openstack_agent.lbaasv2.drivers.bigip import exceptions as f5_ex
 from f5_openstack_agent.lbaasv2.drivers.bigip.network_helper import \
     NetworkHelper
+from f5_openstack_agent.lbaasv2.drivers.bigip.port_allocator import \
+    get_port_address
 from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import \
     BigIPResourceHelper
 from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import \
     ResourceType
+from f5_openstack_agent.lbaasv2.drivers.bigip.snat_index import \
+    SNATMembershipIndex
 from oslo_log import log as logging
 
 LOG = logging.getLogger(__name__)
 
+# SNAT translations are looked up by name up to this many at a time, and
+# the translations of their partition are listed once for more.
+SNAT_TRANSLATION_LOOKUP_LIMIT = 4
+
 
 class BigipSnatManager(object):
     def __init__(self, driver, l2_service, l3_binding):
@@ -38,6 +48,28 @@ class BigipSnatManager(object):
         self.snat_translation_manager = BigIPResourceHelper(
             ResourceType.snat_translation)
         self.network_helper = NetworkHelper()
+        # bigip hostname -> SNATMembershipIndex
+        self.snat_indexes = {}
+
+    def get_snat_index(self, bigip):
+        # Get the snatpool membership index of a bigip, loading it
+        # if it was not loaded yet or is due to be revalidated.
+        snat_index = self.snat_indexes.get(bigip.hostname, None)
+        if snat_index is None:
+            snat_index = SNATMembershipIndex(
+                self.driver.conf.f5_snat_index_revalidate_interval)
+            self.snat_indexes[bigip.hostname] = snat_index
+        if snat_index.is_stale():
+            snat_index.load(bigip)
+        return snat_index
+
+    def invalidate_snat_index(self, bigip=None):
+        # Reload the snatpool membership of a bigip, or of all bigips,
+        # when next needed.
+        if bigip is None:
+            self.snat_indexes = {}
+        else:
+            self.snat_indexes.pop(bigip.hostname, None)
 
     def _get_snat_name(self, subnet, tenant_id):
         # Get the snat name based on HA type
@@ -65,31 +97,26 @@ class BigipSnatManager(object):
         LOG.error('Invalid f5_ha_type:%s' % self.driver.conf.f5_ha_type)
         return ''
 
+    def get_snat_ports(self, subnet, tenant_id, snat_count, lb_id):
+        # Get the arguments to create the snat ports of a subnet
+        snat_name = self._get_snat_name(subnet, tenant_id)
+        return [{'subnet_id': subnet['id'],
+                 'mac_address': None,
+                 'name': snat_name + "_" + str(i),
+                 'fixed_address_count': 1,
+                 'device_id': lb_id,
+                 'vnic_type': "baremetal"}
+                for i in range(snat_count)]
+
     def get_snat_addrs(self, subnetinfo, tenant_id, snat_count, lb_id):
         # Get the ip addresses for snat """
         subnet = subnetinfo['subnet']
         snat_addrs = []
 
-        snat_name = self._get_snat_name(subnet, tenant_id)
-        for i in range(snat_count):
-            ip_address = ""
-            index_snat_name = snat_name + "_" + str(i)
-            ports = self.driver.plugin_rpc.get_port_by_name(
-                port_name=index_snat_name)
-            if len(ports) > 0:
-                first_port = ports[0]
-                first_fixed_ip = first_port['fixed_ips'][0]
-                ip_address = first_fixed_ip['ip_address']
-            else:
-                new_port = self.driver.plugin_rpc.create_port_on_subnet(
-                    subnet_id=subnet['id'],
-                    mac_address=None,
-                    name=index_snat_name,
-                    fixed_address_count=1, device_id=lb_id,
-                    vnic_type="baremetal"
-                )
-                if new_port is not None:
-                    ip_address = new_port['fixed_ips'][0]['ip_address']
+        snat_ports = self.get_snat_ports(subnet, tenant_id, snat_count, lb_id)
+        ports = self.driver.port_allocator.allocate(snat_ports)
+        for snat_port in snat_ports:
+            ip_address = get_port_address(ports[snat_port['name']])
 
             # Push the IP address on the list if the port was acquired.
             if len(ip_address) > 0:
@@ -129,78 +156,138 @@ class BigipSnatManager(object):
         network = subnetinfo['network']
         subnet = subnetinfo['subnet']
 
-        if tenant_id not in bigip.assured_tenant_snat_subnets:
-            bigip.assured_tenant_snat_subnets[tenant_id] = []
-        if subnet['id'] in bigip.assured_tenant_snat_subnets[tenant_id]:
+        if bigip.assured_tenant_snat_subnets.is_assured(
+                (tenant_id, subnet['id']), subnet_fingerprint(subnet)):
             return
 
+        # Build the translations and snatpool members wanted for the
+        # subnet, so the snatpool is read and written at most once.
         snat_name = self._get_snat_name(subnet, tenant_id)
+        snat_traffic_group = self._get_snat_traffic_group(tenant_id)
+        ip_addresses = []
+        snat_translation_models = []
+        snat_pool_members = []
         for i, snat_address in enumerate(snat_info['addrs']):
             ip_address = snat_address + \
                 '%' + str(network['route_domain_id'])
             index_snat_name = snat_name + "_" + str(i)
-
-            snat_traffic_group = self._get_snat_traffic_group(tenant_id)
-            # snat.create() did  the following in LBaaSv1
-            # Creates the SNAT
-            #   * if the traffic_group is empty it uses a const
-            #     but this seems like it should be an error see message
-            #     in this file about this
-            # Create a SNAT Pool if a name was passed in
-            #   * Add the snat to the list of members
-            snat_translation_model = {
+            ip_addresses.append(ip_address)
+            snat_translation_models.append({
                 "name": index_snat_name,
                 "partition": snat_info['network_folder'],
                 "address": ip_address,
                 "trafficGroup": snat_traffic_group
-            }
-            try:
-                if not self.snat_translation_manager.exists(
-                        bigip,
-                        name=index_snat_name,
-                        partition=snat_info['network_folder']):
-                    self.snat_translation_manager.create(
-                        bigip, snat_translation_model)
-            except Exception as err:
-                LOG.exception(err)
-                raise f5_ex.SNATCreationException(
-                    "Error creating snat translation manager %s" %
-                    index_snat_name)
-
-            snat_pool_model = {
-                "name": snat_info['pool_name'],
-                "partition": snat_info['pool_folder'],
-            }
-            snat_pool_member = (
+            })
+            snat_pool_members.append(
                 '/' + snat_info['network_folder'] + '/' + index_snat_name)
-            snat_pool_model["members"] = [snat_pool_member]
+
+        snat_pool_model = {
+            "name": snat_info['pool_name'],
+            "partition": snat_info['pool_folder'],
+            "members": snat_pool_members
+        }
+        try:
+            snatpool = self._load_snatpool(
+                bigip, snat_pool_model['name'], snat_pool_model['partition'])
+        except Exception as err:
+            LOG.error("Load SNAT pool failed %s" % err.message)
+            raise f5_ex.SNATCreationException(
+                "Failed to create SNAT pool")
+
+        # The translations are verified even when the snatpool has all
+        # of its members, so a translation deleted since is created.
+        self._assure_snat_translations(
+            bigip, snat_info['network_folder'], snat_translation_models)
+
+        current_members = snatpool.members if snatpool else []
+        missing = [
+            (snat_translation_model, snat_pool_member)
+            for snat_translation_model, snat_pool_member
+            in zip(snat_translation_models, snat_pool_members)
+            if snat_pool_member not in current_members
+        ]
+        if missing:
             try:
-                if not self.snatpool_manager.exists(
-                        bigip,
-                        name=snat_pool_model['name'],
-                        partition=snat_pool_model['partition']):
+                if snatpool is None:
                     LOG.debug("Creating SNAT pool: %s" % snat_pool_model)
                     self.snatpool_manager.create(bigip, snat_pool_model)
                 else:
                     LOG.debug("Updating SNAT pool")
-                    snatpool = self.snatpool_manager.load(
-                        bigip,
-                        name=snat_pool_model["name"],
-                        partition=snat_pool_model["partition"]
-                    )
-                    snatpool.members.append(snat_pool_member)
-                    snatpool.modify(members=snatpool.members)
-
+                    snatpool.modify(members=current_members + [
+                        member for model, member in missing])
             except Exception as err:
+                self.invalidate_snat_index(bigip)
                 LOG.error("Create SNAT pool failed %s" % err.message)
                 raise f5_ex.SNATCreationException(
                     "Failed to create SNAT pool")
+        else:
+            LOG.debug("SNAT pool %s already has the SNAT addresses of "
+                      "subnet %s" % (snat_pool_model['name'], subnet['id']))
 
-            if self.l3_binding:
+        snat_index = self._get_loaded_snat_index(bigip)
+        for snat_pool_member in snat_pool_members:
+            snat_index.add_member(snat_pool_model['partition'],
+                                  snat_pool_model['name'], snat_pool_member)
+
+        if self.l3_binding:
+            for ip_address in ip_addresses:
                 self.l3_binding.bind_address(subnet_id=subnet['id'],
                                              ip_address=ip_address)
 
-        bigip.assured_tenant_snat_subnets[tenant_id].append(subnet['id'])
+        bigip.assured_tenant_snat_subnets.assured(
+            (tenant_id, subnet['id']), fingerprint=subnet_fingerprint(subnet))
+
+    def _load_snatpool(self, bigip, name, partition):
+        # Load a snatpool, or return None if it does not exist.
+        try:
+            return self.snatpool_manager.load(
+                bigip, name=name, partition=partition)
+        except HTTPError as err:
+            if err.response.status_code == 404:
+                return None
+            raise
+
+    def _assure_snat_translations(self, bigip, partition,
+                                  snat_translation_models):
+        # Create the snat translations which do not exist, looking up
+        # a few by name rather than listing the partition, which is
+        # often Common and holds the translations of every tenant.
+        try:
+            if len(snat_translation_models) <= \
+                    SNAT_TRANSLATION_LOOKUP_LIMIT:
+                existing = set(
+                    model['name'] for model in snat_translation_models
+                    if self.snat_translation_manager.exists(
+                        bigip, name=model['name'], partition=partition))
+            else:
+                existing = set(
+                    translation.name for translation in
+                    self.snat_translation_manager.get_resources(
+                        bigip, partition=partition))
+        except Exception as err:
+            LOG.exception(err)
+            raise f5_ex.SNATCreationException(
+                "Error loading snat translations of %s" % partition)
+
+        for snat_translation_model in snat_translation_models:
+            if snat_translation_model['name'] in existing:
+                continue
+            try:
+                self.snat_translation_manager.create(
+                    bigip, snat_translation_model)
+            except Exception as err:
+                LOG.exception(err)
+                raise f5_ex.SNATCreationException(
+                    "Error creating snat translation manager %s" %
+                    snat_translation_model['name'])
+
+    def _get_loaded_snat_index(self, bigip):
+        # Get the index of a bigip only if it was loaded, so that
+        # assuring snats does not load every snatpool of the bigip.
+        snat_index = self.snat_indexes.get(bigip.hostname, None)
+        if snat_index is None:
+            return SNATMembershipIndex()
+        return snat_index
 
     def delete_bigip_snats(self, bigip, subnetinfo, tenant_id):
         # Assure shared snat configuration (which syncs) is deleted.
@@ -214,24 +301,18 @@ class BigipSnatManager(object):
 
     def _remove_assured_tenant_snat_subnet(self, bigip, tenant_id, subnet):
         # Remove ref for the subnet for this tenant"""
-        if tenant_id in bigip.assured_tenant_snat_subnets:
-            tenant_snat_subnets = \
-                bigip.assured_tenant_snat_subnets[tenant_id]
-            if tenant_snat_subnets and subnet['id'] in tenant_snat_subnets:
-                LOG.debug(
-                    'Remove subnet id %s from '
-                    'bigip.assured_tenant_snat_subnets for tenant %s' %
-                    (subnet['id'], tenant_id))
-                tenant_snat_subnets.remove(subnet['id'])
-            else:
-                LOG.debug(
-                    'Subnet id %s does not exist in '
-                    'bigip.assured_tenant_snat_subnets for tenant %s' %
-                    (subnet['id'], tenant_id))
+        if (tenant_id, subnet['id']) in bigip.assured_tenant_snat_subnets:
+            LOG.debug(
+                'Remove subnet id %s from '
+                'bigip.assured_tenant_snat_subnets for tenant %s' %
+                (subnet['id'], tenant_id))
+            bigip.assured_tenant_snat_subnets.remove(
+                (tenant_id, subnet['id']))
         else:
             LOG.debug(
-                'Tenant id %s does not exist in '
-                'bigip.assured_tenant_snat_subnets' % tenant_id)
+                'Subnet id %s does not exist in '
+                'bigip.assured_tenant_snat_subnets for tenant %s' %
+                (subnet['id'], tenant_id))
 
     def _delete_bigip_snats(self, bigip, subnetinfo, tenant_id):
         # Assure snats deleted in standalone mode """
@@ -246,6 +327,7 @@ class BigipSnatManager(object):
         snat_pool_folder = snat_pool_name
         deleted_names = set()
         in_use_subnets = set()
+        snat_index = self.get_snat_index(bigip)
 
         # Delete SNATs on traffic-group-local-only
         snat_name = self._get_snat_name(subnet, tenant_id)
@@ -296,12 +378,16 @@ class BigipSnatManager(object):
                     LOG.debug('Snat pool is empty - delete snatpool')
                     try:
                         snatpool.delete()
+                        snat_index.remove_pool(
+                            snat_pool_folder, snat_pool_name)
                     except HTTPError as err:
                         LOG.error("Delete SNAT pool failed %s" % err.message)
                 else:
                     LOG.debug('Snat pool is not empty - update snatpool')
                     try:
                         snatpool.modify(members=snatpool.members)
+                        snat_index.remove_member(
+                            snat_pool_folder, snat_pool_name, tmos_snat_name)
                     except HTTPError as err:
                         LOG.error("Update SNAT pool failed %s" % err.message)
             except HTTPError as err:
@@ -314,10 +400,9 @@ class BigipSnatManager(object):
                 'Check cache for subnet %s in use by other tenant' %
                 subnet['id'])
             in_use_count = 0
-            for loop_tenant_id in bigip.assured_tenant_snat_subnets:
-                tenant_snat_subnets = \
-                    bigip.assured_tenant_snat_subnets[loop_tenant_id]
-                if subnet['id'] in tenant_snat_subnets:
+            for loop_tenant_id, loop_subnet_id in \
+                    bigip.assured_tenant_snat_subnets.keys():
+                if loop_subnet_id == subnet['id']:
                     LOG.debug(
                         'Subnet %s in use (tenant %s)' %
                         (subnet['id'], loop_tenant_id))
@@ -328,8 +413,7 @@ class BigipSnatManager(object):
             else:
                 LOG.debug('Check subnet in use by any tenant')
                 member_use_count = \
-                    self.get_snatpool_member_use_count(
-                        bigip, subnet['id'])
+                    snat_index.get_member_use_count(subnet['id'])
                 if member_use_count:
                     LOG.debug('Subnet in use - do not delete')
                     in_use_subnets.add(subnet['id'])
@@ -339,9 +423,7 @@ class BigipSnatManager(object):
             # Check if trans addr in use by any snatpool.  If not in use,
             # okay to delete associated neutron port.
             LOG.debug('Check trans addr %s in use.' % tmos_snat_name)
-            in_use_count = \
-                self.get_snatpool_member_use_count(
-                    bigip, tmos_snat_name)
+            in_use_count = snat_index.get_member_use_count(tmos_snat_name)
             if not in_use_count:
                 LOG.debug('Trans addr not in use - delete')
                 deleted_names.add(index_snat_name)
@@ -351,10 +433,4 @@ class BigipSnatManager(object):
         return deleted_names, in_use_subnets
 
     def get_snatpool_member_use_count(self, bigip, member_name):
-        snat_count = 0
-        snatpools = bigip.tm.ltm.snatpools.get_collection()
-        for snatpool in snatpools:
-            for member in snatpool.members:
-                if member_name == os.path.basename(member):
-                    snat_count += 1
-        return snat_count
+        return self.get_snat_index(bigip).get_member_use_count(member_name)
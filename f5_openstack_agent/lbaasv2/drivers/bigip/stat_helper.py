@@ -13,176 +13,127 @@
 # limitations under the License.
 #
 
+import copy
 import re
-
+from time import time
 
 from oslo_log import log as logging
 
 LOG = logging.getLogger(__name__)
 
+# The sections, divisions and fields of the tmsh performance report
+# which are collected. Every field has current, average and max values.
+GLOBAL_STATS_FIELDS = {
+    'Sys::Performance System': {
+        'System CPU Usage': ['Utilization'],
+        'Memory Used': ['TMM Memory Used', 'Other Memory Used',
+                        'Swap Memory Used']
+    },
+    'Sys::Performance Connections': {
+        'Active Connections': ['Connections'],
+        'Total New Connections': ['Client Connections',
+                                  'Server Connections'],
+        'HTTP Requests': ['HTTP Requests']
+    },
+    'Sys::Performance Throughput': {
+        'Throughput(bits)': ['In', 'Out'],
+        'SSL Transactions': ['SSL TPS'],
+        'Throughput(packets)': ['In', 'Out']
+    },
+    'Sys::Performance Ramcache': {
+        'RAM Cache Utilization': ['Hit Rate', 'Byte Rate', 'Eviction Rate']
+    }
+}
+
+_SECTION_RE = re.compile(r'^(Sys::Performance \w+)')
+_DIVISION_RES = dict(
+    (section, re.compile('^(%s)' % '|'.join(
+        re.escape(division) for division in
+        sorted(divisions, key=len, reverse=True))))
+    for section, divisions in GLOBAL_STATS_FIELDS.items())
+_VALUES_RE = re.compile(r'^(\S.*?)\s{2,}(\S+)\s{2,}(\S+)\s{2,}(\S+)\s*$')
+_SINCE_RE = re.compile(r'since ([^)]*)\)')
+_EMPTY_STATS = dict(
+    (section, dict(
+        (division, dict(
+            (field, {'current': 0, 'average': 0, 'max': 0})
+            for field in fields))
+        for division, fields in divisions.items()))
+    for section, divisions in GLOBAL_STATS_FIELDS.items())
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except ValueError:
+        return 0
+
+
+def parse_global_statistics(stats_display):
+    """Parse the text of a tmsh performance report in a single pass.
+
+    Returns a dict of section -> division -> field -> values, holding
+    every field of GLOBAL_STATS_FIELDS, and the 'since' time of the max
+    values.
+    """
+    stats = copy.deepcopy(_EMPTY_STATS)
+    section = None
+    division = None
+    since = None
+    for line in str(stats_display).split('\n'):
+        if len(line) <= 2:
+            continue
+        match = _SECTION_RE.match(line)
+        if match and match.group(1) in stats:
+            if match.group(1) != section:
+                section = match.group(1)
+                division = None
+            continue
+        if not section:
+            continue
+        match = _DIVISION_RES[section].match(line)
+        if match:
+            division = match.group(1)
+            match = _SINCE_RE.search(line)
+            if match:
+                since = match.group(1)
+        if not division:
+            continue
+        match = _VALUES_RE.match(line)
+        if match and match.group(1) in stats[section][division]:
+            stats[section][division][match.group(1)] = {
+                'current': _to_int(match.group(2)),
+                'average': _to_int(match.group(3)),
+                'max': _to_int(match.group(4))
+            }
+    stats['since'] = since
+    return stats
+
 
 class StatHelper(object):
+    """Device wide statistics of a BIG-IP.
+
+    When cache_seconds is set the parsed global statistics of each device
+    are kept for that long, and shared by every get_* metric.
+    """
+
+    def __init__(self, cache_seconds=0):
+        self.cache_seconds = cache_seconds
+        self._global_stats = {}
+
     def get_global_statistics(self, bigip):
+        if self.cache_seconds:
+            cached = self._global_stats.get(bigip.hostname, None)
+            if cached and time() - cached[0] < self.cache_seconds:
+                return cached[1]
         allstats = bigip.tm.sys.performances.all_stats.load().__dict__
+        global_stats = None
         if 'apiRawValues' in allstats:
-            sr = {
-                'Sys::Performance System': {
-                    'System CPU Usage': {
-                        'Utilization': {
-                            'current': 0,
-                            'average': 0,
-                            'max': 0
-                        }
-                    },
-                    'Memory Used': {
-                        'TMM Memory Used': {
-                            'current': 0,
-                            'average': 0,
-                            'max': 0
-                        },
-                        'Other Memory Used': {
-                            'current': 0,
-                            'average': 0,
-                            'max': 0
-                        },
-                        'Swap Memory Used': {
-                            'current': 0,
-                            'average': 0,
-                            'max': 0
-                        }
-                    }
-                },
-                'Sys::Performance Connections': {
-                    'Active Connections': {
-                        'Connections': {
-                            'current': 0,
-                            'average': 0,
-                            'max': 0
-                        }
-                    },
-                    'Total New Connections': {
-                        'Client Connections': {
-                            'current': 0,
-                            'average': 0,
-                            'max': 0
-                        },
-                        'Server Connections': {
-                            'current': 0,
-                            'average': 0,
-                            'max': 0
-                        }
-                    },
-                    'HTTP Requests': {
-                        'HTTP Requests': {
-                            'current': 0,
-                            'average': 0,
-                            'max': 0
-                        }
-                    }
-                },
-                'Sys::Performance Throughput': {
-                    'Throughput(bits)': {
-                        'In': {
-                            'current': 0,
-                            'average': 0,
-                            'max': 0
-                        },
-                        'Out': {
-                            'current': 0,
-                            'average': 0,
-                            'max': 0
-                        }
-                    },
-                    'SSL Transactions': {
-                        'SSL TPS': {
-                            'current': 0,
-                            'average': 0,
-                            'max': 0
-                        }
-                    },
-                    'Throughput(packets)': {
-                        'In': {
-                            'current': 0,
-                            'average': 0,
-                            'max': 0
-                        },
-                        'Out': {
-                            'current': 0,
-                            'average': 0,
-                            'max': 0
-                        }
-                    }
-                },
-                'Sys::Performance Ramcache': {
-                    'RAM Cache Utilization': {
-                        'Hit Rate': {
-                            'current': 0,
-                            'average': 0,
-                            'max': 0
-                        },
-                        'Byte Rate': {
-                            'current': 0,
-                            'average': 0,
-                            'max': 0
-                        },
-                        'Eviction Rate': {
-                            'current': 0,
-                            'average': 0,
-                            'max': 0
-                        }
-                    }
-                }
-            }
-            stats_display = allstats['apiRawValues']['apiAnonymous']
-            lines = str(stats_display).split('\n')
-            sec = None
-            div = None
-            since = None
-            for line in lines:
-                if len(line) > 2:
-                    for this_section in sr.keys():
-                        if str(line).startswith(this_section):
-                            if sec:
-                                if not (sec == this_section):
-                                    sec = this_section
-                                    div = None
-                            else:
-                                sec = this_section
-                    if sec:
-                        for division in sr[sec].keys():
-                            if str(line).startswith(division):
-                                try:
-                                    since_idx = line.index('since')
-                                    end_since_idx = line.index(')',
-                                                               since_idx)
-                                    since = line[since_idx + 6:end_since_idx]
-                                except ValueError:
-                                    pass
-                                div = division
-                    if div:
-                        for fields in sr[sec][div].keys():
-                            for field in fields:
-                                if str(line).startswith(field):
-                                    values = re.split(r'\s{2,}', line)
-                                    if len(values) == 4:
-                                        if values[0] in fields:
-                                            value = values[0]
-                                            vdict = sr[sec][div][value]
-                                            value_set = (
-                                                (1, 'current'),
-                                                (2, 'average'),
-                                                (3, 'max'),
-                                            )
-                                            for i, k in value_set:
-                                                try:
-                                                    vdict[k] = int(values[i])
-                                                except ValueError:
-                                                    vdict[k] = 0
-                                                    pass
-                                            sr[sec][div][values[0]] = vdict
-            sr['since'] = since
-            return sr
-        return None
+            global_stats = parse_global_statistics(
+                allstats['apiRawValues']['apiAnonymous'])
+        if self.cache_seconds:
+            self._global_stats[bigip.hostname] = (time(), global_stats)
+        return global_stats
 
     def get_active_connection_count(self, bigip, global_stats=None):
         if not global_stats:
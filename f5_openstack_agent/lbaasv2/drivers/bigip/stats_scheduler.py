@@ -0,0 +1,148 @@
+"""Sampling of load balancer stats within a device request budget."""
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from collections import deque
+import random
+import time
+
+from oslo_log import log as logging
+
+from f5_openstack_agent.lbaasv2.drivers.bigip import constants_v2 as f5const
+
+LOG = logging.getLogger(__name__)
+
+MIN_SAMPLE_INTERVAL = 10
+DEFAULT_MAX_SAMPLE_INTERVAL = 300
+
+# Sample intervals are jittered by up to this fraction, so load balancers
+# created together are not sampled together.
+INTERVAL_JITTER = 0.25
+
+# The budget may be spent in bursts of up to this many seconds' worth.
+BURST_SECONDS = 10
+
+# Stats which change while a load balancer passes traffic
+TRAFFIC_STATS = (f5const.F5_STATS_IN_BYTES,
+                 f5const.F5_STATS_OUT_BYTES,
+                 f5const.F5_STATS_TOTAL_CONNECTIONS)
+
+
+class StatsSample(object):
+    def __init__(self, interval, due_at):
+        self.interval = interval
+        self.due_at = due_at
+        self.traffic = None
+
+
+class StatsScheduler(object):
+    """When to sample the stats of each load balancer.
+
+    Each load balancer has a sample interval, halved down to
+    MIN_SAMPLE_INTERVAL after a sample shows traffic since the previous
+    one, and doubled up to max_interval after a sample which shows
+    none, so idle load balancers are sampled rarely and busy ones
+    often. The stats requests made to each device are paced by a token
+    bucket filled with budget requests per minute, which only holds
+    BURST_SECONDS of the budget, so samples are spread evenly over the
+    minute. Samples which are due when the budget is spent are deferred
+    until the stats are requested again.
+    """
+
+    def __init__(self, budget, max_interval=DEFAULT_MAX_SAMPLE_INTERVAL):
+        self.budget = budget
+        self.max_interval = max(MIN_SAMPLE_INTERVAL, max_interval)
+        self.capacity = max(1.0, budget * BURST_SECONDS / 60.0)
+        self._tokens = self.capacity
+        self._filled_at = None
+        # loadbalancer id -> StatsSample
+        self._samples = dict()
+        # (time, requests) of the samples of the last minute
+        self._requests = deque()
+        self.sampled = 0
+        self.skipped = 0
+        self.deferred = 0
+
+    def __len__(self):
+        return len(self._samples)
+
+    def sample(self, loadbalancer_id, requests, now=None):
+        """Whether to sample the stats of a load balancer now.
+
+        requests is the number of stats requests the sample makes to
+        each device, and is taken from the budget if it is sampled.
+        """
+        now = time.time() if now is None else now
+        sample = self._samples.get(loadbalancer_id, None)
+        if sample is None:
+            sample = StatsSample(MIN_SAMPLE_INTERVAL, now)
+            self._samples[loadbalancer_id] = sample
+        if now < sample.due_at:
+            self.skipped += 1
+            return False
+
+        self._fill(now)
+        if self._tokens < min(requests, self.capacity):
+            self.deferred += 1
+            return False
+
+        self._tokens -= requests
+        self._requests.append((now, requests))
+        self.sampled += 1
+        sample.due_at = now + sample.interval * random.uniform(
+            1 - INTERVAL_JITTER, 1 + INTERVAL_JITTER)
+        return True
+
+    def record(self, loadbalancer_id, stats):
+        """Adapt the sample interval of a load balancer to its traffic."""
+        sample = self._samples.get(loadbalancer_id, None)
+        if sample is None or not stats:
+            return
+        traffic = tuple(stats.get(stat, 0) for stat in TRAFFIC_STATS)
+        if sample.traffic is not None:
+            if traffic != sample.traffic or \
+                    stats.get(f5const.F5_STATS_ACTIVE_CONNECTIONS, 0):
+                sample.interval = max(MIN_SAMPLE_INTERVAL,
+                                      sample.interval / 2)
+            else:
+                sample.interval = min(self.max_interval,
+                                      sample.interval * 2)
+        sample.traffic = traffic
+
+    def forget(self, loadbalancer_id):
+        self._samples.pop(loadbalancer_id, None)
+
+    def get_usage(self, now=None):
+        """Return the budget and how it was used, for the agent state."""
+        now = time.time() if now is None else now
+        self._expire(now)
+        return {'budget': self.budget,
+                'requests_last_minute': sum(
+                    requests for _, requests in self._requests),
+                'loadbalancers': len(self._samples),
+                'sampled': self.sampled,
+                'skipped': self.skipped,
+                'deferred': self.deferred}
+
+    def _fill(self, now):
+        if self._filled_at is not None:
+            self._tokens = min(
+                self.capacity,
+                self._tokens + (now - self._filled_at) * self.budget / 60.0)
+        self._filled_at = now
+        self._expire(now)
+
+    def _expire(self, now):
+        while self._requests and self._requests[0][0] <= now - 60:
+            self._requests.popleft()
@@ -0,0 +1,279 @@
+"""Batched reporting of object statuses to the Neutron server."""
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from collections import OrderedDict
+
+import eventlet
+from eventlet import semaphore
+from oslo_log import log as logging
+
+from f5_openstack_agent.lbaasv2.drivers.bigip import constants_v2 as f5const
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_STATUS_UPDATE_INTERVAL = 0.5
+DEFAULT_STATUS_UPDATE_RETRIES = 3
+
+# Seconds before failed updates are sent again, when they are not batched
+STATUS_RETRY_INTERVAL = 1.0
+
+# Service keys of the objects of each type
+SERVICE_OBJECT_TYPES = (('loadbalancer', 'loadbalancer'),
+                        ('listeners', 'listener'),
+                        ('pools', 'pool'),
+                        ('members', 'member'),
+                        ('healthmonitors', 'health_monitor'),
+                        ('l7policies', 'l7policy'),
+                        ('l7policy_rules', 'l7rule'))
+
+
+class StatusSink(object):
+    """Status updates of load balancer objects, reported in batches.
+
+    The last status reported for each object is remembered, and an
+    update which would not change it is dropped. The remaining updates
+    of a load balancer are sent with one bulk status message, flushed
+    interval seconds after the first is queued, or at once if interval
+    is 0. An update which fails to be sent is queued again, up to
+    retries times, unless a newer update of the object replaced it, and
+    is sent again after interval seconds, or STATUS_RETRY_INTERVAL if
+    interval is 0.
+    """
+
+    def __init__(self, driver, interval=DEFAULT_STATUS_UPDATE_INTERVAL,
+                 retries=DEFAULT_STATUS_UPDATE_RETRIES):
+        self.driver = driver
+        self.interval = interval
+        self.retries = retries
+        # (object type, object id) -> (provisioning, operating status)
+        self._reported = dict()
+        # loadbalancer id -> set((object type, object id)) reported
+        self._loadbalancer_objects = dict()
+        # loadbalancer id -> OrderedDict((object type, object id) -> update)
+        self._pending = OrderedDict()
+        self._flush_thread = None
+        self._flush_lock = semaphore.Semaphore()
+
+    def __len__(self):
+        return sum(len(updates) for updates in self._pending.values())
+
+    def batch(self, service):
+        """Return a StatusBatch queueing the status updates of a service."""
+        return StatusBatch(self, service)
+
+    def update(self, loadbalancer_id, object_type, object_id,
+               provisioning_status=None, operating_status=None,
+               observed=None, **kwargs):
+        """Queue a status update, unless it changes nothing.
+
+        observed is the (provisioning, operating) status of the object
+        in the service, as Neutron last knew it. A status which differs
+        from the one reported means it was changed since, so the update
+        is sent. None leaves a status as it is. Returns whether the
+        update was queued.
+        """
+        key = (object_type, object_id)
+        reported = self._reported.get(key, None)
+        if reported is not None and observed is not None and \
+                observed[0] is not None and observed[0] != reported[0]:
+            reported = None
+        updates = self._pending.get(loadbalancer_id, {})
+        if reported is not None and key not in updates and \
+                provisioning_status in (None, reported[0]) and \
+                operating_status in (None, reported[1]):
+            return False
+
+        update = updates.get(key, {'retries': 0})
+        update.update(kwargs)
+        update.update(type=object_type, id=object_id)
+        if provisioning_status is not None or 'provisioning_status' not in \
+                update:
+            update['provisioning_status'] = provisioning_status
+        if operating_status is not None or 'operating_status' not in update:
+            update['operating_status'] = operating_status
+        self._pending.setdefault(loadbalancer_id, OrderedDict())[key] = update
+        return True
+
+    def forget(self, object_type, object_id, loadbalancer_id=None):
+        """Forget an object which was deleted, with its queued update."""
+        key = (object_type, object_id)
+        self._reported.pop(key, None)
+        if object_type == 'loadbalancer':
+            # the objects of the load balancer were deleted with it
+            for child in self._loadbalancer_objects.pop(object_id, ()):
+                self._reported.pop(child, None)
+            self._pending.pop(object_id, None)
+        else:
+            self._loadbalancer_objects.get(loadbalancer_id, set()).discard(
+                key)
+            if loadbalancer_id in self._pending:
+                self._pending[loadbalancer_id].pop(key, None)
+
+    def schedule_flush(self):
+        if self.interval <= 0:
+            self.flush()
+        elif self._flush_thread is None:
+            self._flush_thread = eventlet.spawn_after(
+                self.interval, self.flush)
+
+    def flush(self):
+        """Send the queued updates now."""
+        with self._flush_lock:
+            self._flush_thread = None
+            pending, self._pending = self._pending, OrderedDict()
+            failed = False
+            for loadbalancer_id, updates in pending.items():
+                if not self._send(loadbalancer_id, updates):
+                    failed = True
+            if failed and self._pending:
+                self._flush_thread = eventlet.spawn_after(
+                    self.interval if self.interval > 0 else
+                    STATUS_RETRY_INTERVAL, self.flush)
+
+    def _send(self, loadbalancer_id, updates):
+        statuses = list()
+        for update in updates.values():
+            status = dict(update)
+            del status['retries']
+            statuses.append(status)
+        try:
+            self.driver.plugin_rpc.update_statuses(loadbalancer_id, statuses)
+        except Exception as exc:
+            LOG.error("Failed to update the status of %d objects of "
+                      "loadbalancer %s: %s" %
+                      (len(statuses), loadbalancer_id, exc))
+            requeued = self._pending.setdefault(
+                loadbalancer_id, OrderedDict())
+            for key, update in updates.items():
+                if key in requeued:
+                    continue
+                if update['retries'] >= self.retries:
+                    LOG.error("Dropped the status update of %s %s" % key)
+                    continue
+                update['retries'] += 1
+                requeued[key] = update
+            if not requeued:
+                del self._pending[loadbalancer_id]
+            return False
+
+        objects = self._loadbalancer_objects.setdefault(
+            loadbalancer_id, set())
+        for key, update in updates.items():
+            objects.add(key)
+            reported = self._reported.get(key, (None, None))
+            self._reported[key] = (
+                update['provisioning_status'] or reported[0],
+                update['operating_status'] or reported[1])
+        return True
+
+
+class StatusBatch(object):
+    """The status updates of one service, queued to a StatusSink.
+
+    A StatusBatch has the status methods of the plugin RPC, so it can
+    be used in its place. Deleted objects are reported to the plugin at
+    once.
+    """
+
+    def __init__(self, sink, service):
+        self.sink = sink
+        self.loadbalancer_id = service.get('loadbalancer', {}).get('id')
+        # (object type, object id) -> status in the service
+        self._observed = dict()
+        for service_key, object_type in SERVICE_OBJECT_TYPES:
+            objects = service.get(service_key, None) or []
+            if isinstance(objects, dict):
+                objects = [objects]
+            for obj in objects:
+                self._observed[(object_type, obj.get('id'))] = (
+                    obj.get('provisioning_status', None),
+                    obj.get('operating_status', None))
+
+    def flush(self):
+        self.sink.schedule_flush()
+
+    def _update(self, object_type, object_id, provisioning_status,
+                operating_status, **kwargs):
+        self.sink.update(
+            self.loadbalancer_id, object_type, object_id,
+            provisioning_status=provisioning_status,
+            operating_status=operating_status,
+            observed=self._observed.get((object_type, object_id), None),
+            **kwargs)
+
+    def _destroyed(self, object_type, object_id):
+        self.sink.forget(object_type, object_id, self.loadbalancer_id)
+        return getattr(self.sink.driver.plugin_rpc,
+                       '%s_destroyed' % object_type)(object_id)
+
+    def update_loadbalancer_status(self, lb_id, provisioning_status=None,
+                                   operating_status=None):
+        self._update('loadbalancer', lb_id, provisioning_status,
+                     operating_status)
+
+    def loadbalancer_destroyed(self, loadbalancer_id):
+        return self._destroyed('loadbalancer', loadbalancer_id)
+
+    def update_listener_status(self, listener_id,
+                               provisioning_status=f5const.F5_ERROR,
+                               operating_status=f5const.F5_OFFLINE):
+        self._update('listener', listener_id, provisioning_status,
+                     operating_status)
+
+    def listener_destroyed(self, listener_id):
+        return self._destroyed('listener', listener_id)
+
+    def update_pool_status(self, pool_id,
+                           provisioning_status=f5const.F5_ERROR,
+                           operating_status=f5const.F5_OFFLINE):
+        self._update('pool', pool_id, provisioning_status, operating_status)
+
+    def pool_destroyed(self, pool_id):
+        return self._destroyed('pool', pool_id)
+
+    def update_member_status(self, member_id, provisioning_status=None,
+                             operating_status=None):
+        self._update('member', member_id, provisioning_status,
+                     operating_status)
+
+    def member_destroyed(self, member_id):
+        return self._destroyed('member', member_id)
+
+    def update_health_monitor_status(self, health_monitor_id,
+                                     provisioning_status=f5const.F5_ERROR,
+                                     operating_status=f5const.F5_OFFLINE):
+        self._update('health_monitor', health_monitor_id,
+                     provisioning_status, operating_status)
+
+    def health_monitor_destroyed(self, healthmonitor_id):
+        return self._destroyed('health_monitor', healthmonitor_id)
+
+    def update_l7rule_status(self, l7rule_id, l7policy_id,
+                             provisioning_status=f5const.F5_ERROR,
+                             operating_status=f5const.F5_OFFLINE):
+        self._update('l7rule', l7rule_id, provisioning_status,
+                     operating_status, l7policy_id=l7policy_id)
+
+    def l7rule_destroyed(self, l7rule_id):
+        return self._destroyed('l7rule', l7rule_id)
+
+    def update_l7policy_status(self, l7policy_id,
+                               provisioning_status=f5const.F5_ERROR,
+                               operating_status=f5const.F5_OFFLINE):
+        self._update('l7policy', l7policy_id, provisioning_status,
+                     operating_status)
+
+    def l7policy_destroyed(self, l7policy_id):
+        return self._destroyed('l7policy', l7policy_id)
@@ -55,36 +55,43 @@ class BigipTenantManager(object):
         # create tenant folder
         folder_name = self.service_adapter.get_folder_name(tenant_id)
         LOG.debug("Creating tenant folder %s" % folder_name)
-        for bigip in self.driver.get_config_bigips():
-            if not self.system_helper.folder_exists(bigip, folder_name):
-                folder = self.service_adapter.get_folder(service)
-                # This folder is a dict config obj, that can be passed to
-                # folder.create in the SDK
-                try:
-                    self.system_helper.create_folder(bigip, folder)
-                except Exception as err:
-                    # XXX Maybe we can make this more specific?
-                    LOG.exception("Error creating folder %s" %
-                                  (folder))
-                    raise f5ex.SystemCreationException(
-                        "Folder creation error for tenant %s" %
-                        (tenant_id))
+        self.driver.cluster_executor.map(
+            self.driver.get_config_bigips(), self._assure_bigip_folder,
+            service, folder_name)
 
         # create tenant route domain
         if self.conf.use_namespaces:
-            for bigip in self.driver.get_all_bigips():
-                if not self.network_helper.route_domain_exists(bigip,
-                                                               folder_name):
-                    try:
-                        self.network_helper.create_route_domain(
-                            bigip,
-                            folder_name,
-                            self.conf.f5_route_domain_strictness)
-                    except Exception as err:
-                        LOG.exception(err.message)
-                        raise f5ex.RouteDomainCreationException(
-                            "Failed to create route domain for "
-                            "tenant in %s" % (folder_name))
+            self.driver.cluster_executor.map(
+                self.driver.get_all_bigips(),
+                self._assure_bigip_route_domain, folder_name)
+
+    def _assure_bigip_folder(self, bigip, service, folder_name):
+        if not self.system_helper.folder_exists(bigip, folder_name):
+            folder = self.service_adapter.get_folder(service)
+            # This folder is a dict config obj, that can be passed to
+            # folder.create in the SDK
+            try:
+                self.system_helper.create_folder(bigip, folder)
+            except Exception:
+                # XXX Maybe we can make this more specific?
+                LOG.exception("Error creating folder %s" %
+                              (folder))
+                raise f5ex.SystemCreationException(
+                    "Folder creation error for tenant %s" %
+                    (service['loadbalancer']['tenant_id']))
+
+    def _assure_bigip_route_domain(self, bigip, folder_name):
+        if not self.network_helper.route_domain_exists(bigip, folder_name):
+            try:
+                self.network_helper.create_route_domain(
+                    bigip,
+                    folder_name,
+                    self.conf.f5_route_domain_strictness)
+            except Exception as err:
+                LOG.exception(err.message)
+                raise f5ex.RouteDomainCreationException(
+                    "Failed to create route domain for "
+                    "tenant in %s" % (folder_name))
 
     def assure_tenant_cleanup(self, service, all_subnet_hints):
         """Delete tenant partition."""
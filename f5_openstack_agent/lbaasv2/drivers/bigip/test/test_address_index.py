@@ -0,0 +1,51 @@
+# coding=utf-8
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_openstack_agent.lbaasv2.drivers.bigip.address_index import \
+    AddressIndex
+
+
+class TestAddressIndex(object):
+    def test_has_address_in(self):
+        index = AddressIndex(['10.1.1.10%2', '10.1.2.255%2', '10.1.1.10%3',
+                              '192.168.0.1', 'fd00::10%2', 'any6'])
+        assert len(index) == 5
+
+        assert index.has_address_in('10.1.1.0/24', 2)
+        assert index.has_address_in('10.1.1.10/32', '2')
+        assert index.has_address_in('10.1.2.0/24', 2)
+        assert not index.has_address_in('10.1.3.0/24', 2)
+        assert not index.has_address_in('10.1.0.0/24', 2)
+        assert index.has_address_in('10.1.1.0/24', 3)
+        assert not index.has_address_in('10.1.2.0/24', 3)
+
+        # addresses without a route domain are in route domain 0
+        assert index.has_address_in('192.168.0.0/16', 0)
+        assert not index.has_address_in('192.168.0.0/16', 2)
+        assert not index.has_address_in('192.168.0.0/16', None)
+
+        # IPv4 and IPv6 addresses are kept apart
+        assert index.has_address_in('fd00::/64', 2)
+        assert not index.has_address_in('::/0', 3)
+
+    def test_add(self):
+        index = AddressIndex()
+        assert not index.has_address_in('0.0.0.0/0', 0)
+        for address in ('10.0.0.30', '10.0.0.10', '10.0.0.20'):
+            index.add(address)
+        assert index.has_address_in('10.0.0.16/28', 0)
+        assert index.has_address_in('10.0.0.0/28', 0)
+        assert not index.has_address_in('10.0.0.32/28', 0)
@@ -116,6 +116,7 @@ class TestLbaasAgentManagerMockBuilder(mock_builder_base_class.MockBuilderBase,
         mocked_target.state_rpc = mock.Mock()
         mocked_target.pending_services = {}
         mocked_target.service_resync_interval = 5
+        mocked_target.stats_scheduler = None
         mocked_target.lbdriver = \
             self.other_builders['lbdriver'].new_fully_mocked_target()
         mocked_target.agent_host = 'conf.host:agent_hash'
@@ -23,6 +23,8 @@ from mock import patch
 from f5_openstack_agent.lbaasv2.drivers.bigip import constants_v2
 
 import f5_openstack_agent.lbaasv2.drivers.bigip.agent_manager as agent_manager
+import f5_openstack_agent.lbaasv2.drivers.bigip.pending_services as \
+    pending_services
 import f5_openstack_agent.lbaasv2.drivers.bigip.plugin_rpc as plugin_rpc
 
 import f5_openstack_agent.lbaasv2.drivers.bigip.test.conftest as ct
@@ -152,19 +154,95 @@ class TestLbaasAgentManager(TestLbaasAgentManagerBuilder):
             target.conf.f5_pending_services_timeout = 100
             target._get_remote_loadbalancers = Mock(return_value=pending_lbs)
             target.pending_services = dict(lb_id=timeout_val, lb_id3=now)
+            target.pending_retries = \
+                pending_services.PendingServiceBackoff(10, 120)
             target.refresh_service = Mock(return_value=True)
             target.service_timeout = Mock()
+            target.plugin_rpc = Mock()
+            target.plugin_rpc.iter_services_by_loadbalancer_ids.side_effect = \
+                lambda lb_ids: ((lb_id, dict()) for lb_id in lb_ids)
 
         def all_paths(target):
             setup_target(target)
             target._refresh_pending_services()
-            target.service_timeout.assert_called_once_with('lb_id')
+            target.service_timeout.assert_called_once_with('lb_id', dict())
             assert 'lb_id' not in target.pending_services
             assert 'lb_id2' in target.pending_services
             assert 'lb_id3' in target.pending_services
 
         all_paths(fully_mocked_target)
 
+    def test_refresh_pending_services_backoff(self, fully_mocked_target):
+        target = fully_mocked_target
+        target.agent_host = 'host'
+        target.conf = Mock()
+        target.conf.f5_pending_services_timeout = 600
+        target.pending_services = dict()
+        target.pending_retries = \
+            pending_services.PendingServiceBackoff(10, 40, jitter=0)
+        target._get_remote_loadbalancers = Mock(
+            return_value=(tuple(), set(['lb1', 'lb2'])))
+        target.refresh_service = Mock(return_value=True)
+        target.service_timeout = Mock()
+        services = dict(
+            lb1={'loadbalancer': {'id': 'lb1', 'network_id': 'net1'},
+                 'members': [{'network_id': 'net2'}]},
+            lb2={'loadbalancer': {'id': 'lb2', 'network_id': 'net3'}})
+        target.plugin_rpc = Mock()
+        target.plugin_rpc.iter_services_by_loadbalancer_ids.side_effect = \
+            lambda lb_ids: ((lb_id, services[lb_id]) for lb_id in lb_ids)
+
+        start = datetime.datetime.now()
+        refreshed = list()
+        for seconds in range(0, 160, 10):
+            now = start + datetime.timedelta(seconds=seconds)
+            target.refresh_service.reset_mock()
+            with patch('datetime.datetime') as mock_datetime:
+                mock_datetime.now.return_value = now
+                assert target._refresh_pending_services()
+            if target.refresh_service.called:
+                refreshed.append(seconds)
+
+        # Retried after 10, 20, 40 and then every 40 seconds, rather
+        # than on every pass.
+        assert refreshed == [0, 10, 30, 70, 110, 150]
+        assert target.pending_retries._retries['lb1'].network_ids == \
+            set(['net1', 'net2'])
+        assert not target.service_timeout.called
+
+        # An update of a network makes only the loadbalancers waiting for
+        # it due, and they are retried at the next refresh.
+        target.refresh_service.reset_mock()
+        target.refresh_service.return_value = False
+        target.lbdriver = Mock()
+        target.add_fdb_entries(Mock(), {'net2': {'ports': {}}})
+        assert not target.refresh_service.called
+        with patch('datetime.datetime') as mock_datetime:
+            mock_datetime.now.return_value = now
+            assert target._refresh_pending_services()
+        target.refresh_service.assert_called_once_with(
+            'lb1', service=services['lb1'])
+        assert 'lb1' not in target.pending_services
+        assert 'lb1' not in target.pending_retries
+        assert 'lb2' in target.pending_services
+
+        target._get_remote_loadbalancers.return_value = (tuple(), set(['lb2']))
+        target.tunnel_update(Mock(), tunnel_ip='10.0.0.1')
+        assert target.refresh_service.call_count == 1
+        with patch('datetime.datetime') as mock_datetime:
+            mock_datetime.now.return_value = now
+            assert not target._refresh_pending_services()
+        target.refresh_service.assert_called_with(
+            'lb2', service=services['lb2'])
+        assert not target.pending_services
+
+        # Loadbalancers no longer pending are forgotten.
+        target.pending_services = dict(lb3=start)
+        target.pending_retries.schedule('lb3', start)
+        target._get_remote_loadbalancers.return_value = (tuple(), set())
+        assert not target._refresh_pending_services()
+        assert 'lb3' not in target.pending_retries
+
     def test_get_remote_loadbalancers(self, fully_mocked_target):
 
         def setup_target(target):
@@ -223,12 +301,200 @@ class TestLbaasAgentManager(TestLbaasAgentManagerBuilder):
         fully_mocked_target.cache.get_by_loadbalancer_id.side_effect = \
             [True, False]
         fully_mocked_target.validate_service = Mock()
+        fully_mocked_target.lbdriver = Mock()
+        fully_mocked_target.plugin_rpc = Mock()
+        service = Mock()
+        fully_mocked_target.plugin_rpc.iter_services_by_loadbalancer_ids.\
+            return_value = iter([(2, service)])
         fully_mocked_target._validate_services(lb_ids)
-        fully_mocked_target.validate_service.assert_called_once_with(2)
+        fully_mocked_target.plugin_rpc.iter_services_by_loadbalancer_ids.\
+            assert_called_once_with([2])
+        fully_mocked_target.validate_service.assert_called_once_with(
+            2, service=service)
+        fully_mocked_target.lbdriver.open_resource_snapshot.\
+            assert_called_once_with()
+        fully_mocked_target.lbdriver.close_resource_snapshot.\
+            assert_called_once_with()
         fully_mocked_target.cache.get_by_loadbalancer_id.assert_any_call(1)
         fully_mocked_target.cache.get_by_loadbalancer_id.assert_called_with(2)
         assert fully_mocked_target.cache.get_by_loadbalancer_id.call_count == 2
 
+    def test_validate_services_with_revisions(self, fully_mocked_target):
+        target = fully_mocked_target
+        target.cache = agent_manager.LogicalServiceCache()
+        target.agent_host = 'host'
+        for lb_id in [1, 2]:
+            target.cache.put(dict(loadbalancer=dict(id=lb_id, tenant_id='t')),
+                             'host')
+            target.cache.set_revision(lb_id, 'rev1')
+        target.validate_service = Mock()
+        target.lbdriver = Mock()
+        target.plugin_rpc = Mock()
+        target.plugin_rpc.iter_services_by_loadbalancer_ids.side_effect = \
+            lambda lb_ids: ((lb_id, 'service') for lb_id in lb_ids)
+        target._validate_services([1, 2, 3],
+                                  revisions={1: 'rev1', 2: 'rev2', 3: None})
+        target.plugin_rpc.iter_services_by_loadbalancer_ids.\
+            assert_called_once_with([2, 3])
+        assert target.validate_service.call_count == 2
+        target.validate_service.assert_any_call(
+            2, service='service', revision='rev2', incremental=True)
+        target.validate_service.assert_any_call(
+            3, service='service', revision=None, incremental=True)
+
+    def test_incremental_sync_state(self, fully_mocked_target,
+                                    fully_mocked_plugin_rpc):
+        """Resync cost follows the number of changed loadbalancers"""
+
+        def make_service(lb_id, description=''):
+            return dict(loadbalancer=dict(
+                id=lb_id, tenant_id='tenant', vip_port_id='port',
+                description=description,
+                provisioning_status=constants_v2.F5_ACTIVE,
+                operating_status=constants_v2.F5_ONLINE))
+
+        def setup_target(target, lb_count, with_revisions):
+            services = dict((lb_id, make_service(lb_id))
+                            for lb_id in range(lb_count))
+            revisions = dict((lb_id, 1) for lb_id in services)
+
+            def get_loadbalancers(host=None):
+                rows = []
+                for lb_id in services:
+                    row = dict(lb_id=lb_id, tenant_id='tenant',
+                               agent_host=host)
+                    if with_revisions:
+                        row['revision'] = revisions[lb_id]
+                    rows.append(row)
+                return rows
+
+            def call(context, msg, **kwargs):
+                lb_ids = msg['args']['loadbalancer_ids']
+                return dict((lb_id, services[lb_id]) for lb_id in lb_ids
+                            if lb_id in services)
+
+            plugin = fully_mocked_plugin_rpc
+            plugin.context = 'context'
+            plugin.topic = 'topic'
+            plugin.host = 'host'
+            plugin.services_batch_size = 50
+            plugin.bulk_services_supported = True
+            plugin._call = Mock(side_effect=call)
+            plugin.get_active_loadbalancers = \
+                Mock(side_effect=get_loadbalancers)
+            plugin.get_all_loadbalancers = Mock(side_effect=get_loadbalancers)
+            plugin.get_pending_loadbalancers = Mock(return_value=[])
+            plugin.get_service_by_loadbalancer_id = Mock(return_value={})
+            target.plugin_rpc = plugin
+            target.lbdriver = Mock()
+            target.lbdriver.backend_integrity.return_value = True
+            target.lbdriver.service_exists.return_value = True
+            target.cache = agent_manager.LogicalServiceCache()
+            target.agent_host = 'host'
+            target.pending_services = {}
+            target.service_full_resync_interval = 3600
+            return services, revisions
+
+        def resync_cost(target, services, revisions, changed):
+            """Return (plugin round trips, device checks) of a resync"""
+            for lb_id in changed:
+                services[lb_id] = make_service(lb_id, description='changed')
+                revisions[lb_id] += 1
+            target.plugin_rpc._call.reset_mock()
+            target.lbdriver.service_exists.reset_mock()
+            assert target.sync_state() is False
+            assert not target.plugin_rpc.get_service_by_loadbalancer_id.called
+            return (target.plugin_rpc._call.call_count,
+                    target.lbdriver.service_exists.call_count)
+
+        for lb_count in [100, 1000]:
+            batches = lb_count // 50
+            # Controller reports revisions: only changed services are
+            # fetched and checked on the devices.
+            services, revisions = setup_target(
+                fully_mocked_target, lb_count, True)
+            assert resync_cost(fully_mocked_target, services, revisions,
+                               []) == (batches, lb_count)
+            assert resync_cost(fully_mocked_target, services, revisions,
+                               []) == (0, 0)
+            assert resync_cost(fully_mocked_target, services, revisions,
+                               [3, 7]) == (1, 2)
+            assert resync_cost(fully_mocked_target, services, revisions,
+                               []) == (0, 0)
+
+            # Without revisions every service is fetched and checked on
+            # the devices, so changes made on the devices are repaired.
+            services, revisions = setup_target(
+                fully_mocked_target, lb_count, False)
+            resync_cost(fully_mocked_target, services, revisions, [])
+            assert resync_cost(fully_mocked_target, services, revisions,
+                               []) == (batches, lb_count)
+            fully_mocked_target.lbdriver.service_exists.side_effect = \
+                lambda service: service['loadbalancer']['id'] != 5
+            resync_cost(fully_mocked_target, services, revisions, [])
+            fully_mocked_target.lbdriver.sync.assert_called_once_with(
+                services[5])
+            fully_mocked_target.lbdriver.service_exists.side_effect = None
+
+            # Services no longer bound to the agent are forgotten.
+            del services[3]
+            resync_cost(fully_mocked_target, services, revisions, [])
+            assert fully_mocked_target.cache.size == lb_count - 1
+
+    def test_periodic_resync_full_interval(self, fully_mocked_target):
+        target = fully_mocked_target
+        now = datetime.datetime.now()
+        target.needs_resync = False
+        target.service_resync_interval = 300
+        target.service_full_resync_interval = 3600
+        target.last_resync = now - datetime.timedelta(seconds=400)
+        target.last_full_resync = now - datetime.timedelta(seconds=400)
+        target.lbdriver = Mock()
+        target.cache = agent_manager.LogicalServiceCache()
+        target.cache.services = {'lb': Mock()}
+        target.tunnel_sync = Mock(return_value=False)
+        target.sync_state = Mock(return_value=False)
+        target.clean_orphaned_objects_and_save_device_config = \
+            Mock(return_value=False)
+
+        target.periodic_resync(Mock())
+        assert 'lb' in target.cache.services
+        target.sync_state.assert_called_once_with()
+
+        target.last_resync = now - datetime.timedelta(seconds=400)
+        target.last_full_resync = now - datetime.timedelta(seconds=4000)
+        target.periodic_resync(Mock())
+        assert target.cache.services == {}
+        assert target.sync_state.call_count == 2
+
+    def test_update_loadbalancer_stats(self, fully_mocked_target):
+        target = fully_mocked_target
+        target.agent_host = 'host'
+        target.cache = agent_manager.LogicalServiceCache()
+        target.lbdriver = Mock()
+        target.lbdriver.get_stats_request_count.return_value = 3
+        target.lbdriver.get_stats.return_value = {
+            'bytes_in': 0, 'bytes_out': 0, 'active_connections': 0,
+            'total_connections': 0}
+        target.stats_scheduler = None
+        loadbalancer = {'id': 'lb1', 'tenant_id': 't1'}
+        service = {'loadbalancer': loadbalancer}
+
+        target.update_loadbalancer_stats(Mock(), loadbalancer, service)
+        target.update_loadbalancer_stats(Mock(), loadbalancer, service)
+        assert target.lbdriver.get_stats.call_count == 2
+
+        # the second request comes before the loadbalancer is due
+        target.stats_scheduler = Mock()
+        target.stats_scheduler.sample.side_effect = [True, False]
+        target.update_loadbalancer_stats(Mock(), loadbalancer, service)
+        target.update_loadbalancer_stats(Mock(), loadbalancer, service)
+        assert target.lbdriver.get_stats.call_count == 3
+        target.stats_scheduler.sample.assert_called_with('lb1', 3)
+        target.stats_scheduler.record.assert_called_once_with(
+            'lb1', target.lbdriver.get_stats.return_value)
+        assert 'lb1' in target.cache.services
+
     @pytest.mark.skip(reason="TypeError from mock redirecting rpc_calls.")
     def test_lbb_sync_state(self, fully_mocked_target,
                             fully_mocked_plugin_rpc, mock_logger):
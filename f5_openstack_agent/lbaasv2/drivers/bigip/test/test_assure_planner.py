@@ -0,0 +1,222 @@
+# coding=utf-8
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_openstack_agent.lbaasv2.drivers.bigip import assure_planner
+from f5_openstack_agent.lbaasv2.drivers.bigip.assure_planner import \
+    AssurePlanner
+from f5_openstack_agent.lbaasv2.drivers.bigip.assure_planner import \
+    BigIPResourceLoader
+from f5_openstack_agent.lbaasv2.drivers.bigip.assure_planner import \
+    get_differences
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import \
+    ResourceType
+
+import mock
+import pytest
+from requests.exceptions import HTTPError
+
+
+class FakeSnapshot(object):
+    def __init__(self, resources=None):
+        self.resources = resources or {}
+
+    def get_resource(self, bigip, resource_type, name, partition,
+                     expand_subcollections=False):
+        return self.resources.get((resource_type, partition, name), None)
+
+
+def virtual_model():
+    return {
+        'name': 'Project_listener1',
+        'partition': 'Project_tenant1',
+        'destination': 'Project_tenant1/10.0.0.5%2:80',
+        'ipProtocol': 'tcp',
+        'connectionLimit': 0,
+        'pool': 'Project_pool1',
+        'profiles': ['/Common/http', '/Common/oneconnect'],
+        'persist': [{'name': '/Common/cookie'}],
+        'sourceAddressTranslation': {'type': 'snat',
+                                     'pool': 'Project_tenant1'},
+        'vlansDisabled': True,
+        'vlans': [],
+        'enabled': True,
+        'policies': [],
+    }
+
+
+def device_virtual():
+    return {
+        'name': 'Project_listener1',
+        'partition': 'Project_tenant1',
+        'destination': '/Project_tenant1/10.0.0.5%2:80',
+        'ipProtocol': 'tcp',
+        'connectionLimit': 0,
+        'pool': '/Project_tenant1/Project_pool1',
+        'profilesReference': {'items': [
+            {'name': 'http', 'partition': 'Common', 'context': 'all'},
+            {'name': 'oneconnect', 'partition': 'Common',
+             'context': 'all'}]},
+        'persist': [{'name': 'cookie', 'partition': 'Common',
+                     'tmDefault': 'yes'}],
+        'sourceAddressTranslation': {'type': 'snat',
+                                     'pool': '/Project_tenant1/'
+                                             'Project_tenant1'},
+        'vlansDisabled': True,
+        'enabled': True,
+        'policiesReference': {'link': 'https://localhost/policies'},
+    }
+
+
+def pool_model():
+    return {
+        'name': 'Project_pool1',
+        'partition': 'Project_tenant1',
+        'loadBalancingMode': 'round-robin',
+        'monitor': 'Project_monitor1',
+        'members': [
+            {'name': '10.2.2.3%2:8080', 'address': '10.2.2.3%2',
+             'ratio': 1, 'session': 'user-enabled'},
+            {'name': '10.2.2.4%2:8080', 'address': '10.2.2.4%2',
+             'ratio': 1, 'session': 'user-enabled'}],
+    }
+
+
+def device_pool():
+    return {
+        'name': 'Project_pool1',
+        'partition': 'Project_tenant1',
+        'loadBalancingMode': 'round-robin',
+        'monitor': '/Project_tenant1/Project_monitor1 ',
+        'membersReference': {'items': [
+            {'name': '10.2.2.3%2:8080', 'partition': 'Project_tenant1',
+             'address': '10.2.2.3%2', 'ratio': 1,
+             'session': 'monitor-enabled'},
+            {'name': '10.2.2.4%2:8080', 'partition': 'Project_tenant1',
+             'address': '10.2.2.4%2', 'ratio': 1,
+             'session': 'user-enabled'}]},
+    }
+
+
+class TestGetDifferences(object):
+    def test_unchanged_virtual(self):
+        assert get_differences(virtual_model(), device_virtual()) == {}
+
+    def test_changed_virtual(self):
+        model = virtual_model()
+        model['connectionLimit'] = 100
+        model['profiles'].append('/Common/tcp')
+        assert get_differences(model, device_virtual()) == {
+            'connectionLimit': 100,
+            'profiles': ['/Common/http', '/Common/oneconnect', '/Common/tcp']}
+
+    def test_unchanged_pool(self):
+        assert get_differences(pool_model(), device_pool()) == {}
+
+    def test_changed_pool_members(self):
+        model = pool_model()
+        model['members'][0]['ratio'] = 5
+        assert get_differences(model, device_pool()) == {
+            'members': model['members']}
+
+        model = pool_model()
+        del model['members'][1]
+        assert 'members' in get_differences(model, device_pool())
+
+        model = pool_model()
+        model['members'][1]['session'] = 'user-disabled'
+        assert 'members' in get_differences(model, device_pool())
+
+    def test_virtual_address_flags(self):
+        model = {'name': 'Project_lb1', 'partition': 'Project_tenant1',
+                 'address': '10.0.0.5%0', 'autoDelete': False,
+                 'enabled': True, 'trafficGroup': '/Common/traffic-group-1'}
+        current = mock.Mock(address='10.0.0.5', autoDelete='false',
+                            enabled='yes',
+                            trafficGroup='/Common/traffic-group-1')
+        assert get_differences(model, current) == {}
+
+        current.enabled = 'no'
+        assert get_differences(model, current) == {'enabled': True}
+
+
+class TestAssurePlanner(object):
+    def test_plan_resource(self):
+        bigip = mock.Mock(hostname='host1')
+        snapshot = FakeSnapshot({
+            (ResourceType.pool, 'Project_tenant1', 'Project_pool1'):
+                device_pool()})
+        planner = AssurePlanner(snapshot)
+
+        assert planner.plan_resource(
+            bigip, ResourceType.pool, pool_model()) is None
+
+        model = pool_model()
+        model['loadBalancingMode'] = 'least-connections-member'
+        change = planner.plan_resource(bigip, ResourceType.pool, model)
+        assert change.action == assure_planner.MODIFY
+        assert change.changes == {
+            'loadBalancingMode': 'least-connections-member'}
+
+        change = planner.plan_resource(
+            bigip, ResourceType.virtual, virtual_model())
+        assert change.action == assure_planner.CREATE
+        assert change.changes == virtual_model()
+
+        change = planner.plan_resource(
+            bigip, ResourceType.pool, pool_model(), delete=True)
+        assert change.action == assure_planner.DELETE
+        assert planner.plan_resource(
+            bigip, ResourceType.virtual, virtual_model(), delete=True) is None
+
+        assert len(planner.plan) == 3
+        assert planner.plan.summary() == {
+            assure_planner.CREATE: 1, assure_planner.MODIFY: 1,
+            assure_planner.DELETE: 1}
+        assert planner.plan.get_changes(action=assure_planner.CREATE,
+                                        hostname='host1')[0].name == \
+            'Project_listener1'
+        assert planner.plan.get_changes(hostname='host2') == []
+
+    def test_plan_unknown(self):
+        planner = AssurePlanner(FakeSnapshot())
+        change = planner.plan_unknown(mock.Mock(hostname='host1'),
+                                      ResourceType.l7policy,
+                                      {'name': 'wrapper_policy_1',
+                                       'partition': 'Project_tenant1'})
+        assert change.action == assure_planner.MODIFY
+        assert list(planner.plan) == [change]
+
+    def test_resources_loaded_by_name(self):
+        bigip = mock.Mock(hostname='host1')
+        pool = bigip.tm.ltm.pools.pool
+        pool.load.return_value = device_pool()
+        planner = AssurePlanner()
+        assert isinstance(planner.snapshot, BigIPResourceLoader)
+
+        assert planner.plan_resource(
+            bigip, ResourceType.pool, pool_model()) is None
+        pool.load.assert_called_once_with(
+            name='Project_pool1', partition='Project_tenant1',
+            requests_params={'params': 'expandSubcollections=true'})
+        assert not bigip.tm.ltm.pools.get_collection.called
+
+        pool.load.side_effect = HTTPError(response=mock.Mock(status_code=404))
+        change = planner.plan_resource(bigip, ResourceType.pool, pool_model())
+        assert change.action == assure_planner.CREATE
+
+        pool.load.side_effect = HTTPError(response=mock.Mock(status_code=500))
+        with pytest.raises(HTTPError):
+            planner.plan_resource(bigip, ResourceType.pool, pool_model())
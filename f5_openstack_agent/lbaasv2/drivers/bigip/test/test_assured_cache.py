@@ -0,0 +1,63 @@
+# coding=utf-8
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_openstack_agent.lbaasv2.drivers.bigip.assured_cache import \
+    AssuredCache
+from f5_openstack_agent.lbaasv2.drivers.bigip.assured_cache import \
+    subnet_fingerprint
+
+
+class TestAssuredCache(object):
+    def test_assured(self):
+        cache = AssuredCache(ttl=100)
+        subnet = {'id': 'subnet1', 'cidr': '10.1.0.0/24',
+                  'gateway_ip': '10.1.0.1'}
+        fingerprint = subnet_fingerprint(subnet)
+        cache.assured('subnet1', 'vlan-1', fingerprint=fingerprint, now=0)
+
+        assert 'subnet1' in cache
+        assert cache['subnet1'] == 'vlan-1'
+        assert cache.is_assured('subnet1', fingerprint, now=49)
+        assert not cache.is_assured('subnet2', fingerprint, now=49)
+
+        # a changed subnet is assured again
+        subnet['gateway_ip'] = '10.1.0.254'
+        assert not cache.is_assured(
+            'subnet1', subnet_fingerprint(subnet), now=49)
+
+        # entries expire, but keep their value until assured again
+        assert not cache.is_assured('subnet1', fingerprint, now=151)
+        assert cache.get('subnet1') == 'vlan-1'
+
+        cache.remove('subnet1')
+        assert cache.get('subnet1') is None
+        assert len(cache) == 0
+
+    def test_staggered_expiry(self):
+        cache = AssuredCache(ttl=100)
+        for i in range(200):
+            cache.assured(i, now=0)
+
+        expiries = [entry.expires_at for entry in cache._entries.values()]
+        assert min(expiries) >= 50 and max(expiries) <= 150
+        assert len(set(expiries)) > 100
+        assert 0 < len([key for key in cache.keys()
+                        if cache.is_assured(key, now=100)]) < 200
+
+    def test_no_ttl(self):
+        cache = AssuredCache(ttl=0)
+        cache.assured('net1', now=0)
+        assert cache.is_assured('net1', now=10 ** 9)
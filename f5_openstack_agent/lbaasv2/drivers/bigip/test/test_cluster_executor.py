@@ -0,0 +1,104 @@
+# coding=utf-8
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_openstack_agent.lbaasv2.drivers.bigip.cluster_executor import \
+    ClusterExecutor
+
+import eventlet
+import mock
+import pytest
+
+
+def make_bigips(count):
+    bigips = []
+    for index in range(count):
+        bigip = mock.Mock()
+        bigip.hostname = 'host%d' % index
+        bigips.append(bigip)
+    return bigips
+
+
+class TestClusterExecutor(object):
+    def test_map_runs_devices_concurrently(self):
+        executor = ClusterExecutor()
+        bigips = make_bigips(4)
+        running = []
+        peak = []
+
+        def operation(bigip, value):
+            running.append(bigip)
+            peak.append(len(running))
+            eventlet.sleep(0.01)
+            running.remove(bigip)
+            return bigip.hostname + value
+
+        results = executor.map(bigips, operation, '-done')
+        assert results == ['host0-done', 'host1-done', 'host2-done',
+                           'host3-done']
+        assert max(peak) == 4
+
+    def test_map_raises_first_error_after_all_devices(self):
+        executor = ClusterExecutor()
+        bigips = make_bigips(3)
+        called = []
+
+        def operation(bigip):
+            called.append(bigip.hostname)
+            if bigip.hostname != 'host0':
+                raise ValueError(bigip.hostname)
+            return True
+
+        with pytest.raises(ValueError) as error:
+            executor.map(bigips, operation)
+        assert str(error.value) == 'host1'
+        assert sorted(called) == ['host0', 'host1', 'host2']
+
+    def test_execute_collects_errors(self):
+        executor = ClusterExecutor()
+        bigips = make_bigips(2)
+
+        def operation(bigip):
+            if bigip.hostname == 'host1':
+                raise KeyError(bigip.hostname)
+            return 1
+
+        results = executor.execute(bigips, operation)
+        assert results.values() == [1]
+        assert results.results == {'host0': 1}
+        assert results.errors['host1'][0] is KeyError
+
+    def test_per_device_cap(self):
+        executor = ClusterExecutor(max_per_device=1)
+        bigip = make_bigips(1)[0]
+        running = []
+        peak = []
+
+        def operation(bigip):
+            running.append(bigip)
+            peak.append(len(running))
+            eventlet.sleep(0.01)
+            running.remove(bigip)
+
+        pool = eventlet.GreenPool()
+        for _ in range(3):
+            pool.spawn(executor.map, [bigip], operation)
+        pool.waitall()
+        assert len(peak) == 3
+        assert max(peak) == 1
+
+    def test_no_devices(self):
+        executor = ClusterExecutor()
+        assert executor.map([], mock.Mock()) == []
@@ -0,0 +1,86 @@
+# coding=utf-8
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import eventlet
+
+from f5_openstack_agent.lbaasv2.drivers.bigip.fdb_pipeline import \
+    FdbChanges
+from f5_openstack_agent.lbaasv2.drivers.bigip.fdb_pipeline import \
+    FdbPipeline
+
+import mock
+
+
+def fdb(vtep, mac_address, network_id='net1'):
+    return {network_id: {
+        'network_type': 'vxlan',
+        'segment_id': 1008,
+        'ports': {vtep: [['00:00:00:00:00:00', '0.0.0.0'],
+                         [mac_address, None]]}}}
+
+
+class TestFdbChanges(object):
+    def test_merge(self):
+        changes = FdbChanges()
+        changes.add(fdb('10.30.30.2', 'fa:16:3e:00:00:01'))
+        changes.add(fdb('10.30.30.2', 'fa:16:3e:00:00:02'))
+        changes.add(fdb('10.30.30.3', 'fa:16:3e:00:00:03', 'net2'))
+        changes.remove(fdb('10.30.30.2', 'fa:16:3e:00:00:01'))
+        # a port moved to another vtep
+        changes.remove(fdb('10.30.30.2', 'fa:16:3e:00:00:02'))
+        changes.add(fdb('10.30.30.4', 'fa:16:3e:00:00:02'))
+
+        assert len(changes) == 3
+        assert changes.networks['net1']['segment_id'] == 1008
+        assert changes.networks['net1']['records'] == {
+            'fa:16:3e:00:00:01': {'endpoint': '10.30.30.2',
+                                  'ip_address': None, 'delete': True},
+            'fa:16:3e:00:00:02': {'endpoint': '10.30.30.4',
+                                  'ip_address': None, 'delete': False}}
+        assert list(changes.networks['net2']['records']) == \
+            ['fa:16:3e:00:00:03']
+
+
+class TestFdbPipeline(object):
+    def test_no_interval(self):
+        apply_changes = mock.Mock()
+        pipeline = FdbPipeline(apply_changes, interval=0)
+
+        pipeline.add(fdb('10.30.30.2', 'fa:16:3e:00:00:01'))
+        pipeline.remove(fdb('10.30.30.2', 'fa:16:3e:00:00:01'))
+        assert apply_changes.call_count == 2
+        assert len(pipeline) == 0
+
+    def test_interval(self):
+        apply_changes = mock.Mock(side_effect=Exception('device error'))
+        pipeline = FdbPipeline(apply_changes, interval=0.01)
+
+        pipeline.add(fdb('10.30.30.2', 'fa:16:3e:00:00:01'))
+        pipeline.add(fdb('10.30.30.2', 'fa:16:3e:00:00:02'))
+        pipeline.remove(fdb('10.30.30.2', 'fa:16:3e:00:00:01'))
+        assert not apply_changes.called
+        assert len(pipeline) == 2
+
+        eventlet.sleep(0.05)
+        assert apply_changes.call_count == 1
+        changes = apply_changes.call_args[0][0]
+        assert len(changes) == 2
+        assert len(pipeline) == 0
+
+        # flush errors are logged, and later notifications still flushed
+        pipeline.add(fdb('10.30.30.2', 'fa:16:3e:00:00:03'))
+        eventlet.sleep(0.05)
+        assert apply_changes.call_count == 2
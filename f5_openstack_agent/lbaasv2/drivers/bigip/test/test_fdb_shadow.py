@@ -0,0 +1,143 @@
+# coding=utf-8
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from requests.exceptions import HTTPError
+
+from f5_openstack_agent.lbaasv2.drivers.bigip.fdb_shadow import \
+    FdbShadowTable
+from f5_openstack_agent.lbaasv2.drivers.bigip.network_helper import \
+    NetworkHelper
+
+import mock
+import pytest
+
+TUNNEL = 'tunnel-vxlan-1008'
+
+
+def record(mac_address, endpoint):
+    return {'name': mac_address, 'endpoint': endpoint}
+
+
+@pytest.fixture
+def bigip():
+    bigip = mock.Mock(hostname='host1')
+    tunnel = mock.Mock(records=[record('fa:16:3e:00:00:01', '10.30.30.2'),
+                                record('fa:16:3e:00:00:02', '10.30.30.3')])
+    bigip.tm.net.fdb.tunnels.tunnel.load.return_value = tunnel
+    return bigip
+
+
+def loaded_tunnel(bigip):
+    return bigip.tm.net.fdb.tunnels.tunnel.load.return_value
+
+
+class TestFdbShadowTable(object):
+    def test_update(self, bigip):
+        table = FdbShadowTable()
+        tunnel = loaded_tunnel(bigip)
+
+        deleted = table.update(
+            bigip, TUNNEL, 'Project_t1', now=100,
+            add_records={'fa:16:3e:00:00:03': {'endpoint': '10.30.30.4'}},
+            delete_records={'fa:16:3e:00:00:01': {'endpoint': '10.30.30.2'},
+                            'fa:16:3e:00:00:09': {'endpoint': '10.30.30.2'}})
+        assert deleted == ['fa:16:3e:00:00:01']
+        tunnel.modify.assert_called_once_with(records=[
+            record('fa:16:3e:00:00:02', '10.30.30.3'),
+            record('fa:16:3e:00:00:03', '10.30.30.4')])
+
+        # later updates are computed from the shadow copy
+        table.update(
+            bigip, TUNNEL, 'Project_t1', now=200,
+            add_records={'fa:16:3e:00:00:02': {'endpoint': '10.30.30.5'}},
+            delete_records={'fa:16:3e:00:00:03': {'endpoint': '10.30.30.4'}})
+        tunnel.modify.assert_called_with(records=[
+            record('fa:16:3e:00:00:02', '10.30.30.5')])
+        assert bigip.tm.net.fdb.tunnels.tunnel.load.call_count == 1
+
+        # unchanged records are not written
+        table.update(
+            bigip, TUNNEL, 'Project_t1', now=300,
+            add_records={'fa:16:3e:00:00:02': {'endpoint': '10.30.30.5'}})
+        assert tunnel.modify.call_count == 2
+
+        table.update(bigip, TUNNEL, 'Project_t1', now=400,
+                     delete_records={'fa:16:3e:00:00:02': {}})
+        tunnel.modify.assert_called_with(records=None)
+
+    def test_reconcile(self, bigip):
+        table = FdbShadowTable(reconcile_interval=600)
+        assert len(table.get_records(bigip, TUNNEL, 'Project_t1',
+                                     now=100)) == 2
+        assert len(table) == 1
+
+        # drift is picked up once the records are due to be reconciled
+        loaded_tunnel(bigip).records = []
+        assert len(table.get_records(bigip, TUNNEL, 'Project_t1',
+                                     now=699)) == 2
+        assert table.get_records(bigip, TUNNEL, 'Project_t1',
+                                 now=700) == []
+
+        # as well as once invalidated
+        loaded_tunnel(bigip).records = [record('fa:16:3e:00:00:01', 'a')]
+        table.invalidate(bigip)
+        assert len(table) == 0
+        assert len(table.get_records(bigip, TUNNEL, 'Project_t1',
+                                     now=701)) == 1
+        assert bigip.tm.net.fdb.tunnels.tunnel.load.call_count == 3
+
+    def test_errors(self, bigip):
+        table = FdbShadowTable()
+        tunnel = loaded_tunnel(bigip)
+        tunnel.modify.side_effect = HTTPError(
+            response=mock.Mock(status_code=404))
+
+        assert table.update(bigip, TUNNEL, 'Project_t1', delete_records={
+            'fa:16:3e:00:00:01': {}}) is None
+        assert len(table) == 0
+
+        bigip.tm.net.fdb.tunnels.tunnel.load.side_effect = HTTPError(
+            response=mock.Mock(status_code=404))
+        assert table.get_records(bigip, TUNNEL, 'Project_t1') is None
+
+        bigip.tm.net.fdb.tunnels.tunnel.load.side_effect = HTTPError(
+            response=mock.Mock(status_code=500))
+        with pytest.raises(HTTPError):
+            table.get_records(bigip, TUNNEL, 'Project_t1')
+
+
+class TestNetworkHelperFdbTable(object):
+    def test_add_and_delete_fdb_entries(self, bigip):
+        network_helper = NetworkHelper()
+        network_helper.fdb_table = FdbShadowTable()
+        tunnel = loaded_tunnel(bigip)
+
+        network_helper.add_fdb_entries(bigip, fdb_entries={TUNNEL: {
+            'folder': 'Project_t1',
+            'records': {'fa:16:3e:00:00:03': {'endpoint': '10.30.30.4',
+                                              'ip_address': '10.1.0.3'}}}})
+        network_helper.delete_fdb_entries(bigip, fdb_entries={TUNNEL: {
+            'folder': 'Project_t1',
+            'records': {'fa:16:3e:00:00:01': {'endpoint': '10.30.30.2',
+                                              'ip_address': '10.1.0.1'}}}})
+
+        assert bigip.tm.net.fdb.tunnels.tunnel.load.call_count == 1
+        tunnel.modify.assert_called_with(records=[
+            record('fa:16:3e:00:00:02', '10.30.30.3'),
+            record('fa:16:3e:00:00:03', '10.30.30.4')])
+
+        network_helper.delete_all_fdb_entries(bigip, TUNNEL, 'Project_t1')
+        assert len(network_helper.fdb_table) == 0
@@ -14,6 +14,7 @@
 # limitations under the License.
 #
 
+import eventlet
 import pytest
 import uuid
 
@@ -21,9 +22,21 @@ from mock import Mock
 from mock import patch
 from requests import HTTPError
 
+from f5_openstack_agent.lbaasv2.drivers.bigip.assure_planner import \
+    AssurePlan
 from f5_openstack_agent.lbaasv2.drivers.bigip import constants_v2
 
+from f5_openstack_agent.lbaasv2.drivers.bigip.cluster_executor import \
+    ClusterExecutor
 import f5_openstack_agent.lbaasv2.drivers.bigip.icontrol_driver as target_mod
+from f5_openstack_agent.lbaasv2.drivers.bigip.member_states import \
+    MemberStateTracker
+from f5_openstack_agent.lbaasv2.drivers.bigip.service_scheduler import \
+    ServiceScheduler
+from f5_openstack_agent.lbaasv2.drivers.bigip.stats_scheduler import \
+    StatsScheduler
+from f5_openstack_agent.lbaasv2.drivers.bigip.virtual_stats import \
+    VirtualStatsSnapshot
 import f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper
 import f5_openstack_agent.lbaasv2.drivers.bigip.utils
 
@@ -62,7 +75,9 @@ class TestiControlDriverMockBuilder(mock_builder_base_class.MockBuilderBase,
         self._construct_others()
         # continue to fill in other_builders as needed...
         mocked_target.operational = True
-        mocked_target.service_queue = []
+        mocked_target.service_queue = ServiceScheduler()
+        mocked_target.resource_snapshot = None
+        mocked_target.cluster_executor = ClusterExecutor()
         mocked_target.hostnames = []
         mocked_target.conf = Mock()  # may need to be a shared one...
         mocked_target.hostnames = None
@@ -645,7 +660,7 @@ class TestiControlDriver(TestiControlDriverMocker,
                   mock_log_utils):
 
         def setup_target(target, svc):
-            target.service_queue = list()
+            target.service_queue = ServiceScheduler()
             target._common_service_handler = Mock(return_value='pass')
 
         def setup_plugin_rpc(target, svc):
@@ -681,3 +696,211 @@ class TestiControlDriver(TestiControlDriverMocker,
         without_lb(
             self.mocked_target_with_connection(self.fully_mocked_target()),
             service_with_loadbalancer)
+
+    def test_get_all_deployed_with_resource_snapshot(
+            self, mocked_target_with_connection, standalone_builder,
+            mock_logger, mock_log_utils):
+        target = mocked_target_with_connection
+        folder = Mock()
+        folder.name = 'UNIT_TESTtenant1'
+        pool = Mock(spec=['name'])
+        pool.name = 'UNIT_TESTpool1'
+        bigip = Mock()
+        bigip.hostname = 'foodoozoo'
+        bigip.tmos_version = '12.1.0'
+        bigip.tm.sys.folders.get_collection.return_value = [folder]
+        bigip.tm.ltm.pools.get_collection.return_value = [pool]
+        collection = bigip.tm.ltm.pools.get_collection
+        standalone_builder.mock_get_all_bigips(
+            target, return_value=[bigip], call_cnt=0)
+        target.service_adapter.get_folder_name.return_value = \
+            'UNIT_TESTtenant1'
+
+        # without a snapshot every scan queries the device
+        target.get_all_deployed_pools()
+        target.get_all_deployed_pools()
+        assert collection.call_count == 2
+
+        collection.reset_mock()
+        target.open_resource_snapshot()
+        pools = target.get_all_deployed_pools()
+        assert pools['pool1']['tenant_id'] == 'tenant1'
+        target.get_all_deployed_pools()
+        assert collection.call_count == 1
+
+        # a purge invalidates the partition it changed
+        target.purge_orphaned_pool('tenant1', 'pool1', ['foodoozoo'])
+        target.get_all_deployed_pools()
+        assert collection.call_count == 2
+
+        # as does a service provisioned while the snapshot is open
+        target.conf.trace_service_requests = False
+        target.tenant_manager = Mock()
+        target.network_builder = None
+        target.lbaas_builder = Mock()
+        target.get_config_bigips = Mock(return_value=[])
+        target.service_to_traffic_group = Mock()
+        target.update_service_status = Mock()
+        target._common_service_handler(
+            {'loadbalancer': {'id': 'lb1', 'tenant_id': 'tenant1',
+                              'provisioning_status': 'PENDING_CREATE'}})
+        assert target.lbaas_builder.assure_service.call_count == 1
+        target.get_all_deployed_pools()
+        assert collection.call_count == 3
+        target.close_resource_snapshot()
+        assert target.resource_snapshot is None
+
+    def test_generate_capacity_score(self, mocked_target_with_connection,
+                                     standalone_builder):
+        target = mocked_target_with_connection
+        bigips = [Mock(), Mock(), Mock()]
+        for index, bigip in enumerate(bigips):
+            bigip.hostname = 'host%d' % index
+            bigip.status = 'active'
+        bigips[2].status = 'error'
+        standalone_builder.mock_get_all_bigips(
+            target, return_value=bigips, call_cnt=0)
+        target.stat_helper = Mock()
+        target.get_throughput = Mock(side_effect=[300, 500])
+        target.get_active_connections = Mock(side_effect=[20, 10])
+        target.get_node_count = Mock(side_effect=[1, 2])
+
+        score = target.generate_capacity_score(
+            {'throughput': 1000, 'active_connections': 100,
+             'node_count': 10, 'unknown_metric': 1})
+        assert score == 0.5
+        # one load of the global statistics per active device
+        assert target.stat_helper.get_global_statistics.call_count == 2
+        target.get_throughput.assert_called_with(
+            bigip=bigips[1],
+            global_statistics=target.stat_helper.get_global_statistics.
+            return_value)
+
+    def test_update_operating_status_changes(self, fully_mocked_target):
+        target = fully_mocked_target
+        target.plugin_rpc = Mock()
+        target.network_builder = None
+        target.member_states = MemberStateTracker()
+        target.service_adapter = Mock()
+        target.service_adapter.init_pool_name.side_effect = \
+            lambda loadbalancer, pool: {'name': 'Project_' + pool['id'],
+                                        'partition': 'Project_t1'}
+        target.lbaas_builder = Mock()
+
+        def update_operating_status(service):
+            for member in service['members']:
+                member['operating_status'] = constants_v2.F5_ONLINE
+        target.lbaas_builder.update_operating_status.side_effect = \
+            update_operating_status
+
+        service = {'loadbalancer': {'id': 'lb1'},
+                   'pools': [{'id': 'pool1'}],
+                   'members': [{'id': 'm1', 'provisioning_status': 'ACTIVE',
+                                'operating_status': 'ONLINE'},
+                               {'id': 'm2', 'provisioning_status': 'ACTIVE',
+                                'operating_status': 'OFFLINE'}]}
+        target.update_operating_status(service)
+        target.plugin_rpc.update_member_status.assert_called_once_with(
+            'm2', provisioning_status=None, operating_status='ONLINE')
+
+        bigip = Mock(hostname='host1')
+        bigip.tm.ltm.pools._meta_data = {
+            'uri': 'https://localhost/mgmt/tm/ltm/pool/'}
+        target.get_active_bigip = Mock(return_value=bigip)
+        pools = {'items': [{'name': 'Project_pool1',
+                            'partition': 'Project_t1',
+                            'membersReference': {'items': [
+                                {'name': '10.2.0.4%2:80', 'state': 'up',
+                                 'session': 'monitor-enabled'}]}}]}
+        bigip.icrs.get.return_value.json.return_value = pools
+        # the pools of lb1 are polled for the first time
+        assert target.get_operating_status_changes(['lb1', 'lb2']) == \
+            ['lb1', 'lb2']
+        # lb1 was not updated, so its change is reported again
+        assert target.get_operating_status_changes(['lb1', 'lb2']) == \
+            ['lb1', 'lb2']
+        target.update_operating_status(service)
+        assert target.get_operating_status_changes(['lb1', 'lb2']) == \
+            ['lb2']
+        pools['items'][0]['membersReference']['items'][0]['state'] = 'down'
+        assert target.get_operating_status_changes(['lb1']) == ['lb1']
+        assert bigip.icrs.get.call_count == 4
+
+        bigip.icrs.get.side_effect = HTTPError('device error')
+        assert target.get_operating_status_changes(['lb1']) == ['lb1']
+
+    def test_stats_request_count_with_snapshot(self, fully_mocked_target):
+        target = fully_mocked_target
+        bigip = Mock(hostname='host1')
+        bigip.tm.ltm.virtuals._meta_data = {
+            'uri': 'https://localhost/mgmt/tm/ltm/virtual/'}
+        bigip.icrs.get.return_value.json.return_value = {'entries': {}}
+        target.get_config_bigips = Mock(return_value=[bigip])
+        snapshot = VirtualStatsSnapshot(interval=10)
+        target.lbaas_builder = Mock()
+        target.lbaas_builder.listener_builder.stats_snapshot = snapshot
+        target.lbaas_builder.get_listener_stats.side_effect = \
+            lambda service, stats: snapshot.get_table(bigip)
+        scheduler = StatsScheduler(60)
+        tokens = scheduler._tokens
+
+        # two loadbalancers sampled within one snapshot interval cost
+        # the one request loading the snapshot
+        for lb_id in ('lb1', 'lb2'):
+            service = {'loadbalancer': {'id': lb_id},
+                       'listeners': [{'id': 'listener1'}]}
+            assert scheduler.sample(
+                lb_id, target.get_stats_request_count(service), now=100)
+            target.get_stats(service)
+        assert bigip.icrs.get.call_count == 1
+        assert tokens - scheduler._tokens == 1
+        assert target.get_stats_request_count({'listeners': []}) == 0
+
+        snapshot.invalidate()
+        assert target.get_stats_request_count(service) == 1
+
+    def test_plan_service(self, fully_mocked_target):
+        target = fully_mocked_target
+        target.service_queue = ServiceScheduler()
+        target.network_builder = Mock()
+        target.lbaas_builder = Mock()
+        target.lbaas_builder.plan_service.return_value = AssurePlan()
+        target.service_to_traffic_group = Mock(
+            return_value='traffic-group-1')
+        service = {'loadbalancer': {'id': 'lb1', 'tenant_id': 't1'}}
+
+        plan = target.plan_service(service)
+
+        assert plan is target.lbaas_builder.plan_service.return_value
+        planned = target.lbaas_builder.plan_service.call_args[0][0]
+        assert planned['loadbalancer']['traffic_group'] == 'traffic-group-1'
+        target.network_builder._annotate_service_route_domains.\
+            assert_called_once_with(planned)
+        # the service is left as it was
+        assert 'traffic_group' not in service['loadbalancer']
+        assert not target.lbaas_builder.assure_service.called
+
+    def test_delete_member_not_coalesced(self, fully_mocked_target):
+        target = fully_mocked_target
+        target.service_queue = ServiceScheduler()
+        calls = []
+
+        def common_service_handler(service, delete_event=False):
+            calls.append((service['member']['id'], delete_event))
+            eventlet.sleep(0.01)
+        target._common_service_handler = Mock(
+            side_effect=common_service_handler)
+
+        def service(member_id):
+            return {'loadbalancer': {'id': 'lb1', 'tenant_id': 't1'},
+                    'member': {'id': member_id}}
+
+        pool = eventlet.GreenPool()
+        pool.spawn(target.create_member, {}, service('m1'))
+        eventlet.sleep(0)
+        # queued behind the create, neither replaces the delete
+        pool.spawn(target.delete_member, {}, service('m2'))
+        eventlet.sleep(0)
+        pool.spawn(target.update_member, {}, {}, service('m3'))
+        pool.waitall()
+        assert calls == [('m1', False), ('m2', True), ('m3', False)]
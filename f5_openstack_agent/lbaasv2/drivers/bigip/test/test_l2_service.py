@@ -21,6 +21,8 @@ import pytest
 from mock import Mock
 from mock import patch
 
+from f5_openstack_agent.lbaasv2.drivers.bigip.fdb_pipeline import \
+    FdbChanges
 from f5_openstack_agent.lbaasv2.drivers.bigip.l2_service import \
     _get_tunnel_name
 from f5_openstack_agent.lbaasv2.drivers.bigip.l2_service import \
@@ -447,3 +449,44 @@ class Test_L2ServiceBuilder(object):
 
         # expect to modify with no records (i.e, removing entry)
         fdb_entry.modify.assert_called_with(records=None)
+
+    def test_apply_bigip_fdb(self, l2_service, bigips):
+        changes = FdbChanges()
+        changes.add({'net1': {
+            'network_type': 'vxlan', 'segment_id': 1008,
+            'ports': {'192.168.130.59': [['fa:16:3e:0d:fa:c8', None]],
+                      '192.168.130.10': [['fa:16:3e:0d:fa:c9', None]]}}})
+        changes.remove({'net1': {
+            'network_type': 'vxlan', 'segment_id': 1008,
+            'ports': {'192.168.130.60': [['fa:16:3e:0d:fa:c6', None]]}}})
+        changes.add({'net2': {
+            'network_type': 'vlan', 'segment_id': 100,
+            'ports': {'192.168.130.59': [['fa:16:3e:0d:fa:c7', None]]}}})
+
+        network_helper = NetworkHelper()
+        bigip = bigips[0]
+        bigip.local_ip = '192.168.130.10'
+        tunnel = mock.MagicMock()
+        tunnel.name = 'tunnel-vxlan-1008'
+        tunnel.partition = 'Project_tenant1'
+        bigip.tm.net.fdb.tunnels.get_collection.return_value = [tunnel]
+        fdb_entry = mock.MagicMock()
+        fdb_entry.records = [
+            {'endpoint': '192.168.130.60', 'name': 'fa:16:3e:0d:fa:c6'},
+            {'endpoint': '192.168.130.61', 'name': 'fa:16:3e:0d:fa:c5'}]
+        bigip.tm.net.fdb.tunnels.tunnel.load.return_value = fdb_entry
+        l2_service.network_helper = network_helper
+
+        l2_service.apply_bigip_fdb(bigip, changes)
+
+        bigip.tm.net.fdb.tunnels.tunnel.load.assert_called_once_with(
+            name='tunnel-vxlan-1008', partition='Project_tenant1')
+        fdb_entry.modify.assert_called_once_with(records=[
+            {'endpoint': '192.168.130.61', 'name': 'fa:16:3e:0d:fa:c5'},
+            {'endpoint': '192.168.130.59', 'name': 'fa:16:3e:0d:fa:c8'}])
+
+        # records already on the tunnel are not written again
+        fdb_entry.records = fdb_entry.modify.call_args[1]['records']
+        fdb_entry.modify.reset_mock()
+        l2_service.apply_bigip_fdb(bigip, changes)
+        assert not fdb_entry.modify.called
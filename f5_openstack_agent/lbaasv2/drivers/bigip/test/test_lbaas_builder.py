@@ -25,9 +25,14 @@ from requests import HTTPError
 
 import f5_openstack_agent.lbaasv2.drivers.bigip.lbaas_builder
 
+from f5_openstack_agent.lbaasv2.drivers.bigip import assure_planner
 from f5_openstack_agent.lbaasv2.drivers.bigip import constants_v2
 from f5_openstack_agent.lbaasv2.drivers.bigip.lbaas_builder import \
     LBaaSBuilder
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import \
+    ResourceType
+from f5_openstack_agent.lbaasv2.drivers.bigip.service_adapter import \
+    ServiceModelAdapter
 
 
 LOG = f5_openstack_agent.lbaasv2.drivers.bigip.lbaas_builder.LOG
@@ -1127,6 +1132,7 @@ class TestLbaasBuilder(TestLBaaSBuilderConstructor):
         target.listener_builder = Mock()
         target.listener_builder.create_listener.return_value = None
 
+        target.driver.get_config_bigips.return_value = [Mock()]
         expected_bigips = target.driver.get_config_bigips()
         listener['provisioning_status'] = \
             constants_v2.F5_PENDING_UPDATE
@@ -1153,6 +1159,7 @@ class TestLbaasBuilder(TestLBaaSBuilderConstructor):
         target.listener_builder = Mock()
         target.listener_builder.create_listener.return_value = None
 
+        target.driver.get_config_bigips.return_value = [Mock()]
         expected_bigips = target.driver.get_config_bigips()
         listener['provisioning_status'] = \
             constants_v2.F5_PENDING_CREATE
@@ -1178,6 +1185,7 @@ class TestLbaasBuilder(TestLBaaSBuilderConstructor):
         target.listener_builder = Mock()
         target.listener_builder.create_listener.return_value = "error"
 
+        target.driver.get_config_bigips.return_value = [Mock()]
         expected_bigips = target.driver.get_config_bigips()
         listener['provisioning_status'] = \
             constants_v2.F5_PENDING_CREATE
@@ -1204,6 +1212,7 @@ class TestLbaasBuilder(TestLBaaSBuilderConstructor):
         target.listener_builder = Mock()
         target.listener_builder.create_listener.return_value = None
 
+        target.driver.get_config_bigips.return_value = [Mock()]
         expected_bigips = target.driver.get_config_bigips()
         listener['provisioning_status'] = \
             constants_v2.F5_ERROR
@@ -1230,6 +1239,7 @@ class TestLbaasBuilder(TestLBaaSBuilderConstructor):
         target.listener_builder = Mock()
         target.listener_builder.delete_listener.return_value = None
 
+        target.driver.get_config_bigips.return_value = [Mock()]
         expected_bigips = target.driver.get_config_bigips()
         listener['provisioning_status'] = \
             constants_v2.F5_PENDING_DELETE
@@ -1255,6 +1265,7 @@ class TestLbaasBuilder(TestLBaaSBuilderConstructor):
         target.listener_builder = Mock()
         target.listener_builder.delete_listener.return_value = "error"
 
+        target.driver.get_config_bigips.return_value = [Mock()]
         expected_bigips = target.driver.get_config_bigips()
         listener['provisioning_status'] = \
             constants_v2.F5_PENDING_DELETE
@@ -2028,3 +2039,108 @@ class TestLbaasBuilder(TestLBaaSBuilderConstructor):
             builder._assure_loadbalancer_deleted(svc)
             assert not mock_vaddr.assure.called
             assert loadbalancer['provisioning_status'] == 'ERROR'
+
+    def test_update_operating_status(self, fully_mocked_target):
+        target = fully_mocked_target
+        target.driver = Mock()
+        target.service_adapter = Mock()
+        target.service_adapter.get_member.side_effect = \
+            lambda svc: {'name': svc['member']['address'] + ':80'}
+        target.pool_builder = Mock()
+        target.pool_builder.get_members_status.side_effect = [
+            {'10.2.0.4:80': {'status.availabilityState': 'available',
+                             'status.enabledState': 'enabled'},
+             '10.2.0.5:80': {'status.availabilityState': 'offline',
+                             'status.enabledState': 'enabled'}},
+            {}]
+
+        def member(address, pool_id, provisioning_status='ACTIVE'):
+            return {'address': address, 'pool_id': pool_id,
+                    'provisioning_status': provisioning_status}
+
+        service = {'loadbalancer': {'id': 'lb1'},
+                   'pools': [{'id': 'pool1'}, {'id': 'pool2'}],
+                   'members': [member('10.2.0.4', 'pool1'),
+                               member('10.2.0.5', 'pool1'),
+                               member('10.2.0.6', 'pool1', 'PENDING_CREATE'),
+                               member('10.2.0.7', 'pool2')]}
+
+        target.update_operating_status(service)
+
+        # the status of each pool's members is loaded once
+        assert target.pool_builder.get_members_status.call_count == 2
+        assert [m.get('operating_status') for m in service['members']] == \
+            [constants_v2.F5_ONLINE, constants_v2.F5_OFFLINE, None, None]
+
+
+class FakeDevice(object):
+    """Device resources keyed by type and name, as read by the planner."""
+
+    def __init__(self):
+        self.resources = dict()
+
+    def get_resource(self, bigip, resource_type, name, partition,
+                     expand_subcollections=False):
+        return self.resources.get((resource_type, name), None)
+
+    def load(self, plan):
+        for change in plan:
+            self.resources[(change.resource_type, change.name)] = \
+                copy.deepcopy(change.changes)
+
+
+class TestAssureServicePlanning(object):
+    @pytest.fixture
+    def builder(self):
+        conf = mock.MagicMock()
+        conf.environment_prefix = 'Project'
+        conf.f5_snat_mode = False
+        conf.common_network_ids = dict()
+        driver = mock.MagicMock()
+        driver.service_adapter = ServiceModelAdapter(conf)
+        driver.l3_binding = None
+        bigip = mock.MagicMock()
+        bigip.hostname = 'host1'
+        bigip.tm.ltm.virtuals.get_collection.return_value = []
+        driver.get_config_bigips.return_value = [bigip]
+
+        builder = LBaaSBuilder(conf, driver)
+        builder._update_subnet_hints = Mock()
+        return builder
+
+    @staticmethod
+    def device_writes(bigip):
+        return [call[0] for call in bigip.mock_calls
+                if call[0].split('.')[-1] in ('create', 'modify', 'update')]
+
+    def test_plan_and_assure_unchanged_service(self, builder, service):
+        service['loadbalancer']['traffic_group'] = 'traffic-group-1'
+        bigip = builder.driver.get_config_bigips()[0]
+        device = FakeDevice()
+        with patch.object(assure_planner, 'BigIPResourceLoader',
+                          return_value=device):
+            plan = builder.plan_service(service)
+            assert plan.summary() == {
+                assure_planner.CREATE: 4, assure_planner.MODIFY: 0,
+                assure_planner.DELETE: 0}
+            assert [change.resource_type for change in plan] == [
+                ResourceType.virtual_address, ResourceType.http_monitor,
+                ResourceType.pool, ResourceType.virtual]
+            assert not self.device_writes(bigip)
+
+            # An assured service makes no changes to the device.
+            device.load(plan)
+            assert len(builder.plan_service(service)) == 0
+            builder.assure_service(service, None, mock.MagicMock())
+            assert self.device_writes(bigip) == []
+
+            # Only the changed pool is modified.
+            service['pools'][0]['lb_algorithm'] = 'LEAST_CONNECTIONS'
+            plan = builder.plan_service(service)
+            assert [(change.action, change.resource_type, change.changes)
+                    for change in plan] == [
+                (assure_planner.MODIFY, ResourceType.pool,
+                 {'loadBalancingMode': 'least-connections-member'})]
+            builder.assure_service(service, None, mock.MagicMock())
+            assert self.device_writes(bigip) == [
+                'tm.ltm.pools.pool.load().modify']
@@ -621,3 +621,40 @@ class TestListenerServiceBuilder(TestListenerServiceBuilderBuilder):
 
         self.creation_mode_listener(svc, svc['listeners'][0])
         negative_full_path(target, svc, esd)
+
+    def test_get_stats(self, target, service_with_listener):
+        bigips = [Mock(), Mock(), Mock()]
+        for index, bigip in enumerate(bigips):
+            bigip.hostname = 'host%d' % index
+        target.service_adapter.get_virtual.return_value = \
+            dict(name='name', partition='partition')
+
+        def get_stats(bigip, name=None, partition=None, stat_keys=[]):
+            if bigip.hostname == 'host1':
+                raise Exception('unreachable')
+            return {'clientside.bitsIn': 5}
+
+        target.vs_helper.get_stats.side_effect = get_stats
+        stats = target.get_stats(
+            service_with_listener, bigips,
+            ['clientside.bitsIn', 'clientside.bitsOut'])
+        assert stats == {'clientside.bitsIn': 10, 'clientside.bitsOut': 0}
+        assert target.vs_helper.get_stats.call_count == 3
+        assert self.logger.error.call_count == 1
+
+    def test_get_stats_snapshot(self, target, service_with_listener):
+        bigips = [Mock(hostname='host0'), Mock(hostname='host1')]
+        target.service_adapter.get_virtual.return_value = \
+            dict(name='name', partition='partition')
+        target.stats_snapshot = Mock()
+        target.stats_snapshot.get_stats.return_value = \
+            {'clientside.bitsIn': 5}
+
+        stats = target.get_stats(
+            service_with_listener, bigips, ['clientside.bitsIn'])
+        assert stats == {'clientside.bitsIn': 10}
+        assert target.stats_snapshot.get_stats.call_count == 2
+        target.stats_snapshot.get_stats.assert_any_call(
+            bigips[1], name='name', partition='partition',
+            stat_keys=['clientside.bitsIn'])
+        assert not target.vs_helper.get_stats.called
@@ -0,0 +1,79 @@
+# coding=utf-8
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_openstack_agent.lbaasv2.drivers.bigip.member_states import \
+    MemberStateTracker
+from f5_openstack_agent.lbaasv2.drivers.bigip.member_states import \
+    parse_member_states
+
+import mock
+
+
+def pool(name, *members):
+    return {'name': name, 'partition': 'Project_t1',
+            'membersReference': {'items': [
+                {'name': member, 'state': state,
+                 'session': 'monitor-enabled'}
+                for member, state in members]}}
+
+
+def bigip(hostname, *pools):
+    bigip = mock.Mock(hostname=hostname)
+    bigip.tm.ltm.pools._meta_data = {
+        'uri': 'https://localhost/mgmt/tm/ltm/pool/'}
+    bigip.icrs.get.return_value.json.return_value = {'items': list(pools)}
+    return bigip
+
+
+class TestMemberStateTracker(object):
+    def test_parse_member_states(self):
+        assert parse_member_states({'items': [
+            pool('pool1', ('10.2.0.4%2:80', 'up')), pool('pool2')]}) == {
+                ('Project_t1', 'pool1'): {
+                    '10.2.0.4%2:80': ('up', 'monitor-enabled')},
+                ('Project_t1', 'pool2'): {}}
+
+    def test_poll(self):
+        tracker = MemberStateTracker()
+        tracker.watch('lb1', [('Project_t1', 'pool1')])
+        tracker.watch('lb2', [('Project_t1', 'pool2')])
+
+        device = bigip('host1', pool('pool1', ('10.2.0.4%2:80', 'up')),
+                       pool('pool2', ('10.2.0.5%2:80', 'up')),
+                       pool('other', ('10.2.0.6%2:80', 'up')))
+        assert tracker.poll(device) == set(['lb1', 'lb2'])
+        tracker.watch('lb1', [('Project_t1', 'pool1')])
+        tracker.watch('lb2', [('Project_t1', 'pool2')])
+        assert tracker.poll(device) == set()
+        assert ('Project_t1', 'other') not in tracker._states
+
+        # a member went down, and one was added
+        device.icrs.get.return_value.json.return_value = {'items': [
+            pool('pool1', ('10.2.0.4%2:80', 'down')),
+            pool('pool2', ('10.2.0.5%2:80', 'up'),
+                 ('10.2.0.7%2:80', 'up'))]}
+        assert tracker.poll(device) == set(['lb1', 'lb2'])
+        tracker.watch('lb1', [('Project_t1', 'pool1')])
+
+        # the update of lb2 failed, so its change is reported again
+        assert tracker.poll(device) == set(['lb2'])
+        tracker.watch('lb2', [('Project_t1', 'pool2')])
+        assert tracker.poll(device) == set()
+
+        # all pools are changed on another device
+        tracker.retain(['lb1'])
+        assert 'lb2' not in tracker
+        assert tracker.poll(bigip('host2')) == set(['lb1'])
@@ -24,6 +24,8 @@ import f5_openstack_agent.lbaasv2.drivers.bigip.constants_v2 as const
 import f5_openstack_agent.lbaasv2.drivers.bigip.network_helper
 from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper \
     import BigIPResourceHelper
+from f5_openstack_agent.lbaasv2.drivers.bigip.route_domain_allocator \
+    import RouteDomainIdAllocator
 
 
 class TestNetworkHelperConstructor(object):
@@ -459,5 +461,80 @@ class TestNetworkHelper(TestNetworkHelperBuilder):
             assert target.get_virtual_service_insertion(
                 bigip, partition=bigip.partition) == expected
 
-        valid_virtual_address(fully_mocked_target)
-        invalid_virtual_address(fully_mocked_target)
+        freeze_get_resources = BigIPResourceHelper.get_resources
+        freeze_load = BigIPResourceHelper.load
+        try:
+            valid_virtual_address(fully_mocked_target)
+            invalid_virtual_address(fully_mocked_target)
+        finally:
+            BigIPResourceHelper.get_resources = freeze_get_resources
+            BigIPResourceHelper.load = freeze_load
+
+    def test_get_address_index(self, target):
+        def resource(**kwargs):
+            item = Mock()
+            for key, value in kwargs.items():
+                setattr(item, key, value)
+            return item
+
+        bigip = Mock()
+        bigip.tmos_version = '12.1.2'
+        bigip.tm.ltm.virtuals.get_collection.return_value = [
+            resource(name='vs1', destination='/Project_t1/Project_lb1:80'),
+            resource(name='vs2', destination='/Project_t1/Project_lb2:443'),
+            resource(name='vs3', destination='/Project_t1/10.9.0.1%2:80')]
+        bigip.tm.ltm.virtual_address_s.get_collection.return_value = [
+            resource(name='Project_lb1', address='10.1.0.5%2'),
+            resource(name='Project_lb2', address='2001:db8::5%2')]
+        bigip.tm.ltm.nodes.get_collection.return_value = [
+            resource(address='10.3.0.7%2'), resource(address='10.4.0.7')]
+
+        index = target.get_address_index(bigip, partition='Project_t1')
+
+        assert index.has_address_in('10.1.0.0/24', 2)
+        assert index.has_address_in('2001:db8::/64', 2)
+        assert index.has_address_in('10.3.0.0/16', 2)
+        assert index.has_address_in('10.4.0.0/16', 0)
+        assert not index.has_address_in('10.1.0.0/24', 3)
+        assert not index.has_address_in('10.4.0.0/16', 2)
+        # destinations which are not virtual addresses are not indexed
+        assert not index.has_address_in('10.9.0.0/16', 2)
+        assert bigip.tm.ltm.virtuals.get_collection.call_count == 1
+        assert bigip.tm.ltm.virtual_address_s.get_collection.call_count == 1
+        assert not bigip.tm.ltm.virtual_address_s.virtual_address.load.called
+
+    def test_create_route_domain(self, target):
+        def route_domain(rd_id):
+            return Mock(id=rd_id)
+
+        target.conf.external_gateway_mode = False
+        bigip = Mock(hostname='host1')
+        bigip.route_domain_ids = RouteDomainIdAllocator()
+        rdc = bigip.tm.net.route_domains
+        rdc.get_collection.return_value = [
+            route_domain(0), route_domain(1), route_domain(3)]
+        create = rdc.route_domain.create
+
+        target.create_route_domain(bigip, partition='Project_t1')
+        target.create_route_domain(bigip, partition='Project_t2',
+                                   is_aux=True)
+        assert [call[1]['id'] for call in create.call_args_list] == [2, 4]
+        assert create.call_args[1]['name'] == 'Project_t2_aux_4'
+        assert rdc.get_collection.call_count == 1
+
+        # an id taken outside the agent is found by loading the ids again
+        rdc.get_collection.return_value.extend(
+            [route_domain(2), route_domain(4), route_domain(5)])
+        create.side_effect = [
+            HTTPError(response=Mock(status_code=409)), Mock()]
+        target.create_route_domain(bigip, partition='Project_t3')
+        assert create.call_args[1]['id'] == 6
+        assert rdc.get_collection.call_count == 2
+
+        # the id of a route domain which is not created is freed
+        create.side_effect = HTTPError(response=Mock(status_code=400))
+        with pytest.raises(HTTPError):
+            target.create_route_domain(bigip, partition='Project_t4')
+        create.side_effect = None
+        target.create_route_domain(bigip, partition='Project_t4')
+        assert create.call_args[1]['id'] == 7
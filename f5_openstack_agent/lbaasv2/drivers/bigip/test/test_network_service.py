@@ -15,9 +15,13 @@
 #
 
 from collections import namedtuple
+from f5_openstack_agent.lbaasv2.drivers.bigip.address_index import \
+    AddressIndex
 from f5_openstack_agent.lbaasv2.drivers.bigip import exceptions as f5_ex
 from f5_openstack_agent.lbaasv2.drivers.bigip.network_service import \
     NetworkServiceBuilder
+from f5_openstack_agent.lbaasv2.drivers.bigip.route_domain_cache import \
+    RouteDomainCache
 from f5_openstack_agent.lbaasv2.drivers.bigip.service_adapter import \
     ServiceModelAdapter
 
@@ -332,7 +336,15 @@ def network_service(rds_cache):
     service.service_adapter = ServiceModelAdapter(conf)
 
     # add a 'real' RD cache
-    service.rds_cache = rds_cache
+    service.rds_cache = RouteDomainCache()
+    for tenant_id, tenant_rds in rds_cache.items():
+        service.rds_cache.add_tenant(tenant_id)
+        for route_domain_id, rd_entry in tenant_rds.items():
+            for net_short_name, net_entry in rd_entry.items():
+                for subnet_id, subnet in net_entry['subnets'].items():
+                    service.rds_cache.add_subnet(
+                        tenant_id, route_domain_id, net_short_name,
+                        subnet_id, subnet['cidr'])
 
     # mock NetworkHelper.get_route_domain()
     rd = namedtuple('RouteDomain', 'id')
@@ -386,7 +398,7 @@ class TestNetworkServiceBuilder(object):
         with pytest.raises(f5_ex.RouteDomainCacheMiss) as excinfo:
             network['provider:segmentation_id'] = 606
             network['provider:network_type'] = 'vlan'
-            network_service.rds_cache = {}
+            network_service.rds_cache.invalidate()
             network_service.get_route_domain_from_cache(network)
         assert 'vlan-606' in str(excinfo.value)
 
@@ -483,6 +495,95 @@ class TestNetworkServiceBuilder(object):
         assert len(subnets) == 1
         self._verify_assure_item('mgmt_v4_subnet', subnets, net_id, False)
 
+    def test_update_rds_cache_bulk(self, network_service):
+        tenant_id = 'tenant1'
+        partition = 'Project_tenant1'
+        network_service.service_adapter.prefix = 'Project_'
+        network_service.rds_cache.invalidate()
+
+        def resource(**kwargs):
+            item = mock.Mock()
+            for key, value in kwargs.items():
+                setattr(item, key, value)
+            return item
+
+        bigip = mock.MagicMock()
+        bigip.device_name = 'bigip1'
+        bigip.tmos_version = '12.1.0'
+        net = bigip.tm.net
+        net.route_domains.get_collection.return_value = [
+            resource(id=2, vlans=['/%s/vlan-1' % partition,
+                                  '/%s/tunnel-vxlan-2' % partition]),
+            resource(id=3, vlans=['/%s/tunnel-gre-3' % partition]),
+            resource(id=4, vlans=[])]
+        net.vlans.get_collection.return_value = [
+            resource(name='vlan-1', tag=601)]
+        net.tunnels.tunnels.get_collection.return_value = [
+            resource(name='tunnel-vxlan-2', key=72),
+            resource(name='tunnel-gre-3', key=93)]
+        net.selfips.get_collection.return_value = [
+            resource(name='local-bigip1-subnet1',
+                     vlan='/%s/vlan-1' % partition,
+                     address='10.1.1.10%2/24'),
+            resource(name='local-bigip1-subnet2',
+                     vlan='/%s/tunnel-vxlan-2' % partition,
+                     address='10.2.0.10%2/16'),
+            resource(name='local-bigip2-subnet2',
+                     vlan='/%s/tunnel-vxlan-2' % partition,
+                     address='10.2.0.11%2/16')]
+        network_service.driver.get_all_bigips.return_value = [bigip]
+
+        network_service.update_rds_cache(tenant_id)
+
+        assert network_service.rds_cache.get_route_domains(tenant_id) == {
+            2: {'vlan-601': {'subnets': {'subnet1': {
+                'cidr': netaddr.IPNetwork('10.1.1.0/24')}}},
+                'vxlan-72': {'subnets': {'subnet2': {
+                    'cidr': netaddr.IPNetwork('10.2.0.0/16')}}}},
+            3: {'gre-93': {'subnets': {}}}}
+
+        # one collection query per resource type, however many route
+        # domains and vlans the tenant has
+        for collection in (net.route_domains, net.vlans,
+                           net.tunnels.tunnels, net.selfips):
+            assert collection.get_collection.call_count == 1
+        assert not net.vlans.vlan.load.called
+        assert not net.tunnels.tunnels.tunnel.load.called
+
+        # cached tenants are not read again
+        network_service.update_rds_cache(tenant_id)
+        assert net.route_domains.get_collection.call_count == 1
+
+    def test_get_subnets_to_delete(self, network_service):
+        network_service.service_adapter.prefix = 'Project_'
+        bigip = mock.MagicMock()
+        bigip.hostname = 'bigip1'
+        network_service.network_helper.get_address_index.return_value = \
+            AddressIndex(['10.1.0.5%2', '10.3.0.5%3'])
+        service = {
+            'loadbalancer': {'tenant_id': 'tenant1'},
+            'subnets': dict(
+                ('subnet%d' % index,
+                 {'id': 'subnet%d' % index, 'cidr': '10.%d.0.0/24' % index})
+                for index in range(1, 4)),
+            'networks': {'net1': {'id': 'net1', 'route_domain_id': 2}}}
+        subnet_hints = {'check_for_delete_subnets': dict(
+            ('subnet%d' % index,
+             {'subnet_id': 'subnet%d' % index, 'network_id': 'net1'})
+            for index in range(1, 4))}
+
+        address_indexes = dict()
+        subnets = network_service._get_subnets_to_delete(
+            bigip, service, subnet_hints, address_indexes)
+        assert sorted(info['subnet_id'] for info in subnets) == [
+            'subnet2', 'subnet3']
+
+        # The addresses are indexed once per bigip for all subnets.
+        network_service._get_subnets_to_delete(
+            bigip, service, subnet_hints, address_indexes)
+        network_service.network_helper.get_address_index.\
+            assert_called_once_with(bigip, partition='Project_tenant1')
+
     def _verify_assure_item(self, name, subnets, net_id, is_member):
         item = self._get_assure_item(name, subnets)
         assert item
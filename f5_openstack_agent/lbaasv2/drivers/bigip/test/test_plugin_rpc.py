@@ -259,3 +259,110 @@ class TestPluginRpc(TestPluginRpcConstructor,
         positive_case_no_loadbalancers(target, get_uuid, populated_payload)
         positive_case_loadbalancers(target, get_uuid, empty_payload)
         negative_case(target, get_uuid, self.m_logger)
+
+    def test_get_services_by_loadbalancer_ids(self, target):
+        lb_ids = ['lb%d' % index for index in range(5)]
+        target.services_batch_size = 2
+        target._call = Mock(side_effect=lambda context, msg, **kwargs: dict(
+            (lb_id, {'id': lb_id})
+            for lb_id in msg['args']['loadbalancer_ids']))
+        target.get_service_by_loadbalancer_id = \
+            Mock(side_effect=lambda lb_id: {'single': lb_id})
+
+        services = target.get_services_by_loadbalancer_ids(lb_ids)
+        assert services == {'lb0': {'id': 'lb0'}, 'lb1': {'id': 'lb1'},
+                            'lb2': {'id': 'lb2'}, 'lb3': {'id': 'lb3'},
+                            'lb4': {'single': 'lb4'}}
+        assert target._call.call_count == 2
+        assert [call[0][1]['args']['loadbalancer_ids']
+                for call in target._call.call_args_list] == \
+            [['lb0', 'lb1'], ['lb2', 'lb3']]
+        target.get_service_by_loadbalancer_id.assert_called_once_with('lb4')
+
+    def test_get_services_by_loadbalancer_ids_fallback(self, target):
+        lb_ids = ['lb%d' % index for index in range(4)]
+        target._call = Mock(side_effect=messaging.RemoteError(
+            exc_type='NoSuchMethod'))
+        target.get_service_by_loadbalancer_id = \
+            Mock(side_effect=lambda lb_id: {'single': lb_id})
+
+        services = target.get_services_by_loadbalancer_ids(lb_ids)
+        assert services == dict((lb_id, {'single': lb_id})
+                                for lb_id in lb_ids)
+        assert target.bulk_services_supported is False
+        assert target.get_service_by_loadbalancer_id.call_count == 4
+
+        target.get_services_by_loadbalancer_ids(lb_ids)
+        assert target._call.call_count == 1
+
+        # a batch which fails is retrieved one loadbalancer at a time, and
+        # a loadbalancer which fails does not stop the others
+        target._call.side_effect = messaging.RemoteError(exc_type='KeyError')
+        target.bulk_services_supported = True
+        target.services_batch_size = 2
+        target.get_service_by_loadbalancer_id.reset_mock()
+        target.get_service_by_loadbalancer_id.side_effect = \
+            lambda lb_id: {'single': lb_id} if lb_id != 'lb1' else 1 / 0
+        services = list(target.iter_services_by_loadbalancer_ids(lb_ids))
+        assert services == [('lb0', {'single': 'lb0'}), ('lb1', None),
+                            ('lb2', {'single': 'lb2'}),
+                            ('lb3', {'single': 'lb3'})]
+        assert target._call.call_count == 3
+        assert target.bulk_services_supported is True
+
+    def test_get_ports_by_names(self, target):
+        target._call = Mock(return_value={'port1': [{'id': 'p1'}]})
+        target.get_port_by_name = Mock()
+
+        assert target.get_ports_by_names(port_names=['port1']) == \
+            {'port1': [{'id': 'p1'}]}
+        assert target._call.call_args[0][1]['args'] == {
+            'port_names': ['port1']}
+        assert not target.get_port_by_name.called
+
+    def test_create_ports_on_subnets_fallback(self, target):
+        ports = [{'subnet_id': 'subnet1', 'name': 'port%d' % index}
+                 for index in range(2)]
+        target._call = Mock(side_effect=messaging.RemoteError(
+            exc_type='NoSuchMethod'))
+        target.create_port_on_subnet = \
+            Mock(side_effect=lambda **port: {'id': port['name']})
+        target.get_port_by_name = Mock(return_value=[])
+
+        assert target.create_ports_on_subnets(ports=ports) == {
+            'port0': {'id': 'port0'}, 'port1': {'id': 'port1'}}
+        assert target.bulk_ports_supported is False
+        target.create_port_on_subnet.assert_called_with(
+            subnet_id='subnet1', name='port1')
+
+        assert target.get_ports_by_names(port_names=['port0']) == \
+            {'port0': []}
+        assert target._call.call_count == 1
+
+    def test_update_statuses_fallback(self, target):
+        statuses = [
+            {'type': 'member', 'id': 'm1', 'provisioning_status': 'ACTIVE',
+             'operating_status': 'ONLINE'},
+            {'type': 'l7rule', 'id': 'r1', 'l7policy_id': 'p1',
+             'provisioning_status': 'ACTIVE', 'operating_status': 'ONLINE'}]
+        target._call = Mock()
+        target.update_member_status = Mock()
+        target.update_l7rule_status = Mock()
+
+        target.update_statuses('lb1', statuses)
+        assert target._call.call_args[0][1]['args'] == {
+            'loadbalancer_id': 'lb1', 'statuses': statuses}
+        assert not target.update_member_status.called
+
+        target._call.side_effect = messaging.RemoteError(
+            exc_type='NoSuchMethod')
+        target.update_statuses('lb1', statuses)
+        target.update_statuses('lb1', statuses)
+        assert target.bulk_status_supported is False
+        assert target._call.call_count == 2
+        target.update_member_status.assert_called_with(
+            'm1', provisioning_status='ACTIVE', operating_status='ONLINE')
+        target.update_l7rule_status.assert_called_with(
+            'r1', l7policy_id='p1', provisioning_status='ACTIVE',
+            operating_status='ONLINE')
+        assert target.update_member_status.call_count == 2
@@ -81,6 +81,11 @@ class TestPoolServiceBuilderBuilder(TestPoolServiceBuilderConstructor):
 
     def cleanup(self):
         pool_service.LOG = self.freeze_log
+        if hasattr(self, 'freeze_resource_bigip'):
+            f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper.\
+                BigIPResourceHelper = self.freeze_resource_bigip
+            f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper.\
+                ResourceType = self.freeze_resource_type
 
     def clean_svc_with_pool(self):
         svc = self.service_with_network(self.new_id())
@@ -636,3 +641,35 @@ class TestPoolServiceBuilder(TestPoolServiceBuilderBuilder):
 
         assert 'missing' not in service['members'][0]
         assert 'missing' in service['members'][1]
+
+    def test_get_members_status(self, target):
+        pool = dict(name='Project_pool1', partition='Project_t1')
+        target.service_adapter.get_pool.return_value = pool
+        pools_uri = 'https://localhost/mgmt/tm/ltm/pool/'
+        members_uri = pools_uri + '~Project_t1~Project_pool1/members/'
+
+        def member_stats(name, available, enabled):
+            link = members_uri + urllib.quote('~Project_t1~' + name) + \
+                '/stats'
+            return link, {'nestedStats': {'entries': {
+                'status.availabilityState': {'description': available},
+                'status.enabledState': {'description': enabled},
+                'curSessions': {'value': 3}}}}
+
+        bigip = Mock()
+        bigip.tm.ltm.pools._meta_data = {'uri': pools_uri}
+        bigip.icrs.get.return_value.json.return_value = {'entries': dict([
+            member_stats('10.2.0.4%2:80', 'available', 'enabled'),
+            member_stats('2001:db8::4%2.80', 'offline', 'enabled')])}
+        status_keys = ['status.availabilityState', 'status.enabledState']
+
+        assert target.get_members_status({}, bigip, status_keys) == {
+            '10.2.0.4%2:80': {'status.availabilityState': 'available',
+                              'status.enabledState': 'enabled'},
+            '2001:db8::4%2.80': {'status.availabilityState': 'offline',
+                                 'status.enabledState': 'enabled'}}
+        bigip.icrs.get.assert_called_once_with(members_uri + 'stats')
+
+        bigip.icrs.get.side_effect = MockHTTPError(
+            MockHTTPErrorResponse404())
+        assert target.get_members_status({}, bigip, status_keys) == {}
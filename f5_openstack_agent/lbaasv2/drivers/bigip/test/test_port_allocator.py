@@ -0,0 +1,91 @@
+# coding=utf-8
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_openstack_agent.lbaasv2.drivers.bigip.port_allocator import \
+    get_port_address
+from f5_openstack_agent.lbaasv2.drivers.bigip.port_allocator import \
+    PortAllocator
+
+import mock
+
+
+def port(ip_address):
+    return {'fixed_ips': [{'ip_address': ip_address}]}
+
+
+def port_args(subnet_id, name):
+    return {'subnet_id': subnet_id, 'mac_address': None, 'name': name,
+            'fixed_address_count': 1, 'device_id': 'lb1',
+            'vnic_type': 'baremetal'}
+
+
+class TestPortAllocator(object):
+    def test_get_port_address(self):
+        assert get_port_address(port('10.1.0.5')) == '10.1.0.5'
+        assert get_port_address({'fixed_ips': []}) == ''
+        assert get_port_address(None) == ''
+
+    def test_allocate(self):
+        driver = mock.Mock()
+        rpc = driver.plugin_rpc
+        rpc.get_ports_by_names.return_value = {
+            'local-host1-subnet1': [port('10.1.0.2')],
+            'snat-subnet1_0': [],
+            'gw-subnet1': []}
+        rpc.create_ports_on_subnets.return_value = {
+            'snat-subnet1_0': port('10.1.0.3'),
+            'snat-subnet1_1': None}
+        allocator = PortAllocator(driver)
+
+        ports = allocator.allocate(
+            [port_args('subnet1', 'local-host1-subnet1'),
+             port_args('subnet1', 'snat-subnet1_0'),
+             port_args('subnet1', 'snat-subnet1_1')],
+            lookups=[('subnet1', 'gw-subnet1')])
+
+        assert ports == {'local-host1-subnet1': port('10.1.0.2'),
+                         'snat-subnet1_0': port('10.1.0.3'),
+                         'snat-subnet1_1': None,
+                         'gw-subnet1': None}
+        rpc.get_ports_by_names.assert_called_once_with(port_names=[
+            'local-host1-subnet1', 'snat-subnet1_0', 'snat-subnet1_1',
+            'gw-subnet1'])
+        rpc.create_ports_on_subnets.assert_called_once_with(ports=[
+            port_args('subnet1', 'snat-subnet1_0'),
+            port_args('subnet1', 'snat-subnet1_1')])
+        assert len(allocator) == 2
+
+        # Cached ports are not looked up again
+        rpc.get_ports_by_names.reset_mock()
+        ports = allocator.allocate([port_args('subnet1', 'snat-subnet1_0')])
+        assert ports == {'snat-subnet1_0': port('10.1.0.3')}
+        assert not rpc.get_ports_by_names.called
+
+    def test_remove_and_invalidate(self):
+        allocator = PortAllocator(mock.Mock())
+        allocator.add_port('subnet1', 'snat-subnet1_0', port('10.1.0.3'))
+        allocator.add_port('subnet1', 'snat-subnet1_1', port('10.1.0.4'))
+        allocator.add_port('subnet2', 'snat-subnet2_0', port('10.2.0.3'))
+
+        allocator.remove_port('snat-subnet1_0')
+        assert allocator.get_port('subnet1', 'snat-subnet1_0') is None
+        assert allocator.get_port('subnet1', 'snat-subnet1_1') == \
+            port('10.1.0.4')
+
+        allocator.invalidate('subnet1')
+        assert len(allocator) == 1
+        allocator.invalidate()
+        assert len(allocator) == 0
@@ -0,0 +1,101 @@
+# coding=utf-8
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import \
+    ResourceType
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_snapshot import \
+    BigIPResourceSnapshot
+
+import mock
+import pytest
+
+
+def make_resource(name, **kwargs):
+    resource = mock.Mock()
+    resource.name = name
+    for key, value in kwargs.items():
+        setattr(resource, key, value)
+    return resource
+
+
+@pytest.fixture
+def bigip():
+    bigip = mock.MagicMock()
+    bigip.hostname = 'host1'
+    bigip.tmos_version = '12.1.0'
+    folder = make_resource('Project_tenant1')
+    bigip.tm.sys.folders.get_collection.return_value = [folder]
+    bigip.tm.ltm.virtuals.get_collection.return_value = [
+        make_resource('Project_listener1')]
+    bigip.tm.ltm.pools.get_collection.return_value = [
+        make_resource('Project_pool1',
+                      membersReference={'items': [
+                          {'name': '10.0.0.1%2:80'},
+                          {'name': '10.0.0.2%2:80'}]}),
+        make_resource('Project_pool2', membersReference={'link': 'pool2'})]
+    return bigip
+
+
+class TestBigIPResourceSnapshot(object):
+    def test_folder_exists(self, bigip):
+        snapshot = BigIPResourceSnapshot()
+        assert snapshot.folder_exists(bigip, 'Common')
+        assert snapshot.folder_exists(bigip, 'Project_tenant1')
+        assert not snapshot.folder_exists(bigip, 'Project_tenant2')
+        assert bigip.tm.sys.folders.get_collection.call_count == 1
+
+    def test_exists_loads_collection_once(self, bigip):
+        snapshot = BigIPResourceSnapshot()
+        collection = bigip.tm.ltm.virtuals.get_collection
+        assert snapshot.exists(bigip, ResourceType.virtual,
+                               'Project_listener1', 'Project_tenant1')
+        assert not snapshot.exists(bigip, ResourceType.virtual,
+                                   'Project_listener2', 'Project_tenant1')
+        assert collection.call_count == 1
+        params = collection.call_args[1]['requests_params']['params']
+        assert params['$filter'] == 'partition eq Project_tenant1'
+
+    def test_get_pool_members(self, bigip):
+        snapshot = BigIPResourceSnapshot()
+        members = snapshot.get_pool_members(
+            bigip, 'Project_tenant1', 'Project_pool1')
+        assert members == set(['10.0.0.1%2:80', '10.0.0.2%2:80'])
+        assert snapshot.get_pool_members(
+            bigip, 'Project_tenant1', 'Project_pool2') == set()
+        assert snapshot.get_pool_members(
+            bigip, 'Project_tenant1', 'Project_pool3') is None
+        collection = bigip.tm.ltm.pools.get_collection
+        assert collection.call_count == 1
+        params = collection.call_args[1]['requests_params']['params']
+        assert params['expandSubcollections'] == 'true'
+
+    def test_expanded_serves_plain(self, bigip):
+        snapshot = BigIPResourceSnapshot()
+        snapshot.get_pool_members(bigip, 'Project_tenant1', 'Project_pool1')
+        assert snapshot.exists(bigip, ResourceType.pool,
+                               'Project_pool2', 'Project_tenant1')
+        assert bigip.tm.ltm.pools.get_collection.call_count == 1
+
+    def test_invalidate_partition(self, bigip):
+        snapshot = BigIPResourceSnapshot()
+        collection = bigip.tm.ltm.virtuals.get_collection
+        snapshot.exists(bigip, ResourceType.virtual, 'a', 'Project_tenant1')
+        snapshot.exists(bigip, ResourceType.virtual, 'a', 'Project_tenant2')
+        snapshot.invalidate(partition='Project_tenant1')
+        snapshot.exists(bigip, ResourceType.virtual, 'a', 'Project_tenant2')
+        assert collection.call_count == 2
+        snapshot.exists(bigip, ResourceType.virtual, 'a', 'Project_tenant1')
+        assert collection.call_count == 3
@@ -0,0 +1,54 @@
+# coding=utf-8
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_openstack_agent.lbaasv2.drivers.bigip import route_domain_allocator
+from f5_openstack_agent.lbaasv2.drivers.bigip.route_domain_allocator import \
+    RouteDomainIdAllocator
+
+import mock
+import pytest
+
+
+class TestRouteDomainIdAllocator(object):
+    def test_reserve(self):
+        allocator = RouteDomainIdAllocator()
+        load_ids = mock.Mock(return_value=[0, 1, 4, 6])
+
+        assert not allocator.loaded
+        assert [allocator.reserve(load_ids) for i in range(5)] == \
+            [2, 3, 5, 7, 8]
+        assert allocator.loaded
+        assert load_ids.call_count == 1
+
+        # released ids are reserved again, lowest first
+        allocator.release(5)
+        allocator.release(2)
+        allocator.release(42)
+        assert [allocator.reserve(load_ids) for i in range(3)] == [2, 5, 9]
+
+        allocator.invalidate()
+        load_ids.return_value = [0, 1, 2]
+        assert allocator.reserve(load_ids) == 3
+        assert load_ids.call_count == 2
+
+    def test_exhausted(self):
+        allocator = RouteDomainIdAllocator()
+        with mock.patch.object(route_domain_allocator,
+                               'MAX_ROUTE_DOMAIN_ID', 3):
+            assert allocator.reserve(lambda: [0, 2]) == 1
+            assert allocator.reserve(lambda: [0, 2]) == 3
+            with pytest.raises(LookupError):
+                allocator.reserve(lambda: [0, 2])
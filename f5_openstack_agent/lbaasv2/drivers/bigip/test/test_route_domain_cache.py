@@ -0,0 +1,104 @@
+# coding=utf-8
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_openstack_agent.lbaasv2.drivers.bigip.route_domain_cache import \
+    RouteDomainCache
+
+import netaddr
+
+
+def cidr(value):
+    return netaddr.IPNetwork(value)
+
+
+class TestRouteDomainCache(object):
+    def test_add_and_get(self):
+        cache = RouteDomainCache()
+        cache.add_tenant('tenant1')
+        cache.add_subnet('tenant1', 1, 'vlan-604', 'subnet1',
+                         cidr('10.1.0.0/24'))
+        cache.add_subnet('tenant1', 2, 'vxlan-88', 'subnet2',
+                         cidr('10.1.0.0/24'))
+        cache.add_route_domain('tenant1', 3)
+
+        assert 'tenant1' in cache
+        assert 'tenant2' not in cache
+        assert cache.get_route_domain('vlan-604') == 1
+        assert cache.get_route_domain('vxlan-88') == 2
+        assert cache.get_route_domain('vlan-605') is None
+        assert sorted(cache.get_route_domains('tenant1')) == [1, 2, 3]
+        assert cache.get_route_domains('tenant1')[2] == {
+            'vxlan-88': {'subnets': {
+                'subnet2': {'cidr': cidr('10.1.0.0/24')}}}}
+
+    def test_remove_subnet(self):
+        cache = RouteDomainCache()
+        cache.add_tenant('tenant1')
+        cache.add_subnet('tenant1', 1, 'vlan-604', 'subnet1',
+                         cidr('10.1.0.0/24'))
+        cache.add_subnet('tenant1', 1, 'vlan-604', 'subnet2',
+                         cidr('10.2.0.0/24'))
+        cache.add_subnet('tenant1', 1, 'vlan-606', 'subnet3',
+                         cidr('10.3.0.0/24'))
+
+        cache.remove_subnet('vlan-604', 'subnet1')
+        assert cache.get_route_domain('vlan-604') == 1
+        cache.remove_subnet('vlan-604', 'subnet2')
+        assert cache.get_route_domain('vlan-604') is None
+        assert cache.get_route_domains('tenant1') == {1: {
+            'vlan-606': {'subnets': {
+                'subnet3': {'cidr': cidr('10.3.0.0/24')}}}}}
+
+        # The route domain goes with its last network.
+        cache.remove_subnet('vlan-606', 'subnet3')
+        assert cache.get_route_domains('tenant1') == {}
+
+        # Unknown networks and subnets are ignored.
+        cache.remove_subnet('vlan-606', 'subnet3')
+        cache.remove_subnet('vlan-700', 'subnet4')
+
+    def test_invalidate(self):
+        cache = RouteDomainCache()
+        for tenant_id, segment in (('tenant1', 604), ('tenant2', 606)):
+            cache.add_tenant(tenant_id)
+            cache.add_subnet(tenant_id, 1, 'vlan-%d' % segment,
+                             'subnet%d' % segment, cidr('10.1.0.0/24'))
+
+        cache.invalidate('tenant1')
+        assert 'tenant1' not in cache
+        assert cache.get_route_domain('vlan-604') is None
+        assert cache.get_route_domain('vlan-606') == 1
+
+        cache.invalidate()
+        assert len(cache) == 0
+        assert cache.get_route_domain('vlan-606') is None
+
+    def test_evicts_least_recently_used_tenant(self):
+        cache = RouteDomainCache(max_tenants=2)
+        for index in range(3):
+            tenant_id = 'tenant%d' % index
+            cache.add_tenant(tenant_id)
+            cache.add_subnet(tenant_id, 1, 'vlan-%d' % index,
+                             'subnet%d' % index, cidr('10.1.0.0/24'))
+            # tenant0 is used again before tenant2 is added
+            cache.add_tenant('tenant0')
+
+        assert len(cache) == 2
+        assert 'tenant0' in cache
+        assert 'tenant1' not in cache
+        assert cache.get_route_domain('vlan-1') is None
+        assert cache.get_route_domain('vlan-0') == 1
+        assert cache.get_route_domain('vlan-2') == 1
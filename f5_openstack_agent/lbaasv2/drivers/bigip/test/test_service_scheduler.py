@@ -0,0 +1,252 @@
+# coding=utf-8
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_openstack_agent.lbaasv2.drivers.bigip.service_scheduler import \
+    ServiceRequest
+from f5_openstack_agent.lbaasv2.drivers.bigip.service_scheduler import \
+    ServiceScheduler
+from f5_openstack_agent.lbaasv2.drivers.bigip.utils import serialized
+
+import eventlet
+import mock
+
+
+def make_service(lb_id, tenant_id, network_id):
+    return {'loadbalancer': {'id': lb_id,
+                             'tenant_id': tenant_id,
+                             'network_id': network_id},
+            'networks': {network_id: {'id': network_id}}}
+
+
+class TestServiceRequest(object):
+    def test_keys(self):
+        request = ServiceRequest(
+            'create_member', make_service('lb1', 'tenant1', 'net1'))
+        assert request.loadbalancer_id == 'lb1'
+        assert request.tenant_id == 'tenant1'
+        assert request.network_ids == set(['net1'])
+        assert not request.exclusive
+
+    def test_no_service_is_exclusive(self):
+        request = ServiceRequest('backup_configuration')
+        other = ServiceRequest(
+            'create_member', make_service('lb1', 'tenant1', 'net1'))
+        assert request.exclusive
+        assert request.conflicts(other)
+        assert other.conflicts(request)
+
+    def test_tenant_only(self):
+        request = ServiceRequest('purge_orphaned_pool', tenant_id='tenant1')
+        same = ServiceRequest(
+            'create_pool', make_service('lb1', 'tenant1', 'net1'))
+        other = ServiceRequest(
+            'create_pool', make_service('lb2', 'tenant2', 'net2'))
+        assert not request.exclusive
+        assert request.conflicts(same)
+        assert not request.conflicts(other)
+
+    def test_conflicts(self):
+        request = ServiceRequest(
+            'create_member', make_service('lb1', 'tenant1', 'net1'))
+        assert request.conflicts(ServiceRequest(
+            'create_member', make_service('lb1', 'tenant1', 'net1')))
+        assert request.conflicts(ServiceRequest(
+            'create_member', make_service('lb2', 'tenant1', 'net2')))
+        assert request.conflicts(ServiceRequest(
+            'create_member', make_service('lb2', 'tenant2', 'net1')))
+        assert not request.conflicts(ServiceRequest(
+            'create_member', make_service('lb2', 'tenant2', 'net2')))
+
+
+class TestServiceScheduler(object):
+    def test_unrelated_requests_run_concurrently(self):
+        scheduler = ServiceScheduler(max_concurrent=2)
+        first = scheduler.submit(
+            'create_member', make_service('lb1', 'tenant1', 'net1'))
+        second = scheduler.submit(
+            'create_member', make_service('lb2', 'tenant2', 'net2'))
+        assert first.started and second.started
+        assert len(scheduler.running) == 2
+
+    def test_max_concurrent(self):
+        scheduler = ServiceScheduler(max_concurrent=1)
+        first = scheduler.submit(
+            'create_member', make_service('lb1', 'tenant1', 'net1'))
+        second = ServiceRequest(
+            'create_member', make_service('lb2', 'tenant2', 'net2'))
+        scheduler.pending.append(second)
+        scheduler._dispatch()
+        assert not second.started
+        scheduler.release(first)
+        assert second.started
+        assert scheduler.running == [second]
+
+    def test_conflicting_requests_keep_order(self):
+        scheduler = ServiceScheduler(max_concurrent=4)
+        first = scheduler.submit(
+            'create_member', make_service('lb1', 'tenant1', 'net1'))
+        second = ServiceRequest(
+            'create_member', make_service('lb1', 'tenant1', 'net1'))
+        # conflicts with second only, must not overtake it
+        third = ServiceRequest(
+            'create_member', make_service('lb2', 'tenant1', 'net2'))
+        fourth = ServiceRequest(
+            'create_member', make_service('lb3', 'tenant3', 'net3'))
+        scheduler.pending.extend([second, third, fourth])
+        scheduler._dispatch()
+        assert not second.started
+        assert not third.started
+        assert fourth.started
+        scheduler.release(first)
+        assert second.started
+        assert not third.started
+        scheduler.release(second)
+        assert third.started
+
+    def test_waiter_wakes_on_release(self):
+        scheduler = ServiceScheduler(max_concurrent=4)
+        order = []
+
+        def worker(name, delay):
+            request = scheduler.submit(
+                name, make_service('lb1', 'tenant1', 'net1'))
+            order.append(name)
+            eventlet.sleep(delay)
+            scheduler.release(request)
+
+        pool = eventlet.GreenPool()
+        pool.spawn(worker, 'first', 0.01)
+        pool.spawn(worker, 'second', 0)
+        pool.waitall()
+        assert order == ['first', 'second']
+        assert len(scheduler) == 0
+
+    def test_coalesce_pending_request(self):
+        scheduler = ServiceScheduler(max_concurrent=4)
+        running = scheduler.submit(
+            'create_member', make_service('lb1', 'tenant1', 'net1'))
+        first = ServiceRequest(
+            'create_member', make_service('lb1', 'tenant1', 'net1'),
+            coalesce=True)
+        scheduler.pending.append(first)
+
+        finished = []
+
+        def newer():
+            request = scheduler.submit(
+                'update_member', make_service('lb1', 'tenant1', 'net1'),
+                coalesce=True)
+            finished.append(request)
+
+        thread = eventlet.spawn(newer)
+        eventlet.sleep(0)
+        assert len(scheduler.pending) == 1
+        winner = scheduler.pending[0]
+        assert first.superseded_by is winner
+        assert winner.superseded == [first]
+
+        scheduler.release(running)
+        thread.wait()
+        assert finished == [winner]
+        winner.result = True
+        scheduler.release(winner)
+        assert first.ready.ready()
+        assert len(scheduler) == 0
+
+    def test_no_coalesce_across_conflict(self):
+        scheduler = ServiceScheduler(max_concurrent=4)
+        scheduler.submit(
+            'create_member', make_service('lb1', 'tenant1', 'net1'))
+        first = ServiceRequest(
+            'create_member', make_service('lb1', 'tenant1', 'net1'),
+            coalesce=True)
+        # a later request for another lb in the same tenant
+        second = ServiceRequest(
+            'delete_loadbalancer', make_service('lb2', 'tenant1', 'net2'))
+        scheduler.pending.extend([first, second])
+        eventlet.spawn(scheduler.submit, 'create_member',
+                       make_service('lb1', 'tenant1', 'net1'), None, True)
+        eventlet.sleep(0)
+        assert first.superseded_by is None
+        assert len(scheduler.pending) == 3
+
+    def test_no_coalesce_without_flag(self):
+        scheduler = ServiceScheduler(max_concurrent=4)
+        scheduler.submit(
+            'create_member', make_service('lb1', 'tenant1', 'net1'))
+        first = ServiceRequest(
+            'delete_loadbalancer', make_service('lb1', 'tenant1', 'net1'))
+        scheduler.pending.append(first)
+        eventlet.spawn(scheduler.submit, 'create_member',
+                       make_service('lb1', 'tenant1', 'net1'), None, True)
+        eventlet.sleep(0)
+        assert first.superseded_by is None
+        assert len(scheduler.pending) == 2
+
+
+class TestSerialized(object):
+    def test_serialized_releases_on_error(self):
+        driver = mock.Mock()
+        driver.service_queue = ServiceScheduler()
+
+        @serialized('create_member')
+        def create_member(driver, member, service):
+            raise ValueError('failed')
+
+        service = make_service('lb1', 'tenant1', 'net1')
+        try:
+            create_member(driver, {}, service)
+        except ValueError:
+            pass
+        assert len(driver.service_queue) == 0
+
+    def test_serialized_result(self):
+        driver = mock.Mock()
+        driver.service_queue = ServiceScheduler()
+
+        @serialized('purge_orphaned_pool')
+        def purge_orphaned_pool(driver, tenant_id=None, pool_id=None):
+            return driver.service_queue.running[0].tenant_id
+
+        result = purge_orphaned_pool(driver, tenant_id='tenant1',
+                                     pool_id='pool1')
+        assert result == 'tenant1'
+        assert len(driver.service_queue) == 0
+
+    def test_serialized_coalesce(self):
+        driver = mock.Mock()
+        driver.service_queue = ServiceScheduler()
+        calls = []
+
+        @serialized('create_member', coalesce=True)
+        def create_member(driver, member, service):
+            calls.append(member)
+            eventlet.sleep(0.01)
+            return member
+
+        services = [make_service('lb1', 'tenant1', 'net1')
+                    for _ in range(4)]
+        pool = eventlet.GreenPool()
+        results = [pool.spawn(create_member, driver, member, service)
+                   for member, service in enumerate(services)]
+        pool.waitall()
+
+        # the first runs at once, the rest are coalesced into the last
+        assert calls == [0, 3]
+        assert [result.wait() for result in results] == [0, 3, 3, 3]
+        assert driver.update_superseded_service_status.call_count == 2
+        driver.update_superseded_service_status.assert_called_with(
+            services[2], services[3])
@@ -0,0 +1,113 @@
+# coding=utf-8
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_openstack_agent.lbaasv2.drivers.bigip.assured_cache import \
+    AssuredCache
+from f5_openstack_agent.lbaasv2.drivers.bigip.snat_index import \
+    SNATMembershipIndex
+from f5_openstack_agent.lbaasv2.drivers.bigip.snats import BigipSnatManager
+
+import mock
+
+
+def snatpool(partition, name, members):
+    pool = mock.Mock(partition=partition, members=members)
+    pool.name = name
+    return pool
+
+
+def mock_bigip(snatpools):
+    bigip = mock.Mock(hostname='host1')
+    bigip.tm.ltm.snatpools.get_collection.return_value = snatpools
+    return bigip
+
+
+class TestSNATMembershipIndex(object):
+    def test_load(self):
+        bigip = mock_bigip([
+            snatpool('Project_t1', 'Project_t1',
+                     ['/Project_t1/snat-1-subnet1_0',
+                      '/Common/snat-1-subnet2_0']),
+            snatpool('Project_t2', 'Project_t2',
+                     ['/Common/snat-1-subnet2_0'])])
+        snat_index = SNATMembershipIndex()
+        assert snat_index.is_stale()
+
+        snat_index.load(bigip, now=100)
+        assert not snat_index.is_stale(now=399)
+        assert snat_index.is_stale(now=400)
+        assert snat_index.get_member_use_count('snat-1-subnet1_0') == 1
+        assert snat_index.get_member_use_count('snat-1-subnet2_0') == 2
+        assert snat_index.get_member_use_count('snat-1-subnet3_0') == 0
+        assert snat_index.get_pools('/Common/snat-1-subnet2_0') == set([
+            ('Project_t1', 'Project_t1'), ('Project_t2', 'Project_t2')])
+        assert bigip.tm.ltm.snatpools.get_collection.call_count == 1
+
+        snat_index.invalidate()
+        assert snat_index.is_stale(now=101)
+
+    def test_add_and_remove(self):
+        snat_index = SNATMembershipIndex()
+        snat_index.add_member('Project_t1', 'Project_t1', '/Common/snat_0')
+        snat_index.add_member('Project_t1', 'Project_t1', '/Common/snat_1')
+        snat_index.add_member('Project_t2', 'Project_t2', '/Common/snat_0')
+        assert snat_index.get_member_use_count('snat_0') == 2
+
+        snat_index.remove_member('Project_t1', 'Project_t1', 'snat_0')
+        assert snat_index.get_member_use_count('snat_0') == 1
+        snat_index.remove_pool('Project_t2', 'Project_t2')
+        assert snat_index.get_member_use_count('snat_0') == 0
+        assert snat_index.get_member_use_count('snat_1') == 1
+        snat_index.remove_pool('Project_t1', 'Project_t1')
+        assert snat_index.get_member_use_count('snat_1') == 0
+
+
+class TestBigipSnatManagerIndex(object):
+    def test_delete_bigip_snats(self):
+        driver = mock.Mock()
+        driver.conf.f5_ha_type = 'standalone'
+        driver.conf.f5_snat_addresses_per_subnet = 2
+        driver.conf.f5_snat_index_revalidate_interval = 300
+        driver.service_adapter.get_folder_name.return_value = 'Project_t1'
+        l2_service = mock.Mock()
+        l2_service.is_common_network.return_value = True
+        manager = BigipSnatManager(driver, l2_service, None)
+
+        name = 'snat-traffic-group-local-only-subnet1'
+        bigip = mock_bigip([
+            snatpool('Project_t1', 'Project_t1',
+                     ['/Common/' + name + '_0', '/Common/' + name + '_1']),
+            snatpool('Project_t2', 'Project_t2',
+                     ['/Common/' + name + '_1'])])
+        bigip.assured_tenant_snat_subnets = AssuredCache()
+        bigip.assured_tenant_snat_subnets.assured(('Project_t1', 'subnet1'))
+        tenant_pool = bigip.tm.ltm.snatpools.get_collection.return_value[0]
+        manager.snatpool_manager = mock.Mock()
+        manager.snatpool_manager.load.return_value = tenant_pool
+
+        deleted_names, in_use_subnets = manager.delete_bigip_snats(
+            bigip, {'network': {'id': 'net1'}, 'subnet': {'id': 'subnet1'}},
+            'Project_t1')
+
+        assert deleted_names == set([name + '_0'])
+        assert in_use_subnets == set()
+        assert bigip.tm.ltm.snatpools.get_collection.call_count == 1
+        assert manager.get_snat_index(bigip).get_pools(name + '_1') == \
+            set([('Project_t2', 'Project_t2')])
+
+        manager.invalidate_snat_index(bigip)
+        manager.get_snat_index(bigip)
+        assert bigip.tm.ltm.snatpools.get_collection.call_count == 2
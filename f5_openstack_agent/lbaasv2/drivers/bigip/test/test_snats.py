@@ -0,0 +1,142 @@
+# coding=utf-8
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from requests import HTTPError
+
+from f5_openstack_agent.lbaasv2.drivers.bigip.assured_cache import \
+    AssuredCache
+from f5_openstack_agent.lbaasv2.drivers.bigip import exceptions as f5_ex
+from f5_openstack_agent.lbaasv2.drivers.bigip.snats import BigipSnatManager
+
+import mock
+import pytest
+
+SNAT_NAME = 'snat-traffic-group-local-only-subnet1'
+
+
+def not_found():
+    return HTTPError(response=mock.Mock(status_code=404))
+
+
+def translation(name):
+    resource = mock.Mock()
+    resource.name = name
+    return resource
+
+
+class TestBigipSnatManager(object):
+    @pytest.fixture
+    def manager(self):
+        driver = mock.Mock()
+        driver.conf.f5_ha_type = 'standalone'
+        driver.conf.f5_snat_index_revalidate_interval = 300
+        manager = BigipSnatManager(driver, mock.Mock(), mock.Mock())
+        manager.snatpool_manager = mock.Mock()
+        manager.snat_translation_manager = mock.Mock()
+        manager.snat_translation_manager.get_resources.return_value = []
+        manager.snat_translation_manager.exists.return_value = False
+        return manager
+
+    @pytest.fixture
+    def bigip(self):
+        return mock.Mock(hostname='host1',
+                         assured_tenant_snat_subnets=AssuredCache())
+
+    @staticmethod
+    def assure(manager, bigip, count=3):
+        subnetinfo = {'network': {'id': 'net1', 'route_domain_id': 2},
+                      'subnet': {'id': 'subnet1'}}
+        snat_info = {'network_folder': 'Common',
+                     'pool_name': 'Project_t1',
+                     'pool_folder': 'Project_t1',
+                     'addrs': ['10.1.0.%d' % (i + 10) for i in range(count)]}
+        manager._assure_bigip_snats(bigip, subnetinfo, snat_info, 't1')
+
+    def test_assure_new_snatpool(self, manager, bigip):
+        manager.snatpool_manager.load.side_effect = not_found()
+        manager.snat_translation_manager.exists.side_effect = \
+            lambda bigip, name, partition: name == SNAT_NAME + '_1'
+
+        self.assure(manager, bigip)
+
+        created = [call[0][1]['name'] for call in
+                   manager.snat_translation_manager.create.call_args_list]
+        assert created == [SNAT_NAME + '_0', SNAT_NAME + '_2']
+        assert manager.snat_translation_manager.exists.call_count == 3
+        assert not manager.snat_translation_manager.get_resources.called
+        manager.snatpool_manager.create.assert_called_once_with(bigip, {
+            'name': 'Project_t1', 'partition': 'Project_t1',
+            'members': ['/Common/%s_%d' % (SNAT_NAME, i) for i in range(3)]})
+        assert manager.l3_binding.bind_address.call_count == 3
+        assert bigip.assured_tenant_snat_subnets.keys() == [('t1', 'subnet1')]
+
+    def test_assure_many_snat_translations(self, manager, bigip):
+        manager.snatpool_manager.load.side_effect = not_found()
+        manager.snat_translation_manager.get_resources.return_value = [
+            translation(SNAT_NAME + '_%d' % i) for i in range(5)]
+
+        self.assure(manager, bigip, count=6)
+
+        created = [call[0][1]['name'] for call in
+                   manager.snat_translation_manager.create.call_args_list]
+        assert created == [SNAT_NAME + '_5']
+        manager.snat_translation_manager.get_resources.assert_called_once_with(
+            bigip, partition='Common')
+        assert not manager.snat_translation_manager.exists.called
+
+    def test_assure_existing_snatpool(self, manager, bigip):
+        snatpool = mock.Mock(members=['/Common/other_0',
+                                      '/Common/%s_0' % SNAT_NAME])
+        manager.snatpool_manager.load.return_value = snatpool
+        manager.snat_translation_manager.exists.side_effect = \
+            lambda bigip, name, partition: name == SNAT_NAME + '_0'
+
+        self.assure(manager, bigip, count=2)
+
+        assert manager.snat_translation_manager.create.call_count == 1
+        snatpool.modify.assert_called_once_with(members=[
+            '/Common/other_0', '/Common/%s_0' % SNAT_NAME,
+            '/Common/%s_1' % SNAT_NAME])
+        assert not manager.snatpool_manager.create.called
+
+    def test_assure_unchanged_snatpool(self, manager, bigip):
+        snatpool = mock.Mock(members=['/Common/%s_%d' % (SNAT_NAME, i)
+                                      for i in range(3)])
+        manager.snatpool_manager.load.return_value = snatpool
+
+        manager.snat_translation_manager.exists.side_effect = \
+            lambda bigip, name, partition: name != SNAT_NAME + '_2'
+
+        self.assure(manager, bigip)
+
+        assert manager.snatpool_manager.load.call_count == 1
+        assert not manager.snat_translation_manager.get_resources.called
+        # the translation deleted since the snatpool was populated
+        created = [call[0][1]['name'] for call in
+                   manager.snat_translation_manager.create.call_args_list]
+        assert created == [SNAT_NAME + '_2']
+        assert not snatpool.modify.called
+        assert manager.l3_binding.bind_address.call_count == 3
+        assert bigip.assured_tenant_snat_subnets.keys() == [('t1', 'subnet1')]
+
+    def test_assure_snatpool_error(self, manager, bigip):
+        manager.snatpool_manager.load.side_effect = not_found()
+        manager.snatpool_manager.create.side_effect = HTTPError(
+            response=mock.Mock(status_code=400))
+
+        with pytest.raises(f5_ex.SNATCreationException):
+            self.assure(manager, bigip)
+        assert len(bigip.assured_tenant_snat_subnets) == 0
@@ -14,6 +14,8 @@
 # limitations under the License.
 #
 
+from f5_openstack_agent.lbaasv2.drivers.bigip.stat_helper import \
+    parse_global_statistics
 from f5_openstack_agent.lbaasv2.drivers.bigip.stat_helper import StatHelper
 
 import mock
@@ -332,3 +334,36 @@ class TestStatHelper(object):
         sh = StatHelper()
         conns = sh.get_throughput(bigip)
         assert(conns == 24820)
+
+    def test_get_global_statistics_cached(self):
+        bigip = mock.MagicMock()
+        bigip.hostname = 'host1'
+        bigip.tm.sys.performances.all_stats.load().__dict__ = ALL_STATS_1
+        load = bigip.tm.sys.performances.all_stats.load
+        loads = load.call_count
+        sh = StatHelper(cache_seconds=30)
+        assert sh.get_throughput(bigip) == 24820
+        assert sh.get_active_connection_count(bigip) == 0
+        assert sh.get_active_SSL_TPS(bigip) == 0
+        assert load.call_count == loads + 1
+
+        sh = StatHelper()
+        sh.get_throughput(bigip)
+        sh.get_active_connection_count(bigip)
+        assert load.call_count == loads + 3
+
+    def test_parse_global_statistics_ignores_unknown_lines(self):
+        stats = parse_global_statistics(
+            "Sys::Performance Unknown ()\n"
+            "Utilization                2        2         28\n"
+            "Sys::Performance System ()\n"
+            "Utilization                2        2         28\n"
+            "System CPU Usage(%)  Current  Average  Max(since 2018Z)\n"
+            "Other Line                 5        5          5\n"
+            "Utilization                7        3         29\n")
+        utilization = stats['Sys::Performance System'][
+            'System CPU Usage']['Utilization']
+        assert utilization == {'current': 7, 'average': 3, 'max': 29}
+        assert stats['since'] == '2018Z'
+        assert 'Other Line' not in \
+            stats['Sys::Performance System']['System CPU Usage']
@@ -0,0 +1,82 @@
+# coding=utf-8
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_openstack_agent.lbaasv2.drivers.bigip.stats_scheduler import \
+    MIN_SAMPLE_INTERVAL
+from f5_openstack_agent.lbaasv2.drivers.bigip.stats_scheduler import \
+    StatsScheduler
+
+
+def lb_stats(total_connections=0, active_connections=0):
+    return {'bytes_in': total_connections * 100,
+            'bytes_out': total_connections * 1000,
+            'active_connections': active_connections,
+            'total_connections': total_connections}
+
+
+class TestStatsScheduler(object):
+    def test_adaptive_interval(self):
+        scheduler = StatsScheduler(budget=6000, max_interval=80)
+
+        now = 0
+        assert scheduler.sample('idle', 1, now)
+        assert scheduler.sample('busy', 1, now)
+        scheduler.record('idle', lb_stats())
+        scheduler.record('busy', lb_stats(10))
+
+        # idle loadbalancers are sampled less often, up to max_interval
+        for _ in range(6):
+            now += 100
+            assert scheduler.sample('idle', 1, now)
+            scheduler.record('idle', lb_stats())
+            assert scheduler.sample('busy', 1, now)
+            scheduler.record('busy', lb_stats(10, active_connections=1))
+        assert scheduler._samples['idle'].interval == 80
+        assert scheduler._samples['busy'].interval == MIN_SAMPLE_INTERVAL
+
+        # once busy, they are sampled more often again
+        now += 100
+        assert scheduler.sample('idle', 1, now)
+        scheduler.record('idle', lb_stats(1))
+        assert scheduler._samples['idle'].interval == 40
+        assert not scheduler.sample('idle', 1, now + 1)
+
+    def test_budget(self):
+        scheduler = StatsScheduler(budget=60)
+        # the budget is spent ten seconds' worth at a time
+        assert scheduler.capacity == 10
+
+        sampled = [lb_id for lb_id in range(20)
+                   if scheduler.sample(lb_id, 3, now=0)]
+        assert sampled == [0, 1, 2]
+        assert scheduler.deferred == 17
+
+        # one request per second is added to the budget
+        assert not scheduler.sample(3, 3, now=1)
+        assert scheduler.sample(3, 3, now=2)
+
+        # a loadbalancer costing more than the burst waits for a full one
+        assert not scheduler.sample('large', 30, now=10)
+        assert scheduler.sample('large', 30, now=12)
+
+        usage = scheduler.get_usage(now=30)
+        assert usage == {'budget': 60, 'requests_last_minute': 42,
+                         'loadbalancers': 21, 'sampled': 5, 'skipped': 0,
+                         'deferred': 19}
+        assert scheduler.get_usage(now=70)['requests_last_minute'] == 30
+
+        scheduler.forget('large')
+        assert len(scheduler) == 20
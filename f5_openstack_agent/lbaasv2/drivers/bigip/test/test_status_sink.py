@@ -0,0 +1,126 @@
+# coding=utf-8
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import eventlet
+
+from f5_openstack_agent.lbaasv2.drivers.bigip import status_sink
+from f5_openstack_agent.lbaasv2.drivers.bigip.status_sink import \
+    StatusSink
+
+import mock
+
+
+def service(provisioning_status='PENDING_UPDATE'):
+    return {'loadbalancer': {'id': 'lb1',
+                             'provisioning_status': provisioning_status},
+            'members': [{'id': 'm1',
+                         'provisioning_status': provisioning_status}]}
+
+
+def report(batch):
+    batch.update_loadbalancer_status('lb1', 'ACTIVE', 'ONLINE')
+    batch.update_member_status('m1', 'ACTIVE', 'ONLINE')
+    batch.flush()
+
+
+class TestStatusSink(object):
+    def test_unchanged_status(self):
+        driver = mock.Mock()
+        sink = StatusSink(driver, interval=0)
+
+        report(sink.batch(service()))
+        driver.plugin_rpc.update_statuses.assert_called_once_with('lb1', [
+            {'type': 'loadbalancer', 'id': 'lb1',
+             'provisioning_status': 'ACTIVE', 'operating_status': 'ONLINE'},
+            {'type': 'member', 'id': 'm1',
+             'provisioning_status': 'ACTIVE', 'operating_status': 'ONLINE'}])
+
+        # the service is assured again
+        report(sink.batch(service('ACTIVE')))
+        assert driver.plugin_rpc.update_statuses.call_count == 1
+
+        # only the member went offline
+        batch = sink.batch(service('ACTIVE'))
+        batch.update_member_status('m1', None, 'OFFLINE')
+        batch.update_loadbalancer_status('lb1', 'ACTIVE', 'ONLINE')
+        batch.flush()
+        assert driver.plugin_rpc.update_statuses.call_args[0][1] == [
+            {'type': 'member', 'id': 'm1',
+             'provisioning_status': None, 'operating_status': 'OFFLINE'}]
+
+        # neutron changed the objects since they were reported
+        report(sink.batch(service()))
+        assert driver.plugin_rpc.update_statuses.call_count == 3
+        assert len(driver.plugin_rpc.update_statuses.call_args[0][1]) == 2
+
+    def test_destroyed(self):
+        driver = mock.Mock()
+        sink = StatusSink(driver, interval=0.01)
+
+        batch = sink.batch(service())
+        batch.update_member_status('m1', 'ACTIVE', 'ONLINE')
+        batch.update_loadbalancer_status('lb1', 'ACTIVE', 'ONLINE')
+        batch.loadbalancer_destroyed('lb1')
+        batch.flush()
+        driver.plugin_rpc.loadbalancer_destroyed.assert_called_once_with(
+            'lb1')
+        assert len(sink) == 0
+
+        eventlet.sleep(0.05)
+        assert not driver.plugin_rpc.update_statuses.called
+
+        # the reported objects of a deleted loadbalancer are forgotten
+        sink.interval = 0
+        report(sink.batch(service()))
+        assert len(sink._reported) == 2
+        sink.batch(service()).loadbalancer_destroyed('lb1')
+        assert sink._reported == {}
+        assert sink._loadbalancer_objects == {}
+
+    def test_retry(self):
+        driver = mock.Mock()
+        driver.plugin_rpc.update_statuses.side_effect = \
+            Exception('timed out')
+        sink = StatusSink(driver, interval=0.01, retries=2)
+
+        report(sink.batch(service()))
+        assert not driver.plugin_rpc.update_statuses.called
+        assert len(sink) == 2
+
+        eventlet.sleep(0.1)
+        assert driver.plugin_rpc.update_statuses.call_count == 3
+        assert len(sink) == 0
+
+        # nothing was reported, so the statuses are sent again
+        driver.plugin_rpc.update_statuses.side_effect = None
+        sink.interval = 0
+        report(sink.batch(service('ACTIVE')))
+        assert driver.plugin_rpc.update_statuses.call_count == 4
+
+    def test_retry_without_interval(self):
+        driver = mock.Mock()
+        driver.plugin_rpc.update_statuses.side_effect = [
+            Exception('timed out'), None]
+        sink = StatusSink(driver, interval=0)
+
+        with mock.patch.object(status_sink, 'STATUS_RETRY_INTERVAL', 0.01):
+            report(sink.batch(service()))
+            assert driver.plugin_rpc.update_statuses.call_count == 1
+            assert len(sink) == 2
+
+            eventlet.sleep(0.05)
+        assert driver.plugin_rpc.update_statuses.call_count == 2
+        assert len(sink) == 0
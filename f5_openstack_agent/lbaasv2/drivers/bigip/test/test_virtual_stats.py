@@ -0,0 +1,88 @@
+# coding=utf-8
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_openstack_agent.lbaasv2.drivers.bigip.virtual_stats import \
+    parse_virtual_stats
+from f5_openstack_agent.lbaasv2.drivers.bigip.virtual_stats import \
+    VirtualStatsSnapshot
+
+import mock
+
+VIRTUALS_URI = 'https://localhost/mgmt/tm/ltm/virtual/'
+
+
+def virtual_stats(name, bits_in, tm_name=True):
+    entries = {'clientside.bitsIn': {'value': bits_in},
+               'clientside.curConns': {'value': 2},
+               'status.availabilityState': {'description': 'available'}}
+    if tm_name:
+        entries['tmName'] = {'description': name}
+    return {'nestedStats': {'entries': entries}}
+
+
+def collection_stats(*virtuals):
+    return {'entries': dict(
+        (VIRTUALS_URI + '%s/stats' % virtual_name.replace('/', '~'),
+         virtual_stats(virtual_name, bits_in, tm_name))
+        for virtual_name, bits_in, tm_name in virtuals)}
+
+
+def mock_bigip(*virtuals):
+    bigip = mock.Mock(hostname='host1')
+    bigip.tm.ltm.virtuals._meta_data = {'uri': VIRTUALS_URI}
+    bigip.icrs.get.return_value.json.return_value = \
+        collection_stats(*virtuals)
+    return bigip
+
+
+class TestVirtualStats(object):
+    def test_parse_virtual_stats(self):
+        table = parse_virtual_stats(collection_stats(
+            ('/Project_t1/vs1', 1024, True),
+            ('/Project_t2/vs2', 2048, False)))
+
+        assert table == {
+            '/Project_t1/vs1': {'clientside.bitsIn': 1024,
+                                'clientside.curConns': 2},
+            '/Project_t2/vs2': {'clientside.bitsIn': 2048,
+                                'clientside.curConns': 2}}
+        assert parse_virtual_stats({}) == {}
+
+    def test_snapshot(self):
+        bigip = mock_bigip(('/Project_t1/vs1', 1024, True),
+                           ('/Project_t1/vs2', 2048, True))
+        snapshot = VirtualStatsSnapshot(interval=10)
+        stat_keys = ['clientside.bitsIn', 'clientside.bitsOut']
+
+        assert snapshot.get_stats(
+            bigip, name='vs1', partition='Project_t1', stat_keys=stat_keys,
+            now=100) == {'clientside.bitsIn': 1024}
+        assert snapshot.get_stats(
+            bigip, name='vs2', partition='Project_t1', stat_keys=stat_keys,
+            now=105) == {'clientside.bitsIn': 2048}
+        assert snapshot.get_stats(
+            bigip, name='vs3', partition='Project_t1', stat_keys=stat_keys,
+            now=109) == {}
+        bigip.icrs.get.assert_called_once_with(VIRTUALS_URI + 'stats')
+
+        # the stats are loaded again once older than the interval
+        assert not snapshot.is_stale(bigip, now=109)
+        assert snapshot.is_stale(bigip, now=110)
+        snapshot.get_table(bigip, now=110)
+        assert bigip.icrs.get.call_count == 2
+        snapshot.invalidate(bigip)
+        snapshot.get_table(bigip, now=111)
+        assert bigip.icrs.get.call_count == 3
@@ -14,10 +14,8 @@
 # limitations under the License.
 #
 from time import time
-import uuid
 
 from distutils.version import LooseVersion
-from eventlet import greenthread
 from oslo_log import log as logging
 
 LOG = logging.getLogger(__name__)
@@ -46,15 +44,19 @@ def strip_domain_address(ip_address):
         return ip_address.split('%')[0]
 
 
-def serialized(method_name):
-    """Outer wrapper in order to specify method name."""
+def serialized(method_name, coalesce=False):
+    """Outer wrapper in order to specify method name.
+
+    If coalesce is True, a queued request for a loadbalancer is dropped
+    in favor of a newer request for the same loadbalancer. The dropped
+    request returns the result of the newer one.
+    """
     def real_serialized(method):
-        """Decorator to serialize calls to configure via iControl."""
+        """Decorator to schedule calls to configure via iControl."""
         def wrapper(*args, **kwargs):
             """Necessary wrapper."""
             # args[0] must be an instance of iControlDriver
             service_queue = args[0].service_queue
-            my_request_id = uuid.uuid4()
 
             service = None
             if len(args) > 0:
@@ -64,63 +66,46 @@ def serialized(method_name):
             if 'service' in kwargs:
                 service = kwargs['service']
 
-            # Consolidate create_member requests for the same pool.
-            #
-            # NOTE: The following block of code alters the state of
-            # a queue that other greenthreads are waiting behind.
-            # This code assumes it will not be preempted by another
-            # greenthread while running. It does not do I/O or call any
-            # other monkey-patched code which might cause a context switch.
-            # To avoid race conditions, DO NOT add logging to this code
-            # block.
-
-            req = (my_request_id, method_name, service)
-            service_queue.append(req)
-            reqs_ahead_of_us = request_index(service_queue, my_request_id)
-            while reqs_ahead_of_us != 0:
-                if reqs_ahead_of_us == 1:
-                    # it is almost our turn. get ready
-                    waitsecs = .01
-                else:
-                    waitsecs = reqs_ahead_of_us * .5
-                if waitsecs > .01:
-                    LOG.debug('%s request %s is blocking'
-                              ' for %.2f secs - queue depth: %d'
-                              % (str(method_name), my_request_id,
-                                 waitsecs, len(service_queue)))
-                greenthread.sleep(waitsecs)
-                reqs_ahead_of_us = request_index(service_queue, my_request_id)
+            # Requests for unrelated loadbalancers run concurrently.
+            # Requests which share a loadbalancer, tenant or network wait
+            # on the scheduler until the conflicting requests complete.
+            request = service_queue.submit(
+                method_name, service=service,
+                tenant_id=kwargs.get('tenant_id', None),
+                coalesce=coalesce)
+            my_request_id = request.request_id
+            if request.superseded_by:
+                newer = request.superseded_by
+                LOG.debug('%s request %s was superseded by %s request %s'
+                          % (str(method_name), my_request_id,
+                             newer.method_name, newer.request_id))
+                args[0].update_superseded_service_status(
+                    service, newer.service)
+                if newer.error:
+                    raise newer.error
+                return newer.result
             try:
                 LOG.debug('%s request %s is running with queue depth: %d'
                           % (str(method_name), my_request_id,
                              len(service_queue)))
                 start_time = time()
                 result = method(*args, **kwargs)
+                request.result = result
                 LOG.debug('%s request %s took %.5f secs'
                           % (str(method_name), my_request_id,
                              time() - start_time))
-            except Exception:
+            except Exception as exc:
+                request.error = exc
                 LOG.error('%s request %s FAILED'
                           % (str(method_name), my_request_id))
                 raise
             finally:
-                service_queue.pop(0)
+                service_queue.release(request)
             return result
         return wrapper
     return real_serialized
 
 
-def request_index(request_queue, request_id):
-    """Get index of request in request queue.
-
-    If we are not in the queue return the length of the list.
-    """
-    for request in request_queue:
-        if request[0] == request_id:
-            return request_queue.index(request)
-    return len(request_queue)
-
-
 def get_filter(bigip, key, op, value):
     if LooseVersion(bigip.tmos_version) < LooseVersion('11.6.0'):
         return '$filter=%s+%s+%s' % (key, op, value)
@@ -0,0 +1,111 @@
+"""Virtual server statistics of a BIG-IP, loaded with one request."""
+# Copyright (c) 2014-2018, F5 Networks, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import time
+import urllib
+
+from eventlet import semaphore
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_STATS_SNAPSHOT_INTERVAL = 10
+
+
+def parse_virtual_stats(collection_stats):
+    """Return the stat values of each virtual by full name.
+
+    collection_stats is the JSON of the virtual collection stats, an
+    entry per virtual with its stats nested, as in:
+
+        {'entries': {
+            'https://localhost/mgmt/tm/ltm/virtual/~Project_t1~vs1/stats':
+                {'nestedStats': {'entries': {
+                    'tmName': {'description': '/Project_t1/vs1'},
+                    'clientside.bitsIn': {'value': 1024}}}}}}
+
+    Only the stats with a value are kept.
+    """
+    virtual_stats = dict()
+    for link, entry in (collection_stats.get('entries', None) or {}).items():
+        entries = entry.get('nestedStats', {}).get('entries', {})
+        name = entries.get('tmName', {}).get('description', None)
+        if not name:
+            # .../virtual/~Project_t1~vs1/stats
+            name = urllib.unquote(
+                link.split('?')[0].rstrip('/').split('/')[-2]
+            ).replace('~', '/')
+        virtual_stats[name] = dict(
+            (stat_key, stat['value']) for stat_key, stat in entries.items()
+            if isinstance(stat, dict) and 'value' in stat)
+    return virtual_stats
+
+
+class VirtualStatsSnapshot(object):
+    """Stats of every virtual on each BIG-IP, shared between services.
+
+    The stats of all virtuals on a BIG-IP are loaded with a single
+    collection stats request, and the stats of any number of listeners
+    are then served from the loaded table until it is older than
+    interval seconds. Getting the stats of every load balancer costs
+    one request per BIG-IP per interval rather than three requests per
+    listener.
+    """
+
+    def __init__(self, interval=DEFAULT_STATS_SNAPSHOT_INTERVAL):
+        self.interval = interval
+        # bigip hostname -> (loaded at, {virtual full name -> stats})
+        self._tables = dict()
+        self._locks = dict()
+
+    def get_stats(self, bigip, name=None, partition=None, stat_keys=[],
+                  now=None):
+        """Return the stats of a virtual, as BigIPResourceHelper does.
+
+        Stats the virtual does not have are left out, and a virtual
+        which does not exist has no stats.
+        """
+        table = self.get_table(bigip, now)
+        virtual_stats = table.get('/%s/%s' % (partition, name), {})
+        return dict((stat_key, virtual_stats[stat_key])
+                    for stat_key in stat_keys if stat_key in virtual_stats)
+
+    def get_table(self, bigip, now=None):
+        """Return the stats of the virtuals of a BIG-IP by full name."""
+        with self._locks.setdefault(bigip.hostname, semaphore.Semaphore()):
+            now = time.time() if now is None else now
+            if self.is_stale(bigip, now):
+                self._tables[bigip.hostname] = (now, self._load(bigip))
+            return self._tables[bigip.hostname][1]
+
+    def is_stale(self, bigip, now=None):
+        """Whether the next stats of a BIG-IP load its table again."""
+        now = time.time() if now is None else now
+        loaded_at, table = self._tables.get(bigip.hostname, (None, None))
+        return table is None or now - loaded_at >= self.interval
+
+    def invalidate(self, bigip=None):
+        if bigip is None:
+            self._tables.clear()
+        else:
+            self._tables.pop(bigip.hostname, None)
+
+    def _load(self, bigip):
+        virtuals = bigip.tm.ltm.virtuals
+        response = bigip.icrs.get(virtuals._meta_data['uri'] + 'stats')
+        table = parse_virtual_stats(response.json())
+        LOG.debug("loaded stats of %d virtuals on %s" %
+                  (len(table), bigip.hostname))
+        return table
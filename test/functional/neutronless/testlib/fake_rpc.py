@@ -157,6 +157,14 @@ class FakeRPCPlugin(object):
         retval = self._ports.get(port_name, [])
         return retval
 
+    def get_ports_by_names(self, port_names=None):
+        return dict((port_name, self.get_port_by_name(port_name=port_name))
+                    for port_name in port_names)
+
+    def create_ports_on_subnets(self, ports=None):
+        return dict((port['name'], self.create_port_on_subnet(**port))
+                    for port in ports)
+
     @track_call
     def delete_port_by_name(self, port_name=None):
         if not port_name:
@@ -205,6 +213,14 @@ class FakeRPCPlugin(object):
                                    operating_status="OFFLINE"):
         pass
 
+    def update_statuses(self, loadbalancer_id, statuses):
+        for status in statuses:
+            args = [status['id'], status['provisioning_status'],
+                    status['operating_status']]
+            if status['type'] == 'l7rule':
+                args.insert(1, status['l7policy_id'])
+            getattr(self, 'update_%s_status' % status['type'])(*args)
+
     @track_call
     def health_monitor_destroyed(self, id):
         pass
@@ -59,6 +59,21 @@ def create_default_mock_rpc_plugin():
     mock_rpc_plugin.get_port_by_name.return_value = [
         {'fixed_ips': [{'ip_address': '10.2.2.134'}]}
     ]
+    mock_rpc_plugin.get_ports_by_names.side_effect = \
+        lambda port_names=None: dict(
+            (port_name, mock_rpc_plugin.get_port_by_name(port_name=port_name))
+            for port_name in port_names)
+
+    def update_statuses(loadbalancer_id, statuses):
+        for status in statuses:
+            args = [status['id'], status['provisioning_status'],
+                    status['operating_status']]
+            if status['type'] == 'l7rule':
+                args.insert(1, status['l7policy_id'])
+            update_status = getattr(
+                mock_rpc_plugin, 'update_%s_status' % status['type'])
+            update_status(*args)
+    mock_rpc_plugin.update_statuses.side_effect = update_statuses
     return mock_rpc_plugin
 
 